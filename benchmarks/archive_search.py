@@ -0,0 +1,72 @@
+"""Benchmark loading and searching the thread archive on a synthetic workspace.
+
+Channels of synthetic dumps (see `slack_archive.synthetic`) are loaded into a
+fresh archive, loaded again to time an upsert run without changes, and then
+searched with a few typical queries. Usage:
+
+    uv run python benchmarks/archive_search.py --channels 10 --size-mb 100
+"""
+
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from slack_archive.archive import ThreadArchive
+from slack_archive.synthetic import DumpGenerator
+from slack_archive.thread import MESSAGE_TIMESTAMP_PATTERN
+
+QUERIES = (
+    "partner",
+    "relays AND auctions",
+    '"order flow"',
+    "integ*",
+    "pricing NOT grants",
+)
+
+
+@click.command()
+@click.option("--channels", default=10, show_default=True, help="Number of channels")
+@click.option("--size-mb", default=100, show_default=True, help="Size per channel")
+@click.option("--runs", default=20, show_default=True, help="Samples per query")
+def main(channels: int, size_mb: int, runs: int) -> None:
+    """Report archive load time and search latency."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dumps: dict[str, Path] = {}
+        messages = 0
+        for seed in range(channels):
+            path = Path(tmp_dir) / f"C{seed:03d}.txt"
+            with open(path, "w", encoding="utf-8") as file:
+                DumpGenerator(seed).write(file, size_mb * 1024 * 1024)
+            with open(path, encoding="utf-8") as file:
+                messages += sum(
+                    1 for line in file if MESSAGE_TIMESTAMP_PATTERN.search(line)
+                )
+            dumps[path.stem] = path
+        click.echo(f"{channels} channels, {channels * size_mb} MB, {messages} messages")
+
+        archive = ThreadArchive(Path(tmp_dir) / "threads.sqlite3")
+        for label in ("load", "reload, unchanged"):
+            start = time.perf_counter()
+            written = archive.load_dumps(dumps)
+            click.echo(
+                f"{label:<20} {time.perf_counter() - start:7.2f}s  {written} written"
+            )
+
+        for query in QUERIES:
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                hits = archive.search(query)
+                samples.append((time.perf_counter() - start) * 1000)
+            click.echo(
+                f"{query:<20} median {statistics.median(samples):7.2f} ms  "
+                f"max {max(samples):7.2f} ms  {len(hits)} hits"
+            )
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
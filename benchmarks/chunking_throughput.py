@@ -0,0 +1,59 @@
+"""Benchmark parsing and chunking throughput on a large synthetic slack dump.
+
+The synthetic dump is built by repeating the sample dump until it reaches the
+requested size. Every copy is tagged so no two threads share the same text and
+the cold run really tokenizes everything. Usage:
+
+    uv run python benchmarks/chunking_throughput.py --size-mb 100
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.config import SLACK_DUMP_PATH
+
+
+def build_dump(path: Path, size_mb: int) -> int:
+    """Write a dump of at least `size_mb` megabytes and return its size in bytes."""
+    sample = SLACK_DUMP_PATH.read_bytes()
+    target = size_mb * 1024 * 1024
+    copy = 0
+    with open(path, "wb") as file:
+        while file.tell() < target:
+            file.write(sample.replace(b" Z:\n", f" Z:\n[copy {copy}] ".encode()))
+            copy += 1
+        return file.tell()
+
+
+def measure(processor: ConversationProcessor, size: int, label: str) -> None:
+    start = time.perf_counter()
+    chunk_count = sum(1 for _ in processor.chunk_conversation())
+    elapsed = time.perf_counter() - start
+    click.echo(
+        f"{label:<32} {chunk_count:>6} chunks  {elapsed:7.2f}s  "
+        f"{size / elapsed / 1024 / 1024:8.1f} MB/s"
+    )
+
+
+@click.command()
+@click.option("--size-mb", default=100, show_default=True, help="Synthetic dump size")
+@click.option("--chunk-size", default=28000, show_default=True, help="Token budget")
+def main(size_mb: int, chunk_size: int) -> None:
+    """Report chunk_conversation throughput in MB/s."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dump_path = Path(tmp_dir) / "synthetic.txt"
+        size = build_dump(dump_path, size_mb)
+        click.echo(f"Synthetic dump: {size / 1024 / 1024:.1f} MB")
+
+        processor = ConversationProcessor(dump_path, chunk_size=chunk_size)
+        measure(processor, size, "cold (tokenize everything)")
+        processor.chunk_size = chunk_size // 2
+        measure(processor, size, "re-chunk, cached token counts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark the startup time of the CLI.
+
+The CLI is run once per channel from cron, so its import cost is paid on every
+run. Each sample imports `slack_archive.main` in a fresh interpreter; the median
+is compared against a budget, and the run fails if it is exceeded or if any of
+the heavy pipeline dependencies is imported at startup. Usage:
+
+    uv run python benchmarks/import_time.py
+    uv run python benchmarks/import_time.py --runs 20 --max-ms 150
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+import click
+
+# Dependencies that are only needed once a pipeline stage runs
+HEAVY_MODULES = (
+    "httpx",
+    "numpy",
+    "openai",
+    "pydantic",
+    "rapidfuzz",
+    "rich.progress",
+    "tiktoken",
+)
+
+# Imports the CLI and reports its import time and the modules it pulled in.
+PROBE = """\
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import slack_archive.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted(set(sys.modules) - before)}))
+"""
+
+
+def probe() -> dict:
+    """Import the CLI in a fresh interpreter and return what the probe reports."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+@click.command()
+@click.option("--runs", default=10, show_default=True, help="Number of samples")
+@click.option(
+    "--max-ms",
+    default=300.0,
+    show_default=True,
+    help="Median import time in milliseconds that counts as a regression",
+)
+def main(runs: int, max_ms: float) -> None:
+    """Report the import time of the CLI and guard it against regressions."""
+    samples = [probe() for _ in range(runs)]
+    median = statistics.median(sample["ms"] for sample in samples)
+    heavy = [module for module in HEAVY_MODULES if module in samples[0]["modules"]]
+    click.echo(
+        f"import slack_archive.main  median {median:7.1f} ms  "
+        f"min {min(sample['ms'] for sample in samples):7.1f} ms  "
+        f"({len(samples[0]['modules'])} modules)"
+    )
+
+    failed = False
+    if median > max_ms:
+        click.echo(f"REGRESSION: median above {max_ms:.0f} ms")
+        failed = True
+    if heavy:
+        click.echo(f"REGRESSION: imported at startup: {', '.join(heavy)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Benchmark parsing, chunking and thread lookups on synthetic slack dumps.
+
+Dumps of each requested size are generated deterministically (see
+`slack_archive.synthetic`), so results are comparable between versions. Each
+benchmark is timed, and then run again under tracemalloc for its peak memory.
+Results are written as JSON; pass an earlier result file with --compare to flag
+regressions. Usage:
+
+    uv run python benchmarks/suite.py --sizes 10,100,1000
+    uv run python benchmarks/suite.py --sizes 10 --compare benchmarks/results/old.json
+"""
+
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Any
+
+import click
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.dedup import deduplicate_notes
+from slack_archive.postprocess import post_process_all
+from slack_archive.schema import StakeholderNote
+from slack_archive.synthetic import write_dump
+from slack_archive.thread_index import ThreadIndex
+
+LOOKUPS = 1000
+NOTES = 1000
+THREADS_PER_NOTE = 3
+PARTNERS = 50
+# Fraction of note references that lack the trailing "Z:" of the fingerprint
+INEXACT_REFERENCE_RATE = 0.1
+
+
+def run_iter_threads(dump_path: Path) -> None:
+    processor = ConversationProcessor(dump_path)
+    for _ in processor.iter_threads():
+        pass
+
+
+def run_chunk_conversation(dump_path: Path) -> None:
+    processor = ConversationProcessor(dump_path)
+    for _ in processor.chunk_conversation():
+        pass
+
+
+def run_build_index(dump_path: Path) -> None:
+    ThreadIndex.index_path_for(dump_path).unlink(missing_ok=True)
+    ThreadIndex.load_or_build(dump_path).close()
+
+
+def run_get_thread_content(dump_path: Path) -> None:
+    processor = ConversationProcessor(dump_path)
+    fingerprints = random.Random(0).choices(list(processor.thread_map), k=LOOKUPS)
+    for fingerprint in fingerprints:
+        processor.get_thread_content(fingerprint)
+    processor.thread_map.close()
+
+
+def run_post_process(dump_path: Path) -> None:
+    processor = ConversationProcessor(dump_path)
+    rng = random.Random(0)
+    fingerprints = list(processor.thread_map)
+
+    def reference(fingerprint: str) -> str:
+        # Drop the trailing "Z:" from some references to exercise resolution.
+        if rng.random() < INEXACT_REFERENCE_RATE:
+            return fingerprint.removesuffix(" Z:")
+        return fingerprint
+
+    notes = [
+        StakeholderNote(
+            stakeholder_name=f"Partner {i}",
+            date="2024-01-01",
+            title="Call",
+            summary="summary",
+            relevant_slack_threads=[
+                reference(fingerprint)
+                for fingerprint in rng.choices(fingerprints, k=THREADS_PER_NOTE)
+            ],
+        )
+        for i in range(NOTES)
+    ]
+    post_process_all(notes, processor)
+    processor.thread_map.close()
+
+
+def run_deduplicate(dump_path: Path) -> None:
+    processor = ConversationProcessor(dump_path)
+    rng = random.Random(0)
+    # One note per thread, about one of a few partners, like extraction yields.
+    notes = [
+        StakeholderNote(
+            stakeholder_name=f"Partner {rng.randrange(PARTNERS)}",
+            date=thread.timestamp.date().isoformat(),
+            title=thread.content.strip().split("\n", 1)[0][:80],
+            summary=thread.content[:500],
+            relevant_slack_threads=[thread.key],
+        )
+        for thread in processor.iter_threads()
+    ]
+    deduplicate_notes(notes)
+
+
+BENCHMARKS: dict[str, Callable[[Path], None]] = {
+    "iter_threads": run_iter_threads,
+    "chunk_conversation": run_chunk_conversation,
+    "build_index": run_build_index,
+    "get_thread_content": run_get_thread_content,
+    "post_process": run_post_process,
+    "deduplicate": run_deduplicate,
+}
+
+
+def measure(
+    benchmark: Callable[[Path], None], dump_path: Path, memory: bool
+) -> dict[str, Any]:
+    """Time a benchmark, then run it under tracemalloc for its peak memory."""
+    start = time.perf_counter()
+    benchmark(dump_path)
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        benchmark(dump_path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 1024 / 1024
+    return {"seconds": seconds, "peak_mb": peak_mb}
+
+
+def version_info() -> dict[str, str | None]:
+    """Return the package version and git commit the benchmark ran against."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        version = metadata.version("slack-archive")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "version": version,
+        "commit": commit,
+        "python": sys.version.split()[0],
+    }
+
+
+def compare(
+    results: list[dict[str, Any]], baseline_path: Path, threshold: float
+) -> int:
+    """Print the change against a baseline and return the number of regressions."""
+    baseline = {
+        (r["benchmark"], r["size_mb"]): r
+        for r in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    }
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["benchmark"], result["size_mb"]))
+        if old is None:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        regressed = ratio > threshold
+        regressions += regressed
+        click.echo(
+            f"{result['benchmark']:<20} {result['size_mb']:>6} MB  "
+            f"{old['seconds']:8.2f}s -> {result['seconds']:8.2f}s  "
+            f"x{ratio:.2f}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def run_benchmarks(
+    sizes: str, names: str, seed: int, data_dir: Path, no_memory: bool
+) -> list[dict[str, Any]]:
+    """Run the named benchmarks on dumps of each size and print their results."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    results: list[dict[str, Any]] = []
+
+    for size_mb in (int(size) for size in sizes.split(",")):
+        dump_path = data_dir / f"synthetic-{size_mb}mb-seed{seed}.txt"
+        if not dump_path.exists():
+            click.echo(f"Generating {dump_path}...")
+            write_dump(dump_path, size_mb, seed)
+        size_bytes = dump_path.stat().st_size
+
+        for name in names.split(","):
+            measured = measure(BENCHMARKS[name], dump_path, memory=not no_memory)
+            result = {
+                "benchmark": name,
+                "size_mb": size_mb,
+                **measured,
+                "mb_per_second": size_bytes / 1024 / 1024 / measured["seconds"],
+            }
+            results.append(result)
+            peak = measured["peak_mb"]
+            click.echo(
+                f"{name:<20} {size_mb:>6} MB  {measured['seconds']:8.2f}s  "
+                f"{result['mb_per_second']:8.1f} MB/s"
+                + (f"  peak {peak:8.1f} MB" if peak is not None else "")
+            )
+    return results
+
+
+@click.command()
+@click.option("--sizes", default="10,100", show_default=True, help="Dump sizes in MB")
+@click.option(
+    "--benchmarks",
+    "names",
+    default=",".join(BENCHMARKS),
+    show_default=True,
+    help="Benchmarks to run",
+)
+@click.option("--seed", default=0, show_default=True, help="Generator seed")
+@click.option(
+    "--data-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("benchmarks/data"),
+    show_default=True,
+    help="Where generated dumps are kept between runs",
+)
+@click.option(
+    "--results-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("benchmarks/results"),
+    show_default=True,
+    help="Where result files are written",
+)
+@click.option("--no-memory", is_flag=True, help="Skip the peak memory runs")
+@click.option(
+    "--compare",
+    "baseline_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Earlier result file to compare against",
+)
+@click.option(
+    "--threshold",
+    default=1.2,
+    show_default=True,
+    help="Slowdown factor that counts as a regression",
+)
+def main(
+    seed: int,
+    results_dir: Path,
+    baseline_path: Path | None,
+    threshold: float,
+    **options: Any,
+) -> None:
+    """Benchmark parsing, chunking and lookups on synthetic dumps."""
+    results = run_benchmarks(seed=seed, **options)
+
+    results_dir.mkdir(parents=True, exist_ok=True)
+    info = version_info()
+    started = datetime.now(UTC)
+    results_path = results_dir / (
+        f"{started:%Y%m%dT%H%M%SZ}-{info['commit'] or info['version'] or 'dev'}.json"
+    )
+    results_path.write_text(
+        json.dumps({**info, "seed": seed, "results": results}, indent=2),
+        encoding="utf-8",
+    )
+    click.echo(f"Results written to {results_path}")
+
+    if baseline_path is not None and compare(results, baseline_path, threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
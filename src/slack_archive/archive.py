@@ -0,0 +1,303 @@
+import logging
+import sqlite3
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from functools import cached_property
+from pathlib import Path
+
+from slack_archive.config import ARCHIVE_PATH
+from slack_archive.resolver import FingerprintResolver
+from slack_archive.thread import Thread, ThreadStore
+
+logger = logging.getLogger(__name__)
+
+# Marks around the matched words of a snippet, see `SearchHit.snippet`
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    occurrence INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    content TEXT NOT NULL,
+    UNIQUE (channel, fingerprint, occurrence)
+);
+CREATE INDEX IF NOT EXISTS idx_threads_timestamp ON threads (timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS threads_fts USING fts5(
+    content, content='threads', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS threads_insert AFTER INSERT ON threads BEGIN
+    INSERT INTO threads_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS threads_delete AFTER DELETE ON threads BEGIN
+    INSERT INTO threads_fts (threads_fts, rowid, content)
+    VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS threads_update AFTER UPDATE OF content ON threads BEGIN
+    INSERT INTO threads_fts (threads_fts, rowid, content)
+    VALUES ('delete', old.id, old.content);
+    INSERT INTO threads_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+# Threads already archived are only rewritten when they changed, e.g. got replies.
+_UPSERT = """
+INSERT INTO threads (channel, fingerprint, occurrence, user_id, timestamp, content)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (channel, fingerprint, occurrence) DO UPDATE SET
+    user_id = excluded.user_id,
+    timestamp = excluded.timestamp,
+    content = excluded.content
+WHERE threads.content != excluded.content
+"""
+
+
+@dataclass
+class SearchHit:
+    """
+    A thread matching a search.
+
+    Attributes:
+        channel: ID of the channel of the thread.
+        fingerprint: Fingerprint of the thread, as used in thread lookups.
+        user_id: Slack user ID of the author of the thread.
+        timestamp: Time the thread was started.
+        snippet: Excerpt of the thread around the matches, with the matched words
+            between MATCH_START and MATCH_END.
+    """
+
+    channel: str
+    fingerprint: str
+    user_id: str
+    timestamp: datetime
+    snippet: str
+
+
+@dataclass
+class SearchFilter:
+    """
+    Which threads a search is limited to, besides matching its query.
+
+    Attributes:
+        channel: Only search the threads of this channel.
+        user_id: Only search the threads started by this user.
+        since: Only search threads started at or after this time.
+        until: Only search threads started before this time.
+        limit: Maximum number of hits.
+    """
+
+    channel: str | None = None
+    user_id: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+    limit: int = 20
+
+
+def _epoch(time: datetime) -> float:
+    """Seconds since the epoch of a time, in UTC unless it has a time zone."""
+    return (time if time.tzinfo else time.replace(tzinfo=UTC)).timestamp()
+
+
+def _quote(query: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class ThreadArchive:
+    """
+    Searchable SQLite archive of the threads of all runs.
+
+    Threads are stored with their channel, author, start time and fingerprint, and
+    indexed for full-text search with FTS5, so they can be searched and looked up
+    after the dump of a run is gone. Loading a channel again upserts its threads:
+    new threads are added and threads whose text changed, e.g. by new replies, are
+    replaced, so the archive grows across runs without duplicates. Threads with a
+    repeated fingerprint are kept apart by their occurrence in the dump.
+
+    Attributes:
+        db_path: Path to the SQLite database file.
+    """
+
+    def __init__(self, db_path: Path = ARCHIVE_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def load(self, channel: str, threads: Iterable[Thread]) -> int:
+        """
+        Upsert the threads of a channel in a single transaction.
+
+        Args:
+            channel: ID of the channel.
+            threads: All threads of the channel's dump, in file order.
+
+        Returns:
+            The number of threads added or changed.
+        """
+        with self._conn:
+            return self._upsert(channel, threads)
+
+    def load_dumps(self, dumps: Mapping[str, Path]) -> int:
+        """
+        Upsert the threads of channel dumps in a single transaction.
+
+        Args:
+            dumps: Map of channel IDs to dump paths.
+
+        Returns:
+            The number of threads added or changed.
+        """
+        written = 0
+        with self._conn:
+            for channel, path in dumps.items():
+                with ThreadStore.from_file(path) as threads:
+                    written += self._upsert(channel, threads)
+        logger.info(
+            f"Archived {len(dumps)} channels in {self.db_path}, "
+            f"{written} threads new or changed"
+        )
+        return written
+
+    def _upsert(self, channel: str, threads: Iterable[Thread]) -> int:
+        occurrences: dict[str, int] = {}
+
+        def rows() -> Iterator[tuple[str, str, int, str, float, str]]:
+            for thread in threads:
+                key = thread.key
+                occurrence = occurrences.get(key, 0)
+                occurrences[key] = occurrence + 1
+                yield (
+                    channel,
+                    key,
+                    occurrence,
+                    thread.user_id,
+                    thread.epoch,
+                    thread.content,
+                )
+
+        return self._conn.executemany(_UPSERT, rows()).rowcount
+
+    def search(
+        self, query: str, search_filter: SearchFilter | None = None
+    ) -> list[SearchHit]:
+        """
+        Search the archived threads, best matches first.
+
+        Args:
+            query: FTS5 query, e.g. `relay AND "pilot program"` or `integrat*`. Text
+                that is not a valid query matches threads with all of its words.
+            search_filter: Which threads to search and how many hits to return,
+                defaults to the 20 best matches of all threads.
+
+        Returns:
+            The matching threads, ranked by BM25.
+        """
+        search_filter = search_filter or SearchFilter()
+        since, until = search_filter.since, search_filter.until
+        limit = search_filter.limit
+        conditions = ["threads_fts MATCH ?"]
+        filters: list[str | float] = []
+        for condition, value in (
+            ("threads.channel = ?", search_filter.channel),
+            ("threads.user_id = ?", search_filter.user_id),
+            ("threads.timestamp >= ?", _epoch(since) if since else None),
+            ("threads.timestamp < ?", _epoch(until) if until else None),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                filters.append(value)
+        sql = f"""
+            SELECT threads.channel, threads.fingerprint, threads.user_id,
+                threads.timestamp, snippet(threads_fts, 0, ?, ?, '…', 24)
+            FROM threads_fts JOIN threads ON threads.id = threads_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY rank
+            LIMIT ?
+        """
+
+        def run(fts_query: str) -> list[tuple[str, str, str, float, str]]:
+            parameters = [MATCH_START, MATCH_END, fts_query, *filters, limit]
+            return self._conn.execute(sql, parameters).fetchall()
+
+        try:
+            rows = run(query)
+        except sqlite3.OperationalError:
+            # Syntax errors, or a word read as a column filter, e.g. "note:".
+            rows = run(_quote(query))
+        return [
+            SearchHit(
+                channel,
+                fingerprint,
+                user_id,
+                datetime.fromtimestamp(timestamp, UTC),
+                snippet,
+            )
+            for channel, fingerprint, user_id, timestamp, snippet in rows
+        ]
+
+    def fingerprints(self, channel: str) -> list[str]:
+        """Return the distinct fingerprints of a channel's threads, in time order."""
+        return [
+            fingerprint
+            for (fingerprint,) in self._conn.execute(
+                "SELECT DISTINCT fingerprint FROM threads WHERE channel = ? "
+                "ORDER BY timestamp",
+                (channel,),
+            )
+        ]
+
+    def threads(self, channel: str, fingerprint: str) -> list[Thread]:
+        """Return all threads of a channel with a fingerprint, in dump order."""
+        return [
+            Thread.from_text(content)
+            for (content,) in self._conn.execute(
+                "SELECT content FROM threads WHERE channel = ? AND fingerprint = ? "
+                "ORDER BY occurrence",
+                (channel, fingerprint),
+            )
+        ]
+
+    def channel(self, channel: str) -> "ArchivedChannel":
+        """Return the lookups of a channel's threads, see `ArchivedChannel`."""
+        return ArchivedChannel(self, channel)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+
+class ArchivedChannel:
+    """
+    Thread lookups of a single archived channel.
+
+    Offers the lookups post-processing uses from a ConversationProcessor, so notes
+    can be post-processed from the archive once the dump is gone.
+
+    Attributes:
+        archive: Archive holding the threads.
+        channel_id: ID of the channel.
+    """
+
+    def __init__(self, archive: ThreadArchive, channel_id: str):
+        self.archive = archive
+        self.channel_id = channel_id
+
+    @cached_property
+    def fingerprint_resolver(self) -> FingerprintResolver:
+        """Resolver of fingerprints returned by the model to archived threads."""
+        return FingerprintResolver(self.archive.fingerprints(self.channel_id))
+
+    def get_thread_contents(self, fingerprint: str) -> list[str]:
+        """Return the full content of all threads sharing a fingerprint."""
+        return [
+            str(thread) for thread in self.archive.threads(self.channel_id, fingerprint)
+        ]
@@ -0,0 +1,437 @@
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Protocol
+
+from openai import AsyncOpenAI
+from openai.types import CompletionUsage
+from openai.types.shared_params import ResponseFormatJSONSchema
+from pydantic import BaseModel
+
+from slack_archive.chunking import Chunk
+from slack_archive.config import BATCH_POLL_INTERVAL
+from slack_archive.schema import ExtractedStakeholderNotes, StakeholderNotes
+from slack_archive.structured_extract import ExtractionResult, OpenAIManager
+
+logger = logging.getLogger(__name__)
+
+# Batch statuses after which the batch will not make any more progress
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Error code of the requests an expired batch did not get to
+EXPIRED_REQUEST_CODE = "batch_expired"
+
+
+@dataclass
+class BatchStatus:
+    """
+    Status of a submitted batch.
+
+    Attributes:
+        status: Status reported by the batch endpoint, e.g. "in_progress".
+        output_file_id: ID of the file with successful results, once available.
+        error_file_id: ID of the file with failed requests, once available.
+    """
+
+    status: str
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+
+
+def strict_json_schema(schema: Any) -> Any:
+    """
+    Close every object of a JSON schema, as strict structured outputs require.
+
+    Every object gets `additionalProperties: false` and all of its properties
+    required, like the schema the SDK sends for live requests.
+
+    Args:
+        schema: JSON schema, e.g. of `BaseModel.model_json_schema()`.
+
+    Returns:
+        A strict copy of the schema.
+    """
+    if isinstance(schema, list):
+        return [strict_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {key: strict_json_schema(value) for key, value in schema.items()}
+    if strict.get("type") == "object":
+        strict["additionalProperties"] = False
+        strict["required"] = list(strict.get("properties", {}))
+    return strict
+
+
+def response_format(model: type[BaseModel]) -> ResponseFormatJSONSchema:
+    """Return the strict JSON schema response format of a pydantic model."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": strict_json_schema(model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+class BatchBackend(Protocol):
+    """Endpoint that accepts batch files and runs them asynchronously."""
+
+    async def upload(self, path: Path) -> str:
+        """Upload a JSONL request file and return its file ID."""
+        ...
+
+    async def create(self, input_file_id: str) -> str:
+        """Start a batch for an uploaded request file and return the batch ID."""
+        ...
+
+    async def retrieve(self, batch_id: str) -> BatchStatus:
+        """Return the current status of a batch."""
+        ...
+
+    async def download(self, file_id: str) -> str:
+        """Return the content of a result file."""
+        ...
+
+
+class OpenAIBatchBackend:
+    """BatchBackend of the OpenAI Batch API."""
+
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+
+    async def upload(self, path: Path) -> str:
+        with open(path, "rb") as file:
+            uploaded = await self.client.files.create(file=file, purpose="batch")
+        return uploaded.id
+
+    async def create(self, input_file_id: str) -> str:
+        batch = await self.client.batches.create(
+            input_file_id=input_file_id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def retrieve(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.batches.retrieve(batch_id)
+        return BatchStatus(batch.status, batch.output_file_id, batch.error_file_id)
+
+    async def download(self, file_id: str) -> str:
+        content = await self.client.files.content(file_id)
+        return content.text
+
+
+class BatchExtractor:
+    """
+    Extracts stakeholder notes through a batch endpoint instead of live requests.
+
+    All chunks that are not in the extraction cache or the run checkpoint are
+    written to JSONL batch files, submitted, and polled until the batches finish.
+    Requests are split into several batches to stay within the per-file limits of
+    the endpoint. Submitted batches are recorded in the work directory, so an
+    interrupted run resumes polling the same batches instead of submitting (and
+    paying for) them again. When a batch expires, its partial results are kept and
+    only the requests it did not get to are submitted again.
+
+    Attributes:
+        openai_manager: Manager providing the model, prompts and extraction cache.
+        backend: Batch endpoint to submit to.
+        work_dir: Directory for the batch files and the resume state.
+        poll_interval: Seconds to wait between status checks.
+    """
+
+    REQUESTS_FILE = "batch_requests-{part}.jsonl"
+    STATE_FILE = "batch_state.json"
+    # Limits of a single batch file of the OpenAI Batch API
+    MAX_REQUESTS = 50_000
+    MAX_FILE_BYTES = 200 * 1024 * 1024
+
+    def __init__(
+        self,
+        openai_manager: OpenAIManager,
+        backend: BatchBackend,
+        work_dir: Path,
+        poll_interval: float = BATCH_POLL_INTERVAL,
+    ):
+        self.openai_manager = openai_manager
+        self.backend = backend
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._response_format = response_format(ExtractedStakeholderNotes)
+
+    def build_request(self, index: int, chunk: Chunk) -> dict[str, Any]:
+        """Build the batch request line for a chunk."""
+        return {
+            "custom_id": f"chunk-{index}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.openai_manager.model,
+                "messages": self.openai_manager.build_messages(chunk.text),
+                "response_format": self._response_format,
+            },
+        }
+
+    async def extract_stakeholder_notes(
+        self,
+        chunks: Sequence[Chunk],
+        progress_callback: Callable[[], None] | None = None,
+    ) -> ExtractionResult:
+        """
+        Extract stakeholder notes from all chunks with as few batches as possible.
+
+        Args:
+            chunks: Slack contexts to extract notes from.
+            progress_callback: Called once for every chunk as its result is parsed.
+
+        Returns:
+            The extracted notes in chunk order together with per-chunk failures.
+        """
+        result = ExtractionResult(notes=[None] * len(chunks))
+        keys = [self.openai_manager.cache_key(chunk) for chunk in chunks]
+        pending: list[int] = []
+        for index, key in enumerate(keys):
+            result.notes[index] = self._lookup(key)
+            if result.notes[index] is None:
+                pending.append(index)
+            elif progress_callback:
+                progress_callback()
+
+        if not pending:
+            return result
+
+        logger.info(f"Submitting {len(pending)} of {len(chunks)} chunks as batches")
+        lines = [
+            json.dumps(self.build_request(index, chunks[index])) + "\n"
+            for index in pending
+        ]
+        output, failed = await self._run_batches(pending, lines)
+
+        for index in pending:
+            error = failed.get(index)
+            if error is None:
+                try:
+                    result.notes[index] = self._store(
+                        output.get(f"chunk-{index}"), chunks[index], keys[index]
+                    )
+                except Exception as e:
+                    error = e
+            if error is not None:
+                result.failures[index] = error
+                checkpoint = self.openai_manager.checkpoint
+                if checkpoint is not None:
+                    checkpoint.quarantine(keys[index], chunks[index].text, error)
+            if progress_callback:
+                progress_callback()
+
+        if result.failures:
+            logger.warning(
+                f"{len(result.failures)} of {len(chunks)} chunks failed in the batch"
+            )
+        return result
+
+    def _lookup(self, key: str) -> StakeholderNotes | None:
+        """Return the notes of a chunk from the checkpoint or the cache, if held."""
+        checkpoint = self.openai_manager.checkpoint
+        cache = self.openai_manager.cache
+        notes = checkpoint.get(key) if checkpoint is not None else None
+        if notes is None and cache is not None:
+            notes = cache.get(key)
+        return notes
+
+    def _store(
+        self, line: dict[str, Any] | None, chunk: Chunk, key: str
+    ) -> StakeholderNotes | None:
+        """
+        Parse the result line of a chunk and keep its notes in cache and checkpoint.
+
+        Raises:
+            RuntimeError: If the batch returned no or a failed result for the chunk.
+        """
+        if line is None:
+            raise RuntimeError("No result returned for chunk")
+        notes = self._parse_result(line, chunk)
+        self._record_usage(line, chunk)
+        if notes is not None:
+            if self.openai_manager.cache is not None:
+                self.openai_manager.cache.put(key, notes)
+            if self.openai_manager.checkpoint is not None:
+                self.openai_manager.checkpoint.record(key, notes)
+        return notes
+
+    async def _run_batches(
+        self, pending: list[int], lines: list[str]
+    ) -> tuple[dict[str, Any], dict[int, Exception]]:
+        """
+        Run the request lines of the pending chunks as concurrent batches.
+
+        A batch that fails does not stop the others; only the chunks of its
+        requests fail.
+
+        Returns:
+            The result lines by custom ID, and the error of each chunk whose batch
+            failed.
+        """
+        parts = self._split(lines)
+        outputs = await asyncio.gather(
+            *(
+                self._run_batch(part, part_lines)
+                for part, part_lines in enumerate(parts)
+            ),
+            return_exceptions=True,
+        )
+        output: dict[str, Any] = {}
+        failed: dict[int, Exception] = {}
+        start = 0
+        for part, (part_lines, part_output) in enumerate(
+            zip(parts, outputs, strict=True)
+        ):
+            part_pending = pending[start : start + len(part_lines)]
+            start += len(part_lines)
+            if isinstance(part_output, Exception):
+                logger.error(f"Batch {part} failed: {part_output}")
+                failed.update(dict.fromkeys(part_pending, part_output))
+            elif isinstance(part_output, BaseException):
+                raise part_output
+            else:
+                output.update(part_output)
+        return output, failed
+
+    def _split(self, lines: list[str]) -> list[list[str]]:
+        """Split request lines into batches within the request and size limits."""
+        parts: list[list[str]] = [[]]
+        size = 0
+        for line in lines:
+            line_size = len(line.encode("utf-8"))
+            if parts[-1] and (
+                len(parts[-1]) >= self.MAX_REQUESTS
+                or size + line_size > self.MAX_FILE_BYTES
+            ):
+                parts.append([])
+                size = 0
+            parts[-1].append(line)
+            size += line_size
+        return parts
+
+    async def _run_batch(self, part: int, lines: list[str]) -> dict[str, Any]:
+        """
+        Run one batch of request lines to the end and collect its results.
+
+        Requests an expired batch did not get to are submitted again, as long as
+        the batch made progress.
+
+        Returns:
+            The result lines by custom ID.
+        """
+        results: dict[str, Any] = {}
+        while lines:
+            status = await self._wait(part, "".join(lines))
+            collected = len(results)
+            for file_id in (status.output_file_id, status.error_file_id):
+                if file_id is not None:
+                    results.update(await self._download(file_id))
+            if status.status != "expired" or len(results) == collected:
+                break
+            lines = [
+                line for line in lines if json.loads(line)["custom_id"] not in results
+            ]
+            logger.warning(
+                f"Batch expired with {len(lines)} requests left, submitting them again"
+            )
+        return results
+
+    async def _wait(self, part: int, payload: str) -> BatchStatus:
+        """
+        Submit a batch, or resume the one of the same payload, and wait for its end.
+
+        Raises:
+            RuntimeError: If the batch failed.
+        """
+        payload_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        batch_id = self._load_state().get(payload_hash)
+        if batch_id is not None:
+            logger.info(f"Resuming batch {batch_id}")
+        else:
+            requests_path = self.work_dir / self.REQUESTS_FILE.format(part=part)
+            requests_path.write_text(payload, encoding="utf-8")
+            input_file_id = await self.backend.upload(requests_path)
+            batch_id = await self.backend.create(input_file_id)
+            self._save_state(payload_hash, batch_id)
+            logger.info(f"Submitted batch {batch_id}")
+
+        status = await self.backend.retrieve(batch_id)
+        while status.status not in TERMINAL_STATUSES:
+            logger.debug(f"Batch {batch_id} is {status.status}")
+            await asyncio.sleep(self.poll_interval)
+            status = await self.backend.retrieve(batch_id)
+
+        if status.status != "completed":
+            # The batch is dead; forget it so the next run submits a new one.
+            self._save_state(payload_hash, None)
+        if status.status == "failed":
+            raise RuntimeError(f"Batch {batch_id} ended with status {status.status}")
+        return status
+
+    async def _download(self, file_id: str) -> dict[str, Any]:
+        """
+        Return the result lines of a result file by custom ID.
+
+        Requests an expired batch did not get to are left out.
+        """
+        results: dict[str, Any] = {}
+        for line in (await self.backend.download(file_id)).splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if (entry.get("error") or {}).get("code") != EXPIRED_REQUEST_CODE:
+                results[entry["custom_id"]] = entry
+        return results
+
+    def _load_state(self) -> dict[str, str]:
+        """Return the IDs of the submitted batches by payload hash."""
+        state_path = self.work_dir / self.STATE_FILE
+        if not state_path.exists():
+            return {}
+        return json.loads(state_path.read_text(encoding="utf-8"))
+
+    def _save_state(self, payload_hash: str, batch_id: str | None) -> None:
+        """Record the batch of a payload, or forget it when batch_id is None."""
+        state = self._load_state()
+        if batch_id is None:
+            state.pop(payload_hash, None)
+        else:
+            state[payload_hash] = batch_id
+        state_path = self.work_dir / self.STATE_FILE
+        state_path.write_text(json.dumps(state), encoding="utf-8")
+
+    def _record_usage(self, line: dict[str, Any], chunk: Chunk) -> None:
+        """Record the token usage of a successful batch request."""
+        usage = line["response"]["body"].get("usage")
+        self.openai_manager.metrics.record_request(
+            label=chunk.text.partition("\n")[0],
+            latency=None,
+            usage=CompletionUsage.model_validate(usage) if usage else None,
+            batch=True,
+        )
+
+    @staticmethod
+    def _parse_result(line: dict[str, Any], chunk: Chunk) -> StakeholderNotes | None:
+        """Parse one line of a batch result file and resolve its thread IDs."""
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != HTTPStatus.OK:
+            raise RuntimeError(
+                f"Batch request failed: {line.get('error') or response.get('body')}"
+            )
+        message = response["body"]["choices"][0]["message"]
+        if message.get("refusal") or not message.get("content"):
+            logger.warning("No result returned from OpenAI API")
+            return None
+        return chunk.resolve(
+            ExtractedStakeholderNotes.model_validate_json(message["content"])
+        )
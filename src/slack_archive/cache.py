@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import shutil
+import sqlite3
+import time
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from slack_archive.config import (
+    CACHE_EVICT_INTERVAL,
+    CACHE_MAX_AGE_DAYS,
+    CACHE_MAX_MB,
+    EXPORT_CACHE_MAX_AGE_MINUTES,
+)
+from slack_archive.schema import StakeholderNotes
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of extraction results.
+
+    Results are stored in a SQLite database under the cache directory, keyed by a
+    hash of everything that determines the LLM output: the chunk text, the model,
+    the prompt templates and the response schema. Entries older than `max_age`
+    seconds are dropped, and the least recently used entries are evicted once the
+    stored results exceed `max_bytes`. Eviction runs when the cache is opened and
+    closed, and after every `evict_interval` inserts, so a long run stays within
+    the limits too.
+
+    Attributes:
+        db_path: Path to the SQLite database file.
+        max_bytes: Maximum total size of the stored results in bytes.
+        max_age: Maximum age of an entry in seconds.
+        evict_interval: Number of inserts after which entries are evicted.
+        hits: Number of cache hits since the cache was opened.
+        misses: Number of cache misses since the cache was opened.
+    """
+
+    DB_NAME = "extraction_cache.sqlite3"
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = CACHE_MAX_MB * 1024 * 1024,
+        max_age: float = CACHE_MAX_AGE_DAYS * 24 * 3600,
+        evict_interval: int = CACHE_EVICT_INTERVAL,
+    ):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = cache_dir / self.DB_NAME
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                notes TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_accessed_at ON extractions (accessed_at)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(chunk: str, model: str, prompts: dict[str, str], schema: str) -> str:
+        """
+        Build the cache key for a chunk.
+
+        Args:
+            chunk: The Slack context sent to the model.
+            model: Name of the model used for extraction.
+            prompts: Prompt templates used to build the request.
+            schema: Serialized JSON schema of the response format.
+
+        Returns:
+            A hex SHA-256 digest identifying the extraction request.
+        """
+        payload: dict[str, Any] = {
+            "chunk": chunk,
+            "model": model,
+            "prompts": prompts,
+            "schema": schema,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> StakeholderNotes | None:
+        """
+        Look up a cached extraction result.
+
+        Args:
+            key: Cache key from `make_key`.
+
+        Returns:
+            The cached StakeholderNotes, or None if the key is missing or expired.
+        """
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT notes FROM extractions WHERE key = ? AND created_at >= ?",
+            (key, now - self.max_age),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self._conn.execute(
+            "UPDATE extractions SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self._conn.commit()
+        self.hits += 1
+        return StakeholderNotes.model_validate_json(row[0])
+
+    def put(self, key: str, notes: StakeholderNotes) -> None:
+        """
+        Store an extraction result.
+
+        Args:
+            key: Cache key from `make_key`.
+            notes: The parsed extraction result to store.
+        """
+        now = time.time()
+        payload = notes.model_dump_json()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?)",
+            (key, payload, len(payload.encode("utf-8")), now, now),
+        )
+        self._conn.commit()
+        self._inserts += 1
+        if self._inserts % self.evict_interval == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries and trim the cache down to `max_bytes`.
+
+        Returns:
+            The number of evicted entries.
+        """
+        with self._conn:
+            evicted = self._conn.execute(
+                "DELETE FROM extractions WHERE created_at < ?",
+                (time.time() - self.max_age,),
+            ).rowcount
+
+            (total,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM extractions"
+            ).fetchone()
+            if total > self.max_bytes:
+                # Walk entries from least to most recently used and delete until the
+                # remaining total fits into the budget.
+                excess = total - self.max_bytes
+                stale: list[tuple[str]] = []
+                for key, size in self._conn.execute(
+                    "SELECT key, size FROM extractions ORDER BY accessed_at"
+                ):
+                    if excess <= 0:
+                        break
+                    stale.append((key,))
+                    excess -= size
+                self._conn.executemany("DELETE FROM extractions WHERE key = ?", stale)
+                evicted += len(stale)
+
+        if evicted:
+            logger.debug(f"Evicted {evicted} entries from extraction cache")
+        return evicted
+
+    def close(self) -> None:
+        """Evict stale entries and close the database connection."""
+        self.evict()
+        self._conn.close()
+        logger.info(f"Extraction cache: {self.hits} hits, {self.misses} misses")
+
+
+class ExportCache:
+    """
+    Cache of finished slackdump exports, keyed by channels and time range.
+
+    Exports are stored as files under the `exports` directory of the cache. An
+    export of a closed time range does not change, so it is kept indefinitely; an
+    export that runs up to now is only reused while it is younger than
+    `max_open_age` seconds, so new messages are picked up.
+
+    Attributes:
+        export_dir: Directory of the cached exports.
+        max_open_age: Maximum age in seconds of a reused export without an end time.
+    """
+
+    DIR_NAME = "exports"
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_open_age: float = EXPORT_CACHE_MAX_AGE_MINUTES * 60,
+    ):
+        self.export_dir = cache_dir / self.DIR_NAME
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self.max_open_age = max_open_age
+
+    def path_for(
+        self,
+        channels: Sequence[str],
+        time_from: datetime | None = None,
+        time_to: datetime | None = None,
+    ) -> Path:
+        """Return the path of the cached export of channels within a time range."""
+        payload = {
+            "channels": sorted(channels),
+            "from": time_from.isoformat() if time_from else None,
+            "to": time_to.isoformat() if time_to else None,
+        }
+        encoded = json.dumps(payload, sort_keys=True)
+        key = hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+        return self.export_dir / f"{key}.txt"
+
+    def get(
+        self,
+        channels: Sequence[str],
+        time_from: datetime | None = None,
+        time_to: datetime | None = None,
+    ) -> Path | None:
+        """
+        Look up a cached export.
+
+        Args:
+            channels: IDs of the exported channels; empty for the whole workspace.
+            time_from: Start of the exported time range, if any.
+            time_to: End of the exported time range, if any.
+
+        Returns:
+            The path of the cached export, or None if it is missing or expired.
+        """
+        path = self.path_for(channels, time_from, time_to)
+        if not path.exists():
+            return None
+        if time_to is None and time.time() - path.stat().st_mtime > self.max_open_age:
+            return None
+        return path
+
+    def put(
+        self,
+        export_path: Path,
+        channels: Sequence[str],
+        time_from: datetime | None = None,
+        time_to: datetime | None = None,
+    ) -> None:
+        """Store a copy of a finished export."""
+        path = self.path_for(channels, time_from, time_to)
+        tmp_path = path.with_suffix(".tmp")
+        shutil.copyfile(export_path, tmp_path)
+        tmp_path.replace(path)
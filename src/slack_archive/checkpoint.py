@@ -0,0 +1,109 @@
+import json
+import logging
+from pathlib import Path
+
+from slack_archive.schema import StakeholderNotes
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Append-only record of the chunks extracted by a run.
+
+    Every chunk result is appended to a JSONL file as soon as it arrives, keyed by
+    the extraction cache key of the chunk, so a run that is interrupted or crashes
+    can be resumed without paying for the finished chunks again. Chunks that fail
+    are appended to a separate quarantine file together with their text and the
+    error, for inspection; they are retried when the run is resumed.
+
+    Attributes:
+        path: Path to the checkpoint JSONL file.
+        quarantine_path: Path to the JSONL file of failed chunks.
+    """
+
+    FILE_NAME = "checkpoint.jsonl"
+    QUARANTINE_FILE_NAME = "quarantine.jsonl"
+
+    def __init__(self, state_dir: Path, resume: bool = False):
+        """
+        Open the checkpoint of a state directory.
+
+        Args:
+            state_dir: Directory holding the checkpoint files.
+            resume: Whether to keep the results of the previous run. Otherwise the
+                checkpoint starts out empty.
+        """
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self.path = state_dir / self.FILE_NAME
+        self.quarantine_path = state_dir / self.QUARANTINE_FILE_NAME
+        self._results: dict[str, StakeholderNotes] = {}
+
+        if resume:
+            self._drop_unfinished_line(self.path)
+            self._drop_unfinished_line(self.quarantine_path)
+            self._load()
+        else:
+            self.clear()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            logger.info(f"No checkpoint at {self.path}, starting from scratch")
+            return
+        with open(self.path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                try:
+                    entry = json.loads(line)
+                    notes = StakeholderNotes.model_validate(entry["notes"])
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping checkpoint line {line_number}: {e}")
+                    continue
+                self._results[entry["key"]] = notes
+        logger.info(f"Resuming with {len(self._results)} checkpointed chunks")
+
+    @staticmethod
+    def _drop_unfinished_line(path: Path) -> None:
+        """
+        Cut off a last line that a crash left unfinished mid-write.
+
+        Otherwise the next appended entry would continue that line and be lost along
+        with it.
+        """
+        if not path.exists():
+            return
+        data = path.read_bytes()
+        if not data or data.endswith(b"\n"):
+            return
+        logger.warning(f"Dropping the unfinished last line of {path}")
+        with open(path, "rb+") as file:
+            file.truncate(data.rfind(b"\n") + 1)
+
+    def get(self, key: str) -> StakeholderNotes | None:
+        """Return the checkpointed result of a chunk, or None if it is missing."""
+        return self._results.get(key)
+
+    def record(self, key: str, notes: StakeholderNotes) -> None:
+        """Append the result of a chunk to the checkpoint."""
+        self._results[key] = notes
+        self._append(self.path, {"key": key, "notes": notes.model_dump(mode="json")})
+
+    def quarantine(self, key: str, chunk: str, error: Exception) -> None:
+        """Record a chunk that failed, so it can be inspected and retried."""
+        self._append(
+            self.quarantine_path,
+            {"key": key, "error": f"{type(error).__name__}: {error}", "chunk": chunk},
+        )
+
+    def clear(self) -> None:
+        """Remove all checkpointed results and quarantined chunks."""
+        self._results.clear()
+        self.path.unlink(missing_ok=True)
+        self.quarantine_path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def _append(path: Path, entry: dict[str, object]) -> None:
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
@@ -1,114 +1,471 @@
-import re
-from collections.abc import Generator, Iterator
+import hashlib
+import logging
+import os
+from collections.abc import Generator, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cache, cached_property
+from itertools import islice, pairwise
 from pathlib import Path
-
-import tiktoken
+from typing import TYPE_CHECKING
 
 from slack_archive.config import (
     SLACK_DUMP_PATH,
+    TIKTOKEN_CACHE_DIR,
+    TOKENIZER_BATCH_SIZE,
+    TOKENIZER_THREADS,
+)
+from slack_archive.noise import NoiseFilter
+from slack_archive.resolver import FingerprintResolver
+from slack_archive.schema import (
+    ExtractedStakeholderNotes,
+    StakeholderNote,
+    StakeholderNotes,
 )
+from slack_archive.thread import REPLY_PATTERN, THREAD_PATTERN, Thread, ThreadStore
+from slack_archive.thread_index import ThreadIndex
+
+if TYPE_CHECKING:
+    import tiktoken
 
+logger = logging.getLogger(__name__)
 
-class Thread:
-    def __init__(self, fingerprint: str, content: str):
-        self.fingerprint = fingerprint.strip()
-        self.content = content
+# Upper bound of the thread IDs in a chunk, used to reserve room for labels
+MAX_THREAD_ID = 9999
+
+
+@cache
+def get_encoding(model_name: str) -> "tiktoken.Encoding":
+    """
+    Load the tokenizer of a model, once per process.
 
-    def __str__(self):
-        return f"{self.fingerprint}\n{self.content}"
+    tiktoken is only imported here, so commands that never tokenize do not pay
+    for it. Its BPE files are kept in TIKTOKEN_CACHE_DIR, so they are only
+    downloaded on the first run and later runs work offline.
 
-    def __repr__(self):
-        return f"Thread(fingerprint={self.fingerprint}, content={self.content[:100]})"
+    Args:
+        model_name: Name of the GPT model.
+
+    Returns:
+        The tokenizer of the model.
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(TIKTOKEN_CACHE_DIR))
+    import tiktoken  # ruff: ignore[import-outside-top-level]
+
+    return tiktoken.encoding_for_model(model_name)
+
+
+@dataclass
+class Chunk:
+    """
+    A chunk of conversation sent to the model in a single request.
+
+    Every thread in the chunk is labelled with a short per-chunk ID, so the model can
+    reference threads by ID instead of echoing their full fingerprints.
+
+    Attributes:
+        text: The conversation text, with each thread prefixed by its label.
+        thread_ids: Map of thread IDs to the fingerprints of the labelled threads.
+        token_count: Tokens of the text as counted by the chunker, or 0 if unknown.
+    """
+
+    text: str
+    thread_ids: dict[int, str] = field(default_factory=dict)
+    token_count: int = 0
+
+    @staticmethod
+    def label(thread_id: int) -> str:
+        """Return the label that precedes a thread in the chunk text."""
+        return f"[{thread_id}] "
+
+    def resolve(self, extracted: ExtractedStakeholderNotes) -> StakeholderNotes:
+        """
+        Map the thread IDs returned by the model back to thread fingerprints.
+
+        IDs that do not belong to this chunk are dropped with a warning.
+
+        Args:
+            extracted: Notes as returned by the model.
+
+        Returns:
+            The notes with fingerprints in place of thread IDs.
+        """
+        notes: list[StakeholderNote] = []
+        for note in extracted.stakeholder_notes:
+            fingerprints: list[str] = []
+            for thread_id in note.relevant_thread_ids:
+                fingerprint = self.thread_ids.get(thread_id)
+                if fingerprint is None:
+                    logger.warning(f"Ignoring unknown thread ID {thread_id}")
+                elif fingerprint not in fingerprints:
+                    fingerprints.append(fingerprint)
+            notes.append(
+                StakeholderNote(
+                    **note.model_dump(exclude={"relevant_thread_ids"}),
+                    relevant_slack_threads=fingerprints,
+                )
+            )
+        return StakeholderNotes(stakeholder_notes=notes)
+
+
+@dataclass
+class _OpenChunk:
+    """A chunk that is still being filled by the packer."""
+
+    parts: list[tuple[str, str]] = field(default_factory=list)
+    token_count: int = 0
+
+    def add(self, key: str, text: str, token_count: int) -> None:
+        self.parts.append((key, text))
+        self.token_count += token_count
+
+    def text(self) -> str:
+        return "".join(text for _, text in self.parts)
+
+    def to_chunk(self) -> Chunk:
+        return Chunk(
+            text="".join(
+                Chunk.label(thread_id) + text
+                for thread_id, (_, text) in enumerate(self.parts, start=1)
+            ),
+            thread_ids={
+                thread_id: key for thread_id, (key, _) in enumerate(self.parts, start=1)
+            },
+            token_count=self.token_count,
+        )
 
 
 class ConversationProcessor:
     """
     Processes and chunks slack dump data.
 
-    Reads a slack dump file, extracts individual threads, and provides methods
-    to chunk the conversation into smaller parts based on a specified chunk size.
+    Streams threads from a slack dump file, and provides methods to chunk the
+    conversation into smaller parts based on a specified chunk size. The dump is
+    memory-mapped and threads are decoded as they are chunked, so the text of the
+    whole dump is never held in memory.
 
     Attributes:
         file_path: Path to the slack dump file.
         model_name: Name of the GPT model to use for tokenization.
-        chunk_size: Maximum number of tokens for each chunk.
-        encoding: Tokenizer for the specified model.
-        thread_map: Map of thread fingerprints to Thread objects.
+        chunk_size: Maximum number of tokens for each request, including the
+            prompt and schema overhead.
+        prompt_overhead: Text sent along with every chunk.
+        reserved_tokens: Tokens of the chunk size taken up by the prompt and schema,
+            counted on first access.
+        encoding: Tokenizer for the specified model, loaded on first access.
+        thread_map: Index of thread fingerprints to Thread objects, backed by a
+            sidecar index file next to the dump and loaded on first access.
+        fingerprint_resolver: Resolver of possibly inexact fingerprints to the
+            fingerprints of thread_map, built on first access.
+        noise_filter: Filter removing threads without content before they are
+            chunked, or None to chunk every thread.
     """
 
     # this is the fingerprint of message. example:
     # > alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
-    THREAD_PATTERN = r"^(> .+? \@\s*\d{2}\/\d{2}\/\d{4} \d{2}:\d{2}:\d{2} Z:)"
+    THREAD_PATTERN = THREAD_PATTERN
 
     def __init__(
-        self, file_path: Path, model_name: str = "gpt-4o", chunk_size: int = 28000
+        self,
+        file_path: Path,
+        model_name: str = "gpt-4o",
+        chunk_size: int = 28000,
+        prompt_overhead: str = "",
+        noise_filter: NoiseFilter | None = None,
     ):
+        """
+        Initialize the processor.
+
+        Args:
+            file_path: Path to the slack dump file.
+            model_name: Name of the GPT model to use for tokenization.
+            chunk_size: Maximum number of tokens for each request.
+            prompt_overhead: Text sent along with every chunk, such as the prompts
+                and response schema. Its tokens are reserved in every chunk.
+            noise_filter: Filter removing threads without content before they are
+                chunked. Its stats are logged after every pass over the threads.
+        """
         self.file_path = file_path
         self.model_name = model_name
         self.chunk_size = chunk_size
-        self.encoding = tiktoken.encoding_for_model(model_name)
+        self.prompt_overhead = prompt_overhead
+        self.noise_filter = noise_filter
+        self._token_counts: dict[bytes, int] = {}
+        # tiktoken releases the GIL while encoding, so a thread pool scales with
+        # cores. A single thread skips the pool overhead entirely.
+        self._tokenizer_pool = (
+            ThreadPoolExecutor(TOKENIZER_THREADS) if TOKENIZER_THREADS > 1 else None
+        )
+
+    @cached_property
+    def encoding(self) -> "tiktoken.Encoding":
+        """Tokenizer for the model, shared by all processors of the process."""
+        return get_encoding(self.model_name)
+
+    @cached_property
+    def reserved_tokens(self) -> int:
+        """Tokens of the chunk size taken up by the prompt and schema."""
+        return len(self.encoding.encode(self.prompt_overhead))
 
-        self.thread_map = self._extract_threads()
+    @cached_property
+    def thread_map(self) -> ThreadIndex:
+        """Index of thread fingerprints to Thread objects."""
+        return ThreadIndex.load_or_build(self.file_path)
 
-    def _extract_threads(self) -> dict[str, Thread]:
+    @cached_property
+    def fingerprint_resolver(self) -> FingerprintResolver:
+        """Resolver of fingerprints returned by the model to threads of the dump."""
+        return FingerprintResolver(self.thread_map.keys())
+
+    def iter_threads(self) -> Generator[Thread, None, None]:
         """
-        Extract individual threads from the slack dump file.
+        Stream threads from the slack dump file.
 
-        Returns:
-            A dictionary mapping thread fingerprints to Thread objects.
+        The file is memory-mapped and every line matching THREAD_PATTERN starts a
+        new thread. Threads are views into the map, so their text is only decoded
+        when it is used, and the map is released once the last of them is gone.
+        Text before the first fingerprint is ignored.
+
+        Yields Thread objects in file order, including repeated fingerprints.
         """
-        with open(self.file_path, encoding="utf-8") as file:
-            conversation_text = file.read()
+        yield from ThreadStore.from_file(self.file_path)
 
-        threads = re.split(self.THREAD_PATTERN, conversation_text, flags=re.MULTILINE)
-        return {
-            threads[i].strip().removeprefix("> "): Thread(
-                threads[i], threads[i] + threads[i + 1]
-            )
-            for i in range(1, len(threads) - 1, 2)
-        }
+    @property
+    def chunk_budget(self) -> int:
+        """Tokens available for conversation text in each chunk."""
+        return self.chunk_size - self.reserved_tokens
 
-    def chunk_conversation(self) -> Generator[str, None, None]:
+    def chunk_conversation(
+        self, threads: Iterable[Thread] | None = None
+    ) -> Generator[str, None, None]:
         """
         Chunk the conversation into smaller parts based on the specified chunk size.
 
-        Yields chunks of the conversation, each within the specified chunk size.
+        Args:
+            threads: Threads to chunk. Defaults to all threads of the conversation.
+
+        Yields the text of each chunk without thread labels, see `iter_chunks`.
         """
-        current_chunk = ""
-        current_token_count = 0
+        for open_chunk in self._pack(threads):
+            yield open_chunk.text()
 
-        for thread in self.get_threads():
-            thread_tokens = self.encoding.encode(str(thread))
+    def iter_chunks(
+        self, threads: Iterable[Thread] | None = None
+    ) -> Generator[Chunk, None, None]:
+        """
+        Chunk the conversation into labelled chunks for extraction.
 
-            if current_token_count + len(thread_tokens) <= self.chunk_size:
-                current_chunk += str(thread)
-                current_token_count += len(thread_tokens)
-            else:
-                yield current_chunk
-                current_chunk = str(thread)
-                current_token_count = len(thread_tokens)
+        Args:
+            threads: Threads to chunk. Defaults to all threads of the conversation.
 
-        if current_chunk:
-            yield current_chunk
+        Yields chunks whose threads are labelled with per-chunk IDs, each within the
+        chunk budget including the labels.
+        """
+        for open_chunk in self._pack(threads):
+            yield open_chunk.to_chunk()
 
-    def get_thread_content(self, fingerprint: str) -> str:
+    def _pack(
+        self, threads: Iterable[Thread] | None
+    ) -> Generator[_OpenChunk, None, None]:
+        """
+        Pack threads into chunks.
+
+        Threads are packed strictly in order: a chunk is emitted as soon as the next
+        thread does not fit into it, so threads, and the parts of a split thread,
+        stay in dump order. Threads longer than the chunk budget are split at reply
+        boundaries first. The tokens of the thread label are counted along with
+        every thread. Noise is filtered out first, if the processor has a noise
+        filter.
+        """
+        thread_iter = iter(self.get_threads() if threads is None else threads)
+        if self.noise_filter is not None:
+            thread_iter = self.noise_filter.filter(thread_iter, self.count_tokens)
+        budget = self.chunk_budget
+        chunk = _OpenChunk()
+
+        for key, text, token_count in self._pack_units(thread_iter):
+            if (
+                chunk.token_count + self._next_label_tokens(chunk) + token_count
+                > budget
+            ):
+                yield chunk
+                chunk = _OpenChunk()
+            chunk.add(key, text, self._next_label_tokens(chunk) + token_count)
+
+        if chunk.parts:
+            yield chunk
+        if self.noise_filter is not None:
+            self.noise_filter.log_stats()
+
+    def _next_label_tokens(self, chunk: _OpenChunk) -> int:
+        """Return the number of tokens of the label of the next thread in a chunk."""
+        return self._label_tokens(len(chunk.parts) + 1)
+
+    def _label_tokens(self, thread_id: int) -> int:
+        """Return the number of tokens of a thread label."""
+        (token_count,) = self.count_tokens([Chunk.label(thread_id)])
+        return token_count
+
+    def _pack_units(
+        self, threads: Iterator[Thread]
+    ) -> Generator[tuple[str, str, int], None, None]:
+        """
+        Render threads into texts that each fit into the chunk budget.
+
+        Room for the largest thread label is left in every text, so a labelled
+        thread always fits into an empty chunk.
+
+        Yields (thread key, text, token count) triples, one per thread or per part
+        of a split thread.
+        """
+        budget = self.unit_budget
+        while batch := list(islice(threads, TOKENIZER_BATCH_SIZE)):
+            texts = [str(thread) for thread in batch]
+            token_counts = self.count_tokens(texts)
+            for thread, text, token_count in zip(
+                batch, texts, token_counts, strict=True
+            ):
+                if token_count <= budget:
+                    yield thread.key, text, token_count
+                else:
+                    for part, part_tokens in self._split_thread(thread, text):
+                        yield thread.key, part, part_tokens
+
+    @property
+    def unit_budget(self) -> int:
+        """Tokens available for a single thread, leaving room for its label."""
+        return self.chunk_budget - self._label_tokens(MAX_THREAD_ID)
+
+    def _split_thread(
+        self, thread: Thread, text: str
+    ) -> Generator[tuple[str, int], None, None]:
+        """
+        Split a thread that exceeds the chunk budget at reply boundaries.
+
+        Every part after the first starts with the parent fingerprint, so the model
+        can still attribute the replies. A single message that exceeds the budget on
+        its own is split by tokens.
+
+        Yields (text, token count) pairs of the parts.
+        """
+        budget = self.unit_budget
+        header = f"{thread.fingerprint}\n"
+        (header_tokens,) = self.count_tokens([header])
+
+        boundaries = [match.start() for match in REPLY_PATTERN.finditer(text)]
+        segments = [
+            text[start:end] for start, end in pairwise([0, *boundaries, len(text)])
+        ]
+        parts: list[str] = []
+        part_tokens = 0
+
+        for index, (segment, segment_tokens) in enumerate(
+            zip(segments, self.count_tokens(segments), strict=True)
+        ):
+            if header_tokens + segment_tokens > budget:
+                if parts:
+                    yield "".join(parts), part_tokens
+                    parts, part_tokens = [], 0
+                yield from self._split_tokens(
+                    header, header_tokens, segment, continued=index > 0
+                )
+                continue
+
+            if parts and part_tokens + segment_tokens > budget:
+                yield "".join(parts), part_tokens
+                parts, part_tokens = [], 0
+            if not parts and index > 0:
+                parts, part_tokens = [header], header_tokens
+            parts.append(segment)
+            part_tokens += segment_tokens
+
+        if parts:
+            yield "".join(parts), part_tokens
+
+    def _split_tokens(
+        self, header: str, header_tokens: int, text: str, continued: bool
+    ) -> Generator[tuple[str, int], None, None]:
+        """
+        Split a single message that exceeds the chunk budget by tokens.
+
+        Every part after the first is prefixed with the header, and so is the first
+        when the message is `continued` from an earlier part, i.e. a reply. The
+        parent message already starts with the fingerprint.
+
+        Yields (text, token count) pairs of the parts.
+        """
+        tokens = self.encoding.encode(text)
+        prefix, prefix_tokens = (header, header_tokens) if continued else ("", 0)
+        start = 0
+        while start < len(tokens):
+            piece = tokens[start : start + self.unit_budget - prefix_tokens]
+            yield prefix + self.encoding.decode(piece), prefix_tokens + len(piece)
+            start += len(piece)
+            prefix, prefix_tokens = header, header_tokens
+
+    def count_tokens(self, texts: Sequence[str]) -> list[int]:
+        """
+        Count the tokens of several texts.
+
+        Counts are cached by content hash, so only texts that have not been counted
+        before are tokenized, as one batch spread over the tokenizer thread pool.
+
+        Args:
+            texts: The texts to count.
+
+        Returns the token count of each text, in order.
+        """
+        digests = [
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            for text in texts
+        ]
+        uncounted = {
+            digest: text
+            for digest, text in zip(digests, texts, strict=True)
+            if digest not in self._token_counts
+        }
+        if uncounted:
+            if self._tokenizer_pool is None:
+                encoded = map(self.encoding.encode, uncounted.values())
+            else:
+                encoded = self._tokenizer_pool.map(
+                    self.encoding.encode, uncounted.values()
+                )
+            self._token_counts.update(zip(uncounted, map(len, encoded), strict=True))
+        return [self._token_counts[digest] for digest in digests]
+
+    def get_thread_content(self, fingerprint: str, occurrence: int = 0) -> str:
         """
         Retrieve the full content of a specific thread.
 
         Args:
             fingerprint: The fingerprint of the desired thread.
+            occurrence: Which of the threads sharing this fingerprint to retrieve.
 
         Returns the full content of the specified thread.
         """
-        return str(self.thread_map[fingerprint])
+        return str(self.thread_map.thread(fingerprint, occurrence))
+
+    def get_thread_contents(self, fingerprint: str) -> list[str]:
+        """
+        Retrieve the full content of all threads sharing a fingerprint.
+
+        Args:
+            fingerprint: The fingerprint of the desired threads.
+
+        Returns the full content of every thread with this fingerprint, in file order.
+        """
+        return [str(thread) for thread in self.thread_map.get_all(fingerprint)]
 
     def get_threads(self) -> Generator[Thread, None, None]:
         """
         Get a generator of all Thread objects in the conversation.
 
+        Threads are streamed from the dump file, see `iter_threads`.
+
         Yields Thread objects representing individual messages in the conversation.
         """
-        yield from self.thread_map.values()
+        yield from self.iter_threads()
 
     def get_fingerprints(self) -> Iterator[str]:
         """
@@ -130,9 +487,7 @@ if __name__ == "__main__":
     last_chunk_save_path = "data/last_chunk.txt"
 
     # More efficient way to get the first 3 items
-    for i, fingerprint in enumerate(processor.get_fingerprints()):
-        if i >= 3:  # noqa: PLR2004
-            break
+    for fingerprint in islice(processor.get_fingerprints(), 3):
         thread = processor.get_thread_content(fingerprint)
         print(f"Fingerprint: {fingerprint}")
         print(f"Full text: {thread[:100]}...")
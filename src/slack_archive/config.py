@@ -9,10 +9,83 @@ load_dotenv()
 
 # Default configuration settings
 DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "1"))
+MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT", "8"))
+
+# Requests and tokens per minute of the OpenAI account, until the x-ratelimit-*
+# response headers report the real limits
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "500"))
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", "200000"))
+# Retries of rate-limited, failed or timed out requests, and the base backoff delay
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "6"))
+API_RETRY_DELAY = float(os.getenv("API_RETRY_DELAY", "1"))
+
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+WORKSPACE_WORKERS = int(os.getenv("WORKSPACE_WORKERS", str(os.cpu_count() or 1)))
+
+# Number of day files of a Slack JSON export loaded at once
+JSON_INGEST_WORKERS = int(os.getenv("JSON_INGEST_WORKERS", "4"))
+
+# Tokenization settings
+TOKENIZER_THREADS = int(os.getenv("TOKENIZER_THREADS", str(os.cpu_count() or 1)))
+TOKENIZER_BATCH_SIZE = int(os.getenv("TOKENIZER_BATCH_SIZE", "256"))
+
+# Noise filters applied to threads before chunking, by name; empty to keep all.
+# "emoji_only" and "short" can drop terse but relevant replies, so they are opt-in.
+_DEFAULT_NOISE_FILTERS = "membership,bots"
+NOISE_FILTERS = tuple(
+    filter(None, os.getenv("NOISE_FILTERS", _DEFAULT_NOISE_FILTERS).split(","))
+)
+# Threads with fewer words are noise, and these user IDs are bots
+NOISE_MIN_WORDS = int(os.getenv("NOISE_MIN_WORDS", "3"))
+NOISE_BOT_USERS = tuple(os.getenv("NOISE_BOT_USERS", "USLACKBOT").split(","))
+
+# Relevance triage before extraction: a model trained on an earlier run with the
+# `triage train` command, or else words marking relevant threads
+_TRIAGE_MODEL = os.getenv("TRIAGE_MODEL")
+TRIAGE_MODEL_PATH = Path(_TRIAGE_MODEL) if _TRIAGE_MODEL else None
+TRIAGE_KEYWORDS = tuple(filter(None, os.getenv("TRIAGE_KEYWORDS", "").split(",")))
+# Training keeps this share of the threads cited by notes, as estimated by
+# cross-validation over this many folds
+TRIAGE_MIN_RECALL = float(os.getenv("TRIAGE_MIN_RECALL", "0.95"))
+TRIAGE_FOLDS = int(os.getenv("TRIAGE_FOLDS", "5"))
+
+# Number of threads writing markdown files
+MARKDOWN_WRITERS = int(os.getenv("MARKDOWN_WRITERS", "8"))
 
 # File paths
 SLACK_DUMP_PATH = Path(os.getenv("SLACK_DUMP_PATH", "data/C04HSTQAK0S.txt"))
+CACHE_DIR = Path(
+    os.getenv("SLACK_ARCHIVE_CACHE_DIR", Path.home() / ".cache" / "slack-archive")
+)
+# Where tiktoken keeps its BPE files, so tokenizers load without network access
+TIKTOKEN_CACHE_DIR = Path(os.getenv("TIKTOKEN_CACHE_DIR", CACHE_DIR / "tiktoken"))
+# SQLite archive of the threads of all runs, searched by the `search` command
+ARCHIVE_PATH = Path(os.getenv("THREAD_ARCHIVE_PATH", CACHE_DIR / "threads.sqlite3"))
+
+# Number of slackdump exports running at once
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "4"))
+# Exports without an end time are reused from the cache for this many minutes
+EXPORT_CACHE_MAX_AGE_MINUTES = float(os.getenv("EXPORT_CACHE_MAX_AGE_MINUTES", "60"))
+
+# Extraction cache limits
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "256"))
+CACHE_MAX_AGE_DAYS = int(os.getenv("CACHE_MAX_AGE_DAYS", "90"))
+# The extraction cache is trimmed to its limits after this many inserts
+CACHE_EVICT_INTERVAL = int(os.getenv("CACHE_EVICT_INTERVAL", "100"))
+
+# Incremental runs keep threads open for new replies for this many days
+INCREMENTAL_OPEN_DAYS = int(os.getenv("INCREMENTAL_OPEN_DAYS", "30"))
+
+# Fingerprint resolution: timestamp tolerance and minimum fuzzy match score (0-100)
+FINGERPRINT_TOLERANCE_SECONDS = float(os.getenv("FINGERPRINT_TOLERANCE_SECONDS", "2"))
+FUZZY_MATCH_CUTOFF = float(os.getenv("FUZZY_MATCH_CUTOFF", "90"))
+
+# Note deduplication: maximum days between duplicates and minimum similarity (0-100)
+DEDUP_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "1"))
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "80"))
+
+# Streaming deduplication: chunks without a duplicate after which clusters are dropped
+DEDUP_RETAIN_CHUNKS = int(os.getenv("DEDUP_RETAIN_CHUNKS", "50"))
 
 # Logging configuration
 LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO"))
@@ -0,0 +1,237 @@
+import logging
+import re
+from collections.abc import Iterable
+from datetime import date
+
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+
+from slack_archive.config import DEDUP_SIMILARITY, DEDUP_WINDOW_DAYS
+from slack_archive.schema import StakeholderNote
+
+logger = logging.getLogger(__name__)
+
+# Words that do not tell stakeholders apart, e.g. "Acme Inc." and "Acme"
+STAKEHOLDER_STOPWORDS = frozenset({
+    "the",
+    "inc",
+    "ltd",
+    "llc",
+    "gmbh",
+    "corp",
+    "corporation",
+    "co",
+    "company",
+})
+
+# Number of similarity scores from which they are computed on all cores
+PARALLEL_MIN_SCORES = 10_000
+
+
+def normalize_stakeholder(name: str) -> str:
+    """Reduce a stakeholder name to the words that identify it."""
+    words = re.findall(r"\w+", name.casefold())
+    return " ".join(word for word in words if word not in STAKEHOLDER_STOPWORDS)
+
+
+def merge_note(into: StakeholderNote, note: StakeholderNote) -> StakeholderNote:
+    """
+    Merge a duplicate into a note.
+
+    The title and date of the note are kept, the longer summary wins, and the
+    threads of both are combined in order.
+    """
+    return into.model_copy(
+        update={
+            "summary": max(into.summary, note.summary, key=len),
+            "relevant_slack_threads": list(
+                dict.fromkeys(into.relevant_slack_threads + note.relevant_slack_threads)
+            ),
+        }
+    )
+
+
+class NoteDeduplicator:
+    """
+    Merges near-duplicate notes, e.g. of a discussion that spans two chunks.
+
+    Notes are grouped by normalized stakeholder name, and compared with the notes of
+    the same group dated within `window_days` of them. Within such a window, title
+    and summary similarities against all candidates are scored at once with
+    `rapidfuzz.process.cdist`; a note whose mean score reaches `score_cutoff` is
+    merged into its best match, any other note starts a cluster of its own. Notes
+    with a date that is not ISO 8601 are only compared with notes of the exact same
+    date.
+
+    Notes can be added in several calls, e.g. as chunks complete. Each cluster keeps
+    its ID, and its merged note, across calls. With `retain_calls`, clusters that no
+    note was added to during that many calls are dropped, so memory is bounded by
+    the clusters of the last `retain_calls` calls. Eviction goes by arrival rather
+    than by date, so notes may arrive in any date order, e.g. as chunks complete
+    out of order. A late duplicate of a dropped cluster starts a new cluster.
+
+    Attributes:
+        window_days: Maximum number of days between the dates of duplicates.
+        score_cutoff: Minimum mean title and summary similarity (0-100) of
+            duplicates.
+        retain_calls: Number of calls of `add` a cluster is kept for after a note
+            was last added to it, or None to keep all clusters.
+        notes: The merged note of each cluster that is kept, by cluster ID.
+        clusters: Number of clusters created so far, including dropped ones.
+    """
+
+    def __init__(
+        self,
+        window_days: int = DEDUP_WINDOW_DAYS,
+        score_cutoff: float = DEDUP_SIMILARITY,
+        retain_calls: int | None = None,
+    ):
+        self.window_days = window_days
+        self.score_cutoff = score_cutoff
+        # The clusters returned by the last call must still be there.
+        self.retain_calls = None if retain_calls is None else max(retain_calls, 1)
+        self.notes: dict[int, StakeholderNote] = {}
+        self.clusters = 0
+        # The first note of each cluster is what later notes are compared against.
+        self._titles: dict[int, str] = {}
+        self._summaries: dict[int, str] = {}
+        # (stakeholder, unparsed date) -> date ordinal -> IDs of clusters of that day
+        self._days: dict[tuple[str, str | None], dict[int, list[int]]] = {}
+        # Call that last added to each cluster, least recently added to first
+        self._last_added: dict[int, int] = {}
+        # Group and day ordinal of each cluster, to find it again when it is dropped
+        self._placement: dict[int, tuple[tuple[str, str | None], int]] = {}
+        self._calls = 0
+
+    def add(self, notes: Iterable[StakeholderNote]) -> list[int]:
+        """
+        Add notes, merging each into a matching cluster if there is one.
+
+        Args:
+            notes: The notes to add.
+
+        Returns:
+            The IDs of the clusters that were created or changed, in order.
+        """
+        # Dropped before adding, so the notes returned by the last call still exist.
+        self._drop_stale_clusters()
+        self._calls += 1
+        batches: dict[tuple[tuple[str, str | None], int], list[StakeholderNote]] = {}
+        for note in notes:
+            batches.setdefault(self._day(note), []).append(note)
+
+        touched: dict[int, None] = {}
+        for (group, ordinal), batch in batches.items():
+            for cluster_id in self._add_day(group, ordinal, batch):
+                touched[cluster_id] = None
+        for cluster_id in touched:
+            # Moved to the end, so the dict stays ordered by the last call.
+            self._last_added.pop(cluster_id, None)
+            self._last_added[cluster_id] = self._calls
+        return list(touched)
+
+    def _drop_stale_clusters(self) -> None:
+        """Forget the clusters not added to during the last `retain_calls` calls."""
+        if self.retain_calls is None:
+            return
+        cutoff = self._calls - self.retain_calls
+        while self._last_added:
+            cluster_id, call = next(iter(self._last_added.items()))
+            if call > cutoff:
+                break
+            del self._last_added[cluster_id]
+            group, ordinal = self._placement.pop(cluster_id)
+            days = self._days[group]
+            days[ordinal].remove(cluster_id)
+            if not days[ordinal]:
+                del days[ordinal]
+            if not days:
+                del self._days[group]
+            del self.notes[cluster_id]
+            del self._titles[cluster_id]
+            del self._summaries[cluster_id]
+
+    def _add_day(
+        self,
+        group: tuple[str, str | None],
+        ordinal: int,
+        batch: list[StakeholderNote],
+    ) -> list[int]:
+        """Add the notes of one stakeholder and day."""
+        days = self._days.setdefault(group, {})
+        window = self.window_days if group[1] is None else 0
+        # Column j of the scores is candidate cluster j, then note j of the batch.
+        columns = [
+            cluster_id
+            for day in range(ordinal - window, ordinal + window + 1)
+            for cluster_id in days.get(day, [])
+        ]
+        batch_titles = [note.title for note in batch]
+        batch_summaries = [note.summary for note in batch]
+        titles = [self._titles[cluster_id] for cluster_id in columns] + batch_titles
+        summaries = [self._summaries[cluster_id] for cluster_id in columns]
+        summaries += batch_summaries
+        scores = (
+            self._scores(batch_titles, titles)
+            + self._scores(batch_summaries, summaries)
+        ) / 2
+
+        candidates = len(columns)
+        for index, note in enumerate(batch):
+            # Notes later in the batch are not clustered yet.
+            row = scores[index, : candidates + index]
+            best = int(row.argmax()) if len(row) else -1
+            if best >= 0 and row[best] >= self.score_cutoff:
+                cluster_id = columns[best]
+                self.notes[cluster_id] = merge_note(self.notes[cluster_id], note)
+            else:
+                cluster_id = self.clusters
+                self.clusters += 1
+                self.notes[cluster_id] = note
+                self._titles[cluster_id] = note.title
+                self._summaries[cluster_id] = note.summary
+                self._add_cluster(group, ordinal, cluster_id)
+            columns.append(cluster_id)
+        return columns[candidates:]
+
+    def _add_cluster(
+        self, group: tuple[str, str | None], ordinal: int, cluster_id: int
+    ) -> None:
+        self._days.setdefault(group, {}).setdefault(ordinal, []).append(cluster_id)
+        self._placement[cluster_id] = (group, ordinal)
+
+    @staticmethod
+    def _scores(queries: list[str], choices: list[str]) -> np.ndarray:
+        return process.cdist(
+            queries,
+            choices,
+            scorer=fuzz.token_set_ratio,
+            processor=utils.default_process,
+            # Starting threads costs more than scoring small matrices.
+            workers=-1 if len(queries) * len(choices) >= PARALLEL_MIN_SCORES else 1,
+        )
+
+    @staticmethod
+    def _day(note: StakeholderNote) -> tuple[tuple[str, str | None], int]:
+        """Return the group and day ordinal of a note."""
+        stakeholder = normalize_stakeholder(note.stakeholder_name)
+        try:
+            return (stakeholder, None), date.fromisoformat(note.date[:10]).toordinal()
+        except ValueError:
+            return (stakeholder, note.date), 0
+
+
+def deduplicate_notes(notes: list[StakeholderNote]) -> list[StakeholderNote]:
+    """
+    Merge near-duplicate notes, see `NoteDeduplicator`.
+
+    Args:
+        notes: The notes to deduplicate.
+
+    Returns:
+        One merged note per cluster of duplicates.
+    """
+    deduplicator = NoteDeduplicator()
+    deduplicator.add(notes)
+    logger.info(f"Merged {len(notes)} notes into {len(deduplicator.notes)}")
+    return list(deduplicator.notes.values())
@@ -0,0 +1,225 @@
+import json
+import logging
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from slack_archive.config import INCREMENTAL_OPEN_DAYS
+from slack_archive.schema import StakeholderNote
+from slack_archive.thread import Thread
+
+logger = logging.getLogger(__name__)
+
+# Directory inside an output directory that holds the incremental run state
+STATE_DIR_NAME = ".slack_archive"
+
+
+@dataclass
+class ChannelWatermark:
+    """
+    High-water mark of what has already been processed for a channel.
+
+    Attributes:
+        last_timestamp: Start time of the newest thread processed so far.
+        open_threads: Fingerprints of threads that may still receive replies, mapped
+            to the number of replies they had when they were last processed.
+        latest_threads: Fingerprints of the threads started at `last_timestamp`.
+            Timestamps only have second precision, so a thread started in the same
+            second as the newest processed one is told apart by its fingerprint.
+    """
+
+    last_timestamp: datetime | None = None
+    open_threads: dict[str, int] = field(default_factory=dict)
+    latest_threads: set[str] = field(default_factory=set)
+
+    def is_pending(self, thread: Thread) -> bool:
+        """
+        Check whether a thread is new or has new replies since the last run.
+
+        Args:
+            thread: The thread to check.
+
+        Returns:
+            True if the thread needs to be (re-)extracted.
+        """
+        if self.last_timestamp is None or thread.timestamp > self.last_timestamp:
+            return True
+        if (
+            thread.timestamp == self.last_timestamp
+            and thread.key not in self.latest_threads
+        ):
+            return True
+        seen_replies = self.open_threads.get(thread.key)
+        return seen_replies is not None and thread.reply_count > seen_replies
+
+    def advance(
+        self,
+        threads: Iterable[Thread],
+        open_window: timedelta = timedelta(days=INCREMENTAL_OPEN_DAYS),
+    ) -> "ChannelWatermark":
+        """
+        Build the watermark after all given threads have been processed.
+
+        Threads whose latest message falls within `open_window` of the newest message
+        in the channel are kept open, so new replies to them are picked up by the next
+        run. Replies to threads older than that are not tracked.
+
+        Args:
+            threads: All threads of the channel.
+            open_window: How long a thread stays open after its latest message.
+
+        Returns:
+            The new watermark.
+        """
+        activity = [(thread, thread.last_activity) for thread in threads]
+        if not activity:
+            return self
+
+        newest = max(last_activity for _, last_activity in activity)
+        last_timestamp = max(thread.timestamp for thread, _ in activity)
+        return ChannelWatermark(
+            last_timestamp=last_timestamp,
+            open_threads={
+                thread.key: thread.reply_count
+                for thread, last_activity in activity
+                if newest - last_activity <= open_window
+            },
+            latest_threads={
+                thread.key
+                for thread, _ in activity
+                if thread.timestamp == last_timestamp
+            },
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the watermark to a JSON-compatible dict."""
+        last_timestamp = self.last_timestamp
+        return {
+            "last_timestamp": last_timestamp.isoformat() if last_timestamp else None,
+            "open_threads": self.open_threads,
+            "latest_threads": sorted(self.latest_threads),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ChannelWatermark":
+        """Deserialize a watermark produced by `to_dict`."""
+        last_timestamp = data.get("last_timestamp")
+        return cls(
+            last_timestamp=datetime.fromisoformat(last_timestamp)
+            if last_timestamp
+            else None,
+            open_threads=dict(data.get("open_threads", {})),
+            latest_threads=set(data.get("latest_threads", [])),
+        )
+
+
+class IncrementalState:
+    """
+    Persistent state of incremental runs for a single output directory.
+
+    Keeps the per-channel watermarks and the notes extracted by earlier runs, so a
+    new run only extracts pending threads and merges its notes into the existing
+    ones.
+
+    Attributes:
+        state_dir: Directory holding the watermark and note files.
+    """
+
+    WATERMARKS_FILE = "watermarks.json"
+    NOTES_FILE = "notes.json"
+
+    def __init__(self, state_dir: Path):
+        self.state_dir = state_dir
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+    def load_watermark(self, channel: str) -> ChannelWatermark:
+        """Load the watermark of a channel, or an empty one on the first run."""
+        data = self._read_json(self.WATERMARKS_FILE, {})
+        if channel not in data:
+            logger.info(f"No watermark for channel {channel}, processing everything")
+            return ChannelWatermark()
+        return ChannelWatermark.from_dict(data[channel])
+
+    def save_watermark(self, channel: str, watermark: ChannelWatermark) -> None:
+        """Persist the watermark of a channel."""
+        data = self._read_json(self.WATERMARKS_FILE, {})
+        data[channel] = watermark.to_dict()
+        self._write_json(self.WATERMARKS_FILE, data)
+
+    def load_notes(self) -> list[StakeholderNote]:
+        """Load the notes extracted by earlier runs."""
+        return [
+            StakeholderNote.model_validate(note)
+            for note in self._read_json(self.NOTES_FILE, [])
+        ]
+
+    def save_notes(self, notes: list[StakeholderNote]) -> None:
+        """Persist the full set of extracted notes."""
+        self._write_json(self.NOTES_FILE, [note.model_dump() for note in notes])
+
+    def _read_json(self, name: str, default: Any) -> Any:
+        path = self.state_dir / name
+        if not path.exists():
+            return default
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _write_json(self, name: str, data: Any) -> None:
+        path = self.state_dir / name
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        tmp_path.replace(path)
+
+
+def select_pending_threads(
+    threads: Iterable[Thread], watermark: ChannelWatermark
+) -> Iterator[Thread]:
+    """
+    Filter threads down to those that are new or have new replies since the watermark.
+
+    Args:
+        threads: All threads of the channel.
+        watermark: Watermark of the previous run.
+
+    Returns an iterator of the threads that need to be extracted.
+    """
+    return (thread for thread in threads if watermark.is_pending(thread))
+
+
+def merge_notes(
+    existing: list[StakeholderNote],
+    new: list[StakeholderNote],
+    reprocessed: set[str],
+) -> list[StakeholderNote]:
+    """
+    Merge newly extracted notes into the notes of earlier runs.
+
+    Existing notes that reference a re-processed thread are superseded by the new
+    extraction of that thread and dropped. New notes replace existing notes with the
+    same stakeholder, date and title.
+
+    Args:
+        existing: Notes extracted by earlier runs.
+        new: Notes extracted by the current run.
+        reprocessed: Fingerprints of the threads extracted by the current run.
+
+    Returns:
+        The merged notes.
+    """
+
+    def note_key(note: StakeholderNote) -> tuple[str, str, str]:
+        return (note.stakeholder_name.casefold(), note.date, note.title.casefold())
+
+    new_keys = {note_key(note) for note in new}
+    kept = [
+        note
+        for note in existing
+        if note_key(note) not in new_keys
+        and reprocessed.isdisjoint(note.relevant_slack_threads)
+    ]
+    logger.info(
+        f"Merged {len(new)} new notes into {len(kept)} of {len(existing)} "
+        "existing notes"
+    )
+    return kept + new
@@ -0,0 +1,224 @@
+import json
+import logging
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+from slack_archive.config import JSON_INGEST_WORKERS
+from slack_archive.thread import TIMESTAMP_FORMAT, Thread
+
+logger = logging.getLogger(__name__)
+
+Message = dict[str, Any]
+
+
+@dataclass
+class _OpenThread:
+    """Messages of a thread whose replies have not all been read yet."""
+
+    parent: Message | None = None
+    replies: list[Message] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return self.parent is not None and len(self.replies) >= self.parent.get(
+            "reply_count", 0
+        )
+
+
+class SlackExport:
+    """
+    Reader of a Slack JSON export directory, as written by `slackdump export`.
+
+    The export holds `users.json` and `channels.json` at the top level and one
+    directory per channel with a JSON file of messages per day. Day files are
+    loaded in order on a thread pool, a few files ahead of the reader, so only a
+    small window of messages is in memory at a time.
+
+    Messages are grouped into threads by their `thread_ts`, using the reply count
+    of the parent message to tell when a thread is complete, and rendered in the
+    slackdump text format. Threads are therefore grouped exactly, with real user
+    IDs, and no text has to be parsed back into threads.
+
+    Attributes:
+        export_dir: Directory of the export.
+        workers: Number of day files loaded at once.
+        users: Map of user IDs to display names.
+    """
+
+    USERS_FILE = "users.json"
+    CHANNELS_FILE = "channels.json"
+
+    def __init__(self, export_dir: Path, workers: int = JSON_INGEST_WORKERS):
+        self.export_dir = export_dir
+        self.workers = workers
+        self.users = {
+            user["id"]: self._display_name(user)
+            for user in self._read_list(self.USERS_FILE)
+        }
+
+    def channels(self) -> dict[str, Path]:
+        """
+        Find the channels of the export.
+
+        Returns:
+            A map of channel IDs to their directories, sorted by channel ID.
+            Directories not listed in `channels.json` are keyed by their name.
+        """
+        names = {
+            channel["name"]: channel["id"]
+            for channel in self._read_list(self.CHANNELS_FILE)
+        }
+        directories = {
+            names.get(path.name, path.name): path
+            for path in self.export_dir.iterdir()
+            if path.is_dir()
+        }
+        return dict(sorted(directories.items()))
+
+    def iter_messages(self, channel_dir: Path) -> Iterator[Message]:
+        """
+        Stream the messages of a channel in day order.
+
+        Args:
+            channel_dir: Directory of the channel.
+
+        Yields the messages of every day file, in order.
+        """
+        files = iter(sorted(channel_dir.glob("*.json")))
+        with ThreadPoolExecutor(self.workers) as executor:
+            pending: deque[Future[list[Message]]] = deque(
+                executor.submit(self._load_day, day_file)
+                for day_file in islice(files, 2 * self.workers)
+            )
+            while pending:
+                messages = pending.popleft().result()
+                # Keep the pool busy with the next file while these are consumed.
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.append(executor.submit(self._load_day, next_file))
+                yield from messages
+
+    def iter_threads(self, channel_dir: Path) -> Iterator[Thread]:
+        """
+        Stream the threads of a channel.
+
+        A thread is yielded as soon as all of its replies have been read, so threads
+        come out roughly in the order they were started. Threads whose replies are
+        missing from the export, and replies whose parent is, are yielded at the
+        end.
+
+        Args:
+            channel_dir: Directory of the channel.
+
+        Yields Thread objects in the slackdump text format.
+        """
+        open_threads: dict[str, _OpenThread] = {}
+        for message in self.iter_messages(channel_dir):
+            if "ts" not in message:
+                continue
+            thread_ts = message.get("thread_ts", message["ts"])
+            thread = open_threads.setdefault(thread_ts, _OpenThread())
+            if thread_ts == message["ts"]:
+                thread.parent = message
+            else:
+                thread.replies.append(message)
+            if thread.complete:
+                del open_threads[thread_ts]
+                yield self._render(thread)
+
+        if open_threads:
+            logger.debug(f"{len(open_threads)} incomplete threads in {channel_dir}")
+        for _, thread in sorted(open_threads.items(), key=lambda item: float(item[0])):
+            yield self._render(thread)
+
+    def write_dump(self, channel_dir: Path, dump_path: Path) -> int:
+        """
+        Write the threads of a channel as a slackdump text dump.
+
+        Args:
+            channel_dir: Directory of the channel.
+            dump_path: Where to write the dump.
+
+        Returns:
+            The number of threads written.
+        """
+        count = 0
+        tmp_path = dump_path.with_name(dump_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as file:
+            for thread in self.iter_threads(channel_dir):
+                file.write(thread.content)
+                count += 1
+        tmp_path.replace(dump_path)
+        return count
+
+    def write_dumps(self, output_dir: Path) -> dict[str, Path]:
+        """
+        Write a `<channel ID>.txt` dump for every channel of the export.
+
+        Args:
+            output_dir: Directory to write the dumps to.
+
+        Returns:
+            A map of channel IDs to dump paths.
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        dumps: dict[str, Path] = {}
+        for channel, channel_dir in self.channels().items():
+            dumps[channel] = output_dir / f"{channel}.txt"
+            count = self.write_dump(channel_dir, dumps[channel])
+            logger.info(f"{channel}: read {count} threads from {channel_dir}")
+        return dumps
+
+    def _render(self, thread: _OpenThread) -> Thread:
+        """Render a thread like slackdump does, replies indented with "|   "."""
+        messages = sorted(thread.replies, key=lambda message: float(message["ts"]))
+        parent = thread.parent or messages.pop(0)
+        fingerprint = self._fingerprint(parent)
+        lines = [fingerprint, *self._text_lines(parent)]
+        for reply in messages:
+            text = self._text_lines(reply)
+            # Only the first line of a reply is indented, like in slackdump output.
+            lines += ["|   ", f"|   {self._fingerprint(reply)}", f"|   {text[0]}"]
+            lines += text[1:]
+        return Thread.from_text("\n".join(lines) + "\n\n")
+
+    def _fingerprint(self, message: Message) -> str:
+        user_id = message.get("user") or message.get("bot_id") or "unknown"
+        name = self.users.get(user_id) or self._display_name({
+            "name": user_id,
+            "profile": message.get("user_profile", {}),
+        })
+        time = datetime.fromtimestamp(float(message["ts"]), UTC)
+        return f"> {name} [{user_id}] @ {time.strftime(TIMESTAMP_FORMAT)} Z:"
+
+    @staticmethod
+    def _text_lines(message: Message) -> list[str]:
+        return message.get("text", "").splitlines() or [""]
+
+    @staticmethod
+    def _display_name(user: dict[str, Any]) -> str:
+        profile = user.get("profile") or {}
+        return (
+            profile.get("display_name")
+            or profile.get("real_name")
+            or user.get("real_name")
+            or user["name"]
+        )
+
+    @staticmethod
+    def _load_day(day_file: Path) -> list[Message]:
+        with open(day_file, encoding="utf-8") as file:
+            messages = json.load(file)
+        return sorted(messages, key=lambda message: float(message.get("ts", 0)))
+
+    def _read_list(self, name: str) -> list[dict[str, Any]]:
+        path = self.export_dir / name
+        if not path.exists():
+            return []
+        return json.loads(path.read_text(encoding="utf-8"))
@@ -1,27 +1,41 @@
+from __future__ import annotations
+
 import asyncio
 import logging
 import shutil
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import click
 from rich.console import Console
 from rich.logging import RichHandler
-from rich.progress import (
-    BarColumn,
-    Progress,
-    SpinnerColumn,
-    TaskProgressColumn,
-    TextColumn,
-    TimeRemainingColumn,
-)
-
-from slack_archive.chunking import ConversationProcessor
-from slack_archive.config import DEFAULT_MODEL
-from slack_archive.md_dump import dump_to_markdown
-from slack_archive.postprocess import post_process
-from slack_archive.schema import PostProcessedStakeholderNote, StakeholderNote
-from slack_archive.slack_dump import SlackDumpManager
-from slack_archive.structured_extract import OpenAIManager
+
+from slack_archive.config import (
+    ARCHIVE_PATH,
+    CACHE_DIR,
+    DEFAULT_MODEL,
+    TRIAGE_MIN_RECALL,
+)
+
+# The pipeline stages pull in openai, httpx, pydantic, tiktoken and numpy, which
+# take most of a second to import. They are imported by the functions running
+# them, so `--help` and argument errors return immediately.
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Iterable, Mapping, Sequence
+    from datetime import datetime
+
+    from rich.progress import Progress
+
+    from slack_archive.batch_extract import BatchExtractor
+    from slack_archive.checkpoint import Checkpoint
+    from slack_archive.chunking import ConversationProcessor, Thread
+    from slack_archive.metrics import PipelineMetrics
+    from slack_archive.schema import PostProcessedStakeholderNote, StakeholderNote
+    from slack_archive.slack_dump import SlackDumpManager
+    from slack_archive.streaming import StreamResult
+    from slack_archive.structured_extract import OpenAIManager
 
 # Create a single console instance
 console = Console()
@@ -41,9 +55,75 @@ def setup_rich_logging(level: int = logging.INFO) -> logging.Logger:
 logger = setup_rich_logging(level=logging.INFO)
 
 
+@dataclass
+class RunSettings:
+    """
+    Options of a pipeline run, as given on the command line.
+
+    Attributes:
+        model: OpenAI model to use for extraction.
+        output_dir: Directory to store output markdown files, or with one output
+            directory per channel in workspace mode.
+        temp_dump_path: Path for the temporary Slack dump, or directory of the
+            exported dumps in workspace mode.
+        keep_temp: Whether to keep temporary files.
+        cache_dir: Directory of the extraction cache, or None to disable caching.
+        incremental: Whether to only extract threads that are new or have new
+            replies since the last run, merging the notes into earlier results.
+        batch: Whether to extract through the Batch API instead of live requests.
+        resume: Whether to reuse the kept dumps and checkpoint of an earlier run and
+            only extract the chunks that are missing from it.
+        time_from: Only export messages from this time on, if given.
+        time_to: Only export messages up to this time, if given.
+        openmetrics_path: Where to also write the run metrics in the OpenMetrics
+            text format, if given.
+        archive_path: Thread archive to add the threads of the dumps to during
+            extraction, or None to not archive them.
+        channels: IDs of the channels to export in workspace mode.
+        dumps_dir: Directory of existing `<channel ID>.txt` dumps to process in
+            workspace mode.
+        json_export_dir: Slack JSON export to read the channels from in workspace
+            mode, instead of exporting them.
+    """
+
+    model: str = DEFAULT_MODEL
+    output_dir: Path = Path("output")
+    temp_dump_path: Path = Path("temp_dump")
+    keep_temp: bool = False
+    cache_dir: Path | None = CACHE_DIR
+    incremental: bool = False
+    batch: bool = False
+    resume: bool = False
+    time_from: datetime | None = None
+    time_to: datetime | None = None
+    openmetrics_path: Path | None = None
+    archive_path: Path | None = ARCHIVE_PATH
+    channels: Sequence[str] = ()
+    dumps_dir: Path | None = None
+    json_export_dir: Path | None = None
+
+    @property
+    def workspace_mode(self) -> bool:
+        """Whether many channels are processed at once, see `run_workspace`."""
+        return (
+            bool(self.channels)
+            or self.dumps_dir is not None
+            or self.json_export_dir is not None
+        )
+
+
 # 1. Move progress bar configuration to a separate function
 def create_progress_bar() -> Progress:
     """Create a configured progress bar instance."""
+    from rich.progress import (
+        BarColumn,
+        Progress,
+        SpinnerColumn,
+        TaskProgressColumn,
+        TextColumn,
+        TimeRemainingColumn,
+    )
+
     return Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -56,34 +136,112 @@ def create_progress_bar() -> Progress:
 
 # 2. Simplify process_slack_dump function
 async def process_slack_dump(
-    processor: ConversationProcessor, openai_manager: OpenAIManager
-) -> list[StakeholderNote]:
-    """Process the Slack dump file and extract stakeholder notes."""
-    chunks = list(processor.chunk_conversation())
+    processor: ConversationProcessor,
+    openai_manager: OpenAIManager | BatchExtractor,
+    threads: Iterable[Thread] | None = None,
+) -> tuple[list[StakeholderNote], dict[int, Exception]]:
+    """Process the Slack dump file and extract stakeholder notes.
+
+    Args:
+        processor: Processor of the Slack dump.
+        openai_manager: Manager or batch extractor used for the extraction.
+        threads: Threads to extract notes from. Defaults to all threads of the dump.
+
+    Returns:
+        The extracted notes and the failures of individual chunks by chunk index.
+    """
+    chunks = list(processor.iter_chunks(threads))
     logger.debug(f"Generated {len(chunks)} chunks from Slack dump")  # Changed to DEBUG
 
     progress = create_progress_bar()
     with progress:
         task = progress.add_task("Extracting stakeholder notes...", total=len(chunks))
-        extracted_notes = await openai_manager.extract_stakeholder_notes(
+        extraction = await openai_manager.extract_stakeholder_notes(
             chunks, progress_callback=lambda: progress.advance(task)
         )
 
-    all_notes = [note for notes in extracted_notes for note in notes.stakeholder_notes]
+    for index, error in sorted(extraction.failures.items()):
+        logger.error(f"Chunk {index + 1}/{len(chunks)} failed: {error}")
+
+    all_notes = [
+        note for notes in extraction.successful() for note in notes.stakeholder_notes
+    ]
     logger.info(f"Extracted {len(all_notes)} stakeholder notes")
-    return all_notes
+    return all_notes, extraction.failures
+
+
+async def stream_slack_dump(
+    processor: ConversationProcessor,
+    openai_manager: OpenAIManager,
+    output_dir: Path,
+) -> StreamResult:
+    """Extract, post-process and write the notes of the Slack dump chunk by chunk.
+
+    Unlike `process_slack_dump`, the notes of each chunk are written as soon as
+    the chunk is extracted, and the chunks are never all held in memory.
+
+    Args:
+        processor: Processor of the Slack dump.
+        openai_manager: Manager used for the extraction.
+        output_dir: Directory to store output markdown files.
+
+    Returns:
+        The number of chunks and written notes, and the failures by chunk index.
+    """
+    from slack_archive.streaming import StreamingPipeline
+
+    pipeline = StreamingPipeline(openai_manager, processor, output_dir)
+    progress = create_progress_bar()
+    with progress:
+        # The number of chunks is only known once the dump has been chunked.
+        task = progress.add_task("Extracting stakeholder notes...", total=None)
+        return await pipeline.run(progress_callback=lambda: progress.advance(task))
 
 
 # 3. Simplify run_pipeline by extracting initialization logic
 async def initialize_processors(
-    model: str, temp_dump_path: Path
+    settings: RunSettings,
+    metrics: PipelineMetrics | None = None,
+    checkpoint: Checkpoint | None = None,
 ) -> tuple[SlackDumpManager, OpenAIManager, ConversationProcessor]:
-    """Initialize all necessary processors."""
-    slack_manager = SlackDumpManager(console=console)
-    slack_dump = await slack_manager.export_slack_data(temp_dump_path)
+    """Initialize all necessary processors.
 
-    openai_manager = OpenAIManager(model=model)
-    conversation_processor = ConversationProcessor(slack_dump)
+    An existing dump at `settings.temp_dump_path` is reused instead of exporting
+    again.
+    """
+    from slack_archive.cache import ExportCache, ExtractionCache
+    from slack_archive.chunking import ConversationProcessor
+    from slack_archive.slack_dump import SlackDumpManager
+    from slack_archive.structured_extract import OpenAIManager
+    from slack_archive.triage import build_thread_filter
+
+    cache_dir = settings.cache_dir
+    export_cache = ExportCache(cache_dir) if cache_dir is not None else None
+    slack_manager = SlackDumpManager(console=console, cache=export_cache)
+    if settings.temp_dump_path.exists():
+        slack_dump = settings.temp_dump_path
+    else:
+        progress = create_progress_bar()
+        with progress:
+            task = progress.add_task("Exporting Slack data...", total=None)
+            slack_dump = await slack_manager.export_slack_data(
+                settings.temp_dump_path,
+                time_from=settings.time_from,
+                time_to=settings.time_to,
+                on_progress=lambda line: progress.update(
+                    task, description=f"Exporting: {line[:60]}"
+                ),
+            )
+
+    cache = ExtractionCache(cache_dir) if cache_dir is not None else None
+    openai_manager = OpenAIManager(
+        model=settings.model, cache=cache, metrics=metrics, checkpoint=checkpoint
+    )
+    conversation_processor = ConversationProcessor(
+        slack_dump,
+        prompt_overhead=openai_manager.request_overhead(),
+        noise_filter=build_thread_filter(),
+    )
 
     return slack_manager, openai_manager, conversation_processor
 
@@ -92,11 +250,15 @@ def post_process_notes(
     notes: list[StakeholderNote],
     conversation_processor: ConversationProcessor,
 ) -> list[PostProcessedStakeholderNote]:
-    """Post-process the extracted stakeholder notes."""
+    """Merge duplicates of the extracted stakeholder notes and post-process them."""
+    from slack_archive.dedup import deduplicate_notes
+    from slack_archive.postprocess import post_process_all
+
+    notes = deduplicate_notes(notes)
     logger.debug(
         f"Starting post-processing of {len(notes)} stakeholder notes"
     )  # Changed to DEBUG
-    post_processed = [post_process(note, conversation_processor) for note in notes]
+    post_processed = post_process_all(notes, conversation_processor)
     logger.info(f"Completed post-processing. Resulting in {len(post_processed)} notes")
 
     if post_processed:  # Add null check
@@ -105,61 +267,401 @@ def post_process_notes(
     return post_processed
 
 
-async def run_pipeline(
-    model: str,
-    keep_temp: bool,
-    output_dir: Path,
-    temp_dump_path: Path,
+def write_metrics(
+    metrics: PipelineMetrics, output_dir: Path, openmetrics_path: Path | None = None
 ) -> None:
+    """Write the metrics of a run next to the incremental state of the output.
+
+    Every run gets its own file named after its start time, so spend and
+    latency can be compared across runs.
+    """
+    from slack_archive.incremental import STATE_DIR_NAME
+
+    name = f"{metrics.started_at:%Y%m%dT%H%M%SZ}.json"
+    metrics.write_json(output_dir / STATE_DIR_NAME / "metrics" / name)
+    if openmetrics_path is not None:
+        metrics.write_openmetrics(openmetrics_path)
+
+    summary = metrics.summary()
+    latency = summary["requests"]["latency"]
+    cost = summary["estimated_cost_usd"]
+    logger.info(
+        f"Metrics: {summary['requests']['count']} requests, "
+        f"p50 {latency['p50'] or 0:.2f}s, p95 {latency['p95'] or 0:.2f}s, "
+        f"{summary['tokens']['prompt']} prompt / "
+        f"{summary['tokens']['completion']} completion tokens"
+        + (f", ~${cost:.4f}" if cost is not None else "")
+    )
+
+
+async def archive_threads(
+    archive_path: Path, dumps: Mapping[str, Path], metrics: PipelineMetrics
+) -> None:
+    """Add the threads of channel dumps to the searchable thread archive."""
+    from slack_archive.archive import ThreadArchive
+
+    def load() -> None:
+        # SQLite connections are used in the thread that opened them.
+        archive = ThreadArchive(archive_path)
+        try:
+            archive.load_dumps(dumps)
+        finally:
+            archive.close()
+
+    with metrics.stage("archive"):
+        await asyncio.to_thread(load)
+
+
+@asynccontextmanager
+async def archiving(
+    archive_path: Path | None, dumps: Mapping[str, Path], metrics: PipelineMetrics
+) -> AsyncGenerator[None, None]:
+    """Add the threads of channel dumps to the thread archive while the body runs.
+
+    Nothing else reads the archive, so it is loaded during extraction. The load is
+    waited for even when the body fails, as it reads the dumps.
+
+    Args:
+        archive_path: Thread archive to add the threads to, or None to not archive
+            them
+        dumps: Map of channel IDs to dump paths
+        metrics: Metrics the time of the load is recorded in
+    """
+    if archive_path is None:
+        yield
+        return
+    task = asyncio.create_task(archive_threads(archive_path, dumps, metrics))
+    try:
+        yield
+    except BaseException:
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+    await task
+
+
+async def run_pipeline(settings: RunSettings) -> None:
     """Run the main processing pipeline.
 
+    Unless extracting in batch or incremental mode, which need all notes at once,
+    the notes of each chunk are post-processed and written as soon as the chunk is
+    extracted. Every chunk result is checkpointed as it arrives. When the run fails
+    or some chunks fail, the temporary dump is kept, so the run can be resumed.
+
     Args:
-        model: OpenAI model to use for extraction
-        keep_temp: Whether to keep temporary files
-        output_dir: Directory to store output markdown files
-        temp_dump_path: Path for temporary Slack dump
+        settings: Options of the run
     """
+    from slack_archive.metrics import PipelineMetrics
+
+    metrics = PipelineMetrics(settings.model)
+    keep_dump = settings.keep_temp
     try:
-        if temp_dump_path.exists():
+        if not await _run_channel(settings, metrics):
+            keep_dump = True
+    except Exception:
+        # Keep the dump and the checkpoint, so the paid-for chunks are not lost.
+        keep_dump = True
+        logger.error("Run failed, re-run with --resume to continue where it stopped")
+        raise
+    finally:
+        write_metrics(metrics, settings.output_dir, settings.openmetrics_path)
+        if not keep_dump:
+            logger.info("Cleaning up temporary files...")
+            cleanup_temp_files(settings.temp_dump_path)
+        else:
+            logger.info(f"Temporary files kept at: {settings.temp_dump_path}")
+
+
+async def _run_channel(settings: RunSettings, metrics: PipelineMetrics) -> bool:
+    """Export the channel, or reuse its kept dump, and extract its notes.
+
+    Returns:
+        Whether every chunk was extracted.
+    """
+    from slack_archive.checkpoint import Checkpoint
+    from slack_archive.incremental import STATE_DIR_NAME
+
+    temp_dump_path = settings.temp_dump_path
+    if temp_dump_path.exists():
+        if settings.resume:
+            logger.info(f"Resuming with the kept dump at {temp_dump_path}")
+        else:
             logger.warning("Found existing temporary dump file, removing it...")
             cleanup_temp_files(temp_dump_path)
+    checkpoint = Checkpoint(
+        settings.output_dir / STATE_DIR_NAME, resume=settings.resume
+    )
 
-        # Initialize processors
-        _, openai_manager, conversation_processor = await initialize_processors(
-            model, temp_dump_path
+    with metrics.stage("initialize"):
+        _, openai_manager, processor = await initialize_processors(
+            settings, metrics, checkpoint
         )
+    # Batch and incremental runs need the full set of notes.
+    extract = (
+        _extract_channel if settings.batch or settings.incremental else _stream_channel
+    )
+    dumps = {processor.file_path.stem: processor.file_path}
+    try:
+        async with archiving(settings.archive_path, dumps, metrics):
+            failures = await extract(settings, metrics, openai_manager, processor)
+    finally:
+        if openai_manager.cache is not None:
+            openai_manager.cache.close()
 
-        # Run extraction pipeline
-        extracted_notes = await process_slack_dump(
-            conversation_processor, openai_manager
+    if failures:
+        logger.warning(
+            f"{len(failures)} chunks quarantined in {checkpoint.quarantine_path}, "
+            "re-run with --resume to retry them"
         )
+    logger.info("✓ Process completed successfully!")
+    return not failures
+
 
-        # Post-process notes
-        post_processed_notes = post_process_notes(
-            extracted_notes, conversation_processor
+async def _stream_channel(
+    settings: RunSettings,
+    metrics: PipelineMetrics,
+    openai_manager: OpenAIManager,
+    processor: ConversationProcessor,
+) -> dict[int, Exception]:
+    """Stream the chunks of the dump through every stage, see `stream_slack_dump`.
+
+    Returns:
+        The failures of individual chunks by chunk index.
+    """
+    # Nothing needs the full set of notes, so every stage can overlap.
+    with metrics.stage("extract"):
+        result = await stream_slack_dump(processor, openai_manager, settings.output_dir)
+    logger.info("Pipeline summary:")
+    logger.info(f"- Processed {result.chunks} chunks")
+    logger.info(f"- Generated {result.notes} processed notes")
+    logger.info(f"- Output directory: {settings.output_dir}")
+    return result.failures
+
+
+async def _extract_channel(
+    settings: RunSettings,
+    metrics: PipelineMetrics,
+    openai_manager: OpenAIManager,
+    processor: ConversationProcessor,
+) -> dict[int, Exception]:
+    """Extract all notes of the dump, then post-process and write them.
+
+    Returns:
+        The failures of individual chunks by chunk index.
+    """
+    from slack_archive.md_dump import dump_to_markdown
+
+    extractor: OpenAIManager | BatchExtractor = openai_manager
+    if settings.batch:
+        extractor = _batch_extractor(settings, openai_manager)
+    if settings.incremental:
+        notes, failures = await _extract_incremental(
+            settings, metrics, extractor, processor
         )
+    else:
+        with metrics.stage("extract"):
+            notes, failures = await process_slack_dump(processor, extractor)
 
-        # Add consolidated logging
-        logger.info("Pipeline summary:")
-        logger.info(f"- Processed {len(extracted_notes)} raw notes")
-        logger.info(f"- Generated {len(post_processed_notes)} processed notes")
-        logger.info(f"- Output directory: {output_dir}")
+    with metrics.stage("post_process"):
+        post_processed_notes = post_process_notes(notes, processor)
 
-        dump_to_markdown(post_processed_notes, output_dir)
-        logger.info("✓ Process completed successfully!")
+    logger.info("Pipeline summary:")
+    logger.info(f"- Processed {len(notes)} raw notes")
+    logger.info(f"- Generated {len(post_processed_notes)} processed notes")
+    logger.info(f"- Output directory: {settings.output_dir}")
 
-    except Exception as e:
-        cleanup_temp_files(temp_dump_path)
-        raise e
+    with metrics.stage("dump"):
+        dump_to_markdown(post_processed_notes, settings.output_dir, prune=not failures)
+    return failures
+
+
+def _batch_extractor(
+    settings: RunSettings, openai_manager: OpenAIManager
+) -> BatchExtractor:
+    """Create an extractor submitting the chunks through the Batch API.
+
+    Its state is kept next to the output, so a re-run resumes a pending batch.
+    """
+    from slack_archive.batch_extract import BatchExtractor, OpenAIBatchBackend
+    from slack_archive.incremental import STATE_DIR_NAME
+
+    return BatchExtractor(
+        openai_manager,
+        OpenAIBatchBackend(openai_manager.client),
+        settings.output_dir / STATE_DIR_NAME / "batch",
+    )
+
+
+async def _extract_incremental(
+    settings: RunSettings,
+    metrics: PipelineMetrics,
+    extractor: OpenAIManager | BatchExtractor,
+    processor: ConversationProcessor,
+) -> tuple[list[StakeholderNote], dict[int, Exception]]:
+    """Extract the threads that are new or have new replies since the last run.
+
+    Their notes are merged into the notes of earlier runs. The watermark only
+    advances when every chunk succeeded.
+
+    Returns:
+        All notes of the channel, and the failures of individual chunks by chunk
+        index.
+    """
+    from slack_archive.incremental import (
+        STATE_DIR_NAME,
+        IncrementalState,
+        merge_notes,
+        select_pending_threads,
+    )
+
+    state = IncrementalState(settings.output_dir / STATE_DIR_NAME)
+    channel = processor.file_path.stem
+    watermark = state.load_watermark(channel)
+    threads = list(select_pending_threads(processor.get_threads(), watermark))
+    logger.info(f"Incremental run: {len(threads)} new or updated threads")
+
+    with metrics.stage("extract"):
+        extracted, failures = await process_slack_dump(processor, extractor, threads)
+    notes = merge_notes(state.load_notes(), extracted, {t.key for t in threads})
+    state.save_notes(notes)
+    if failures:
+        # Failed threads stay behind the watermark and are retried next run.
+        logger.warning("Some chunks failed, not advancing the watermark")
+    else:
+        state.save_watermark(channel, watermark.advance(processor.get_threads()))
+    return notes, failures
+
+
+async def run_workspace(settings: RunSettings) -> None:
+    """Run the processing pipeline for many channels at once.
+
+    Like `run_pipeline`, chunk results are checkpointed and exported dumps are
+    kept when the run or some chunks fail.
+
+    Args:
+        settings: Options of the run
+    """
+    from slack_archive.metrics import PipelineMetrics
+
+    metrics = PipelineMetrics(settings.model)
+    keep_dumps = settings.keep_temp
+    try:
+        if not await _run_channels(settings, metrics):
+            keep_dumps = True
+    except Exception:
+        keep_dumps = True
+        logger.error("Run failed, re-run with --resume to continue where it stopped")
+        raise
     finally:
-        if not keep_temp:
+        write_metrics(metrics, settings.output_dir, settings.openmetrics_path)
+        exported = settings.channels or settings.json_export_dir is not None
+        if exported and not keep_dumps:
             logger.info("Cleaning up temporary files...")
-            cleanup_temp_files(temp_dump_path)
+            cleanup_temp_files(settings.temp_dump_path)
+
+
+async def _run_channels(settings: RunSettings, metrics: PipelineMetrics) -> bool:
+    """Extract the notes of every channel, exporting the channels first if needed.
+
+    Returns:
+        Whether every channel and chunk was extracted.
+    """
+    from slack_archive.cache import ExtractionCache
+    from slack_archive.checkpoint import Checkpoint
+    from slack_archive.incremental import STATE_DIR_NAME
+    from slack_archive.structured_extract import OpenAIManager
+    from slack_archive.workspace import WorkspaceRunner, discover_dumps
+
+    dumps_dir = await _prepare_dumps(settings, metrics)
+    dumps = discover_dumps(dumps_dir)
+    logger.info(f"Processing {len(dumps)} channels from {dumps_dir}")
+
+    cache_dir = settings.cache_dir
+    checkpoint = Checkpoint(
+        settings.output_dir / STATE_DIR_NAME, resume=settings.resume
+    )
+    openai_manager = OpenAIManager(
+        model=settings.model,
+        cache=ExtractionCache(cache_dir) if cache_dir is not None else None,
+        metrics=metrics,
+        checkpoint=checkpoint,
+    )
+    runner = WorkspaceRunner(
+        openai_manager, settings.output_dir, incremental=settings.incremental
+    )
+    progress = create_progress_bar()
+    try:
+        async with archiving(settings.archive_path, dumps, metrics):
+            # Chunking, extraction and post-processing overlap across channels.
+            with progress, metrics.stage("extract"):
+                notes_per_channel = await runner.run(dumps, progress)
+    finally:
+        if openai_manager.cache is not None:
+            openai_manager.cache.close()
+
+    logger.info("Workspace summary:")
+    logger.info(f"- Processed {len(notes_per_channel)} of {len(dumps)} channels")
+    logger.info(f"- Generated {sum(notes_per_channel.values())} processed notes")
+    logger.info(f"- Output directory: {settings.output_dir}")
+    if runner.failed_chunks:
+        logger.warning(
+            f"{sum(runner.failed_chunks.values())} chunks quarantined in "
+            f"{checkpoint.quarantine_path}, re-run with --resume to retry them"
+        )
+    if runner.failed_channels:
+        logger.warning(
+            f"Channels {', '.join(runner.failed_channels)} failed, re-run with "
+            "--resume to retry them"
+        )
+    return not runner.failed_chunks and not runner.failed_channels
+
+
+async def _prepare_dumps(settings: RunSettings, metrics: PipelineMetrics) -> Path:
+    """Return the directory of the channel dumps, writing them first if needed."""
+    from slack_archive.json_export import SlackExport
+
+    if settings.json_export_dir is not None:
+        # Threads are grouped from the message JSON and rendered into dumps,
+        # which the thread index and chunking work on.
+        with metrics.stage("initialize"):
+            await asyncio.to_thread(
+                SlackExport(settings.json_export_dir).write_dumps,
+                settings.temp_dump_path,
+            )
+        return settings.temp_dump_path
+    if settings.dumps_dir is not None:
+        return settings.dumps_dir
+    await _export_channels(settings, metrics)
+    return settings.temp_dump_path
+
+
+async def _export_channels(settings: RunSettings, metrics: PipelineMetrics) -> None:
+    """Export the channels of the run, except those with a kept dump."""
+    from slack_archive.cache import ExportCache
+    from slack_archive.slack_dump import SlackDumpManager
+
+    temp_dump_path = settings.temp_dump_path
+    if temp_dump_path.exists() and not settings.resume:
+        logger.warning("Found existing temporary dump files, removing them...")
+        cleanup_temp_files(temp_dump_path)
+    cache_dir = settings.cache_dir
+    slack_manager = SlackDumpManager(
+        console=console,
+        cache=ExportCache(cache_dir) if cache_dir is not None else None,
+    )
+    pending = []
+    for channel in settings.channels:
+        if (temp_dump_path / f"{channel}.txt").exists():
+            logger.info(f"Resuming with the kept dump of {channel}")
         else:
-            logger.info(f"Temporary files kept for inspection at: {temp_dump_path}")
+            pending.append(channel)
+    progress = create_progress_bar()
+    with progress, metrics.stage("initialize"):
+        await slack_manager.export_channels(
+            temp_dump_path, pending, settings.time_from, settings.time_to, progress
+        )
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option(
     "--model",
     "-m",
@@ -174,23 +676,248 @@ async def run_pipeline(
 @click.option(
     "--output",
     "-o",
+    "output_dir",
+    type=click.Path(file_okay=False, path_type=Path),
     default="./output",
     help="Output directory for markdown files",
 )
-def main(model: str, keep_temp: bool, output: str):
-    """Process Slack conversations and extract stakeholder notes."""
-    output_dir = Path(output)
-    temp_dump_path = Path("./temp_dump")
-
-    output_dir.mkdir(parents=True, exist_ok=True)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=CACHE_DIR,
+    show_default=True,
+    help="Directory of the extraction cache",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Always call the API instead of reusing cached extraction results",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only extract threads that are new or have new replies since the last run",
+)
+@click.option(
+    "--channel",
+    "-c",
+    "channels",
+    multiple=True,
+    help="ID of a channel to export and process; repeat for several channels",
+)
+@click.option(
+    "--workspace",
+    "dumps_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Directory of existing <channel ID>.txt dumps to process",
+)
+@click.option(
+    "--json-export",
+    "json_export_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Slack JSON export directory (as written by slackdump export) to process",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Extract through the OpenAI Batch API; re-run to resume a pending batch",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Reuse the dump and checkpoint of an interrupted run; only extract "
+    "missing chunks",
+)
+@click.option(
+    "--from",
+    "time_from",
+    type=click.DateTime(),
+    help="Only export messages from this time on",
+)
+@click.option(
+    "--to",
+    "time_to",
+    type=click.DateTime(),
+    help="Only export messages up to this time",
+)
+@click.option(
+    "--openmetrics",
+    "openmetrics_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the run metrics to this file in the OpenMetrics text format",
+)
+@click.option(
+    "--archive",
+    "archive_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=ARCHIVE_PATH,
+    show_default=True,
+    help="Thread archive the threads of every run are added to, for `search`",
+)
+@click.option(
+    "--no-archive",
+    is_flag=True,
+    help="Do not add the threads of this run to the thread archive",
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    cache_dir: Path,
+    no_cache: bool,
+    archive_path: Path,
+    no_archive: bool,
+    **options: Any,
+):
+    """Process Slack conversations and extract stakeholder notes.
+
+    Runs the pipeline unless a command is given.
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+    settings = RunSettings(
+        cache_dir=None if no_cache else cache_dir,
+        archive_path=None if no_archive else archive_path,
+        **options,
+    )
+    settings.output_dir.mkdir(parents=True, exist_ok=True)
+    if settings.batch and settings.workspace_mode:
+        raise click.UsageError("--batch is not supported in workspace mode")
 
+    if settings.workspace_mode:
+        pipeline = run_workspace(settings)
+    else:
+        pipeline = run_pipeline(settings)
     try:
-        asyncio.run(run_pipeline(model, keep_temp, output_dir, temp_dump_path))
+        asyncio.run(pipeline)
     except Exception as e:
         console.print_exception(show_locals=True)
         raise click.ClickException(str(e)) from e
 
 
+@main.command()
+@click.argument("query")
+@click.option("--channel", "-c", help="Only search the threads of this channel")
+@click.option("--user", "user_id", help="Only search threads started by this user ID")
+@click.option(
+    "--from",
+    "since",
+    type=click.DateTime(),
+    help="Only search threads started from this time on (UTC)",
+)
+@click.option(
+    "--to",
+    "until",
+    type=click.DateTime(),
+    help="Only search threads started before this time (UTC)",
+)
+@click.option("--limit", "-n", default=20, show_default=True, help="Maximum hits")
+@click.option(
+    "--archive",
+    "archive_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=ARCHIVE_PATH,
+    show_default=True,
+    help="Thread archive to search",
+)
+def search(query: str, archive_path: Path, **filters: Any):
+    """Search the threads of earlier runs for QUERY.
+
+    QUERY is an SQLite FTS5 query, e.g. 'relay AND "pilot program"' or 'integrat*';
+    other text finds the threads containing all of its words.
+    """
+    from rich.text import Text
+
+    from slack_archive.archive import (
+        MATCH_END,
+        MATCH_START,
+        SearchFilter,
+        ThreadArchive,
+    )
+
+    if not archive_path.exists():
+        raise click.ClickException(
+            f"No thread archive at {archive_path}, run the pipeline first"
+        )
+    archive = ThreadArchive(archive_path)
+    try:
+        hits = archive.search(query, SearchFilter(**filters))
+    finally:
+        archive.close()
+
+    if not hits:
+        console.print("No matching threads")
+    for hit in hits:
+        console.print(Text(f"{hit.channel}  {hit.fingerprint}", style="bold"))
+        snippet = Text("  ")
+        # Every part but the first starts with a matched word.
+        for index, part in enumerate(hit.snippet.split(MATCH_START)):
+            matched, _, rest = part.partition(MATCH_END) if index else ("", "", part)
+            snippet.append(matched, style="bold yellow").append(rest)
+        console.print(snippet, end="\n\n")
+
+
+@main.group()
+def triage() -> None:
+    """Train and evaluate the relevance triage of threads."""
+
+
+@triage.command()
+@click.argument("dump_path", type=click.Path(exists=True, path_type=Path))
+@click.argument("output_dir", type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--model",
+    "model_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=Path("triage.npz"),
+    show_default=True,
+    help="Where to write the model",
+)
+@click.option(
+    "--min-recall",
+    default=TRIAGE_MIN_RECALL,
+    show_default=True,
+    help="Share of the cited threads to keep",
+)
+def train(
+    dump_path: Path, output_dir: Path, model_path: Path, min_recall: float
+) -> None:
+    """Train a model on DUMP_PATH and the notes an earlier run wrote to OUTPUT_DIR."""
+    from slack_archive.thread import ThreadStore
+    from slack_archive.triage import (
+        RelevanceModel,
+        label_threads,
+        load_cited_fingerprints,
+    )
+
+    with ThreadStore.from_file(dump_path) as store:
+        threads = list(store)
+        cited = label_threads(threads, load_cited_fingerprints(output_dir))
+        model, report = RelevanceModel.fit(threads, cited, min_recall=min_recall)
+    model.save(model_path)
+    console.print(f"Cross-validated: {report}")
+    console.print(f"Model with {len(model.terms)} terms written to {model_path}")
+
+
+@triage.command()
+@click.argument("model_path", type=click.Path(exists=True, path_type=Path))
+@click.argument("dump_path", type=click.Path(exists=True, path_type=Path))
+@click.argument("output_dir", type=click.Path(exists=True, path_type=Path))
+def evaluate(model_path: Path, dump_path: Path, output_dir: Path) -> None:
+    """Evaluate a model against the notes an earlier run wrote to OUTPUT_DIR."""
+    from slack_archive.thread import ThreadStore
+    from slack_archive.triage import (
+        RelevanceModel,
+        label_threads,
+        load_cited_fingerprints,
+    )
+
+    with ThreadStore.from_file(dump_path) as store:
+        threads = list(store)
+        cited = label_threads(threads, load_cited_fingerprints(output_dir))
+        report = RelevanceModel.load(model_path).evaluate(threads, cited)
+    console.print(str(report))
+
+
 def cleanup_temp_files(path: Path) -> None:
     """Clean up temporary files and directories.
 
@@ -1,9 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from collections.abc import Hashable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
+from slack_archive.config import MARKDOWN_WRITERS
+from slack_archive.incremental import STATE_DIR_NAME
 from slack_archive.schema import PostProcessedStakeholderNote
 
+logger = logging.getLogger(__name__)
+
+# Longest slug used for the stakeholder and the title in a file name
+MAX_SLUG_LENGTH = 60
+# Number of hex digits of the hash that ends every file name
+NAME_HASH_LENGTH = 8
+
+
+@dataclass
+class WriteStats:
+    """
+    Number of markdown files touched by a writer.
+
+    Attributes:
+        written: Files that were created or whose content changed.
+        unchanged: Files that were skipped because their content is the same.
+        removed: Files of notes that no longer exist, which were pruned.
+    """
+
+    written: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+def slugify(text: str) -> str:
+    """Turn text into a lowercase, filesystem-safe part of a file name."""
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug[:MAX_SLUG_LENGTH].rstrip("-") or "untitled"
+
+
+def note_file_name(note: PostProcessedStakeholderNote) -> str:
+    """
+    Return the file name of a note without extension.
+
+    The name is made of the date, stakeholder and title of the note, followed by a
+    short hash of them. Slugs of different notes can coincide, e.g. when titles
+    only differ in punctuation or are cut off; the hash still tells them apart, and
+    a note gets the same name no matter in which order notes are written.
+    """
+    parts = (note.date, note.stakeholder_name, note.title)
+    digest = hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+    return "-".join([*(slugify(part) for part in parts), digest[:NAME_HASH_LENGTH]])
+
+
+def code_fence(text: str) -> str:
+    """Return a backtick fence longer than any run of backticks in the text."""
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    return "`" * max(3, longest + 1)
+
+
+def render_note(note: PostProcessedStakeholderNote) -> str:
+    """Render a note as markdown."""
+    threads = "\n".join(f"- {thread}" for thread in note.relevant_slack_threads)
+    fence = code_fence(note.full_slack_threads)
+    return (
+        f"# {note.title}\n\n"
+        f"- **Stakeholder:** {note.stakeholder_name}\n"
+        f"- **Date:** {note.date}\n\n"
+        f"## Summary\n\n{note.summary}\n\n"
+        f"## Slack threads\n\n{threads}\n\n"
+        f"{fence}\n{note.full_slack_threads}\n{fence}\n"
+    )
+
+
+class MarkdownWriter:
+    """
+    Writes notes as one markdown file each, rewriting only what changed.
+
+    A manifest in the state directory of the output maps every file written so far
+    to the hash of its content. Files whose content hash is unchanged are not
+    touched, and `prune` removes the files of notes that were not written in this
+    session, so syncing the output directory only transfers real changes. Every
+    file is written to a temporary file first and renamed into place, so readers
+    never see a partially written note.
+
+    Notes can be written in several calls, e.g. as chunks complete, as long as
+    `prune` is only called once all notes have been written. The files are written
+    by a pool of threads that lives as long as the writer; `close` shuts it down.
+
+    Attributes:
+        output_dir: Directory the markdown files are written to.
+        manifest_path: Path to the manifest of written files.
+        stats: Counts of the files written, skipped and removed so far.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, output_dir: Path, max_workers: int = MARKDOWN_WRITERS):
+        self.output_dir = output_dir
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = output_dir / STATE_DIR_NAME / self.MANIFEST_FILE
+        self.max_workers = max_workers
+        self.stats = WriteStats()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="markdown")
+        self._manifest: dict[str, str] = {}
+        self._names: dict[str, int] = {}  # file name -> notes using it this session
+        self._written: set[str] = set()
+        self._keys: dict[Hashable, str] = {}
+
+        if self.manifest_path.exists():
+            self._manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def write(
+        self,
+        notes: list[PostProcessedStakeholderNote],
+        keys: Sequence[Hashable] | None = None,
+    ) -> None:
+        """
+        Write the notes whose markdown differs from what is already on disk.
+
+        Notes with the same date, stakeholder and title map to the same file name,
+        and are told apart by a numeric suffix in the order they are written.
+
+        Args:
+            notes: The notes to write.
+            keys: Identity of each note within the session. A note written again
+                under the same key, e.g. after merging a duplicate into it, replaces
+                the file of its earlier version. By default every note is new.
+        """
+        pending: list[tuple[str, str, str]] = []
+        for index, note in enumerate(notes):
+            key = keys[index] if keys is not None else object()
+            if key not in self._keys:
+                self._keys[key] = self._unique_name(note_file_name(note))
+            name = self._keys[key]
+            content = render_note(note)
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            self._written.add(name)
+            if self._manifest.get(name) == digest and (self.output_dir / name).exists():
+                self.stats.unchanged += 1
+                continue
+            pending.append((name, content, digest))
+
+        if not pending:
+            return
+        # Consume the results, so a failed write raises here.
+        list(
+            self._executor.map(
+                self._write_atomic,
+                [self.output_dir / name for name, _, _ in pending],
+                [content for _, content, _ in pending],
+            )
+        )
+        for name, _, digest in pending:
+            self._manifest[name] = digest
+        self.stats.written += len(pending)
+        self._save_manifest()
+
+    def prune(self) -> None:
+        """Remove the files of the manifest that were not written in this session."""
+        for name in sorted(set(self._manifest) - self._written):
+            (self.output_dir / name).unlink(missing_ok=True)
+            del self._manifest[name]
+            self.stats.removed += 1
+        self._save_manifest()
+
+    def close(self) -> None:
+        """Shut down the threads writing the files."""
+        self._executor.shutdown()
+
+    def __enter__(self) -> "MarkdownWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _unique_name(self, base: str) -> str:
+        count = self._names.get(base, 0) + 1
+        self._names[base] = count
+        return f"{base}.md" if count == 1 else f"{base}-{count}.md"
+
+    def _save_manifest(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(
+            self.manifest_path, json.dumps(self._manifest, indent=2, sort_keys=True)
+        )
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
 
 def dump_to_markdown(
-    post_processed_notes: list[PostProcessedStakeholderNote], output_path: Path
-):
-    print("Dumping to markdown")
+    post_processed_notes: list[PostProcessedStakeholderNote],
+    output_path: Path,
+    prune: bool = True,
+) -> WriteStats:
+    """
+    Write the full set of notes of an output directory as markdown files.
+
+    Args:
+        post_processed_notes: All notes of the output directory.
+        output_path: Directory to write the markdown files to.
+        prune: Whether to remove the files of notes that are no longer in the set.
+            Pass False when the set is known to be incomplete, e.g. because some
+            chunks failed.
+
+    Returns:
+        Counts of the files written, skipped and removed.
+    """
+    with MarkdownWriter(output_path) as writer:
+        writer.write(post_processed_notes)
+        if prune:
+            writer.prune()
+    logger.info(
+        f"Markdown in {output_path}: {writer.stats.written} written, "
+        f"{writer.stats.unchanged} unchanged, {writer.stats.removed} removed"
+    )
+    return writer.stats
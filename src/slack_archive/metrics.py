@@ -0,0 +1,260 @@
+import json
+import logging
+import statistics
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from openai.types import CompletionUsage
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens: (input, cached input, output), matched by model prefix
+MODEL_PRICES: dict[str, tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+# Batch API requests are billed at this fraction of the regular price
+BATCH_PRICE_FACTOR = 0.5
+# Number of slowest requests listed in the report
+SLOWEST_REQUESTS = 5
+# Fewest values statistics.quantiles interpolates between
+MIN_QUANTILE_VALUES = 2
+
+
+@dataclass
+class RequestRecord:
+    """
+    Measurements of a single extraction request.
+
+    Attributes:
+        label: What the request was for, e.g. the first thread of the chunk.
+        latency: Seconds from sending the request to receiving the response, or
+            None for batch requests.
+        prompt_tokens: Input tokens billed for the request.
+        completion_tokens: Output tokens billed for the request.
+        cached_tokens: Input tokens served from the prompt cache.
+        retries: Number of retries before the request succeeded or gave up.
+        batch: Whether the request ran through the Batch API.
+        failed: Whether the request failed after its last retry.
+    """
+
+    label: str
+    latency: float | None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    batch: bool = False
+    failed: bool = False
+
+
+def _percentile(values: list[float], percent: int) -> float | None:
+    """Return a percentile of the values, or None if there are none."""
+    if len(values) < MIN_QUANTILE_VALUES:
+        return values[0] if values else None
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def model_prices(model: str) -> tuple[float, float, float] | None:
+    """Return the token prices of a model, or None if they are unknown."""
+    matches = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+class PipelineMetrics:
+    """
+    Collects timings, token usage and cost of a pipeline run.
+
+    Stages are timed with the `stage` context manager, and every extraction request
+    is recorded with `record_request`. The collected metrics are written as JSON,
+    and optionally in the OpenMetrics text format.
+
+    Attributes:
+        model: Model used for extraction, used to estimate the cost.
+        started_at: Time the run started.
+        stages: Wall time in seconds per stage, in the order the stages ran.
+        requests: Records of all extraction requests.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started_at = datetime.now(UTC)
+        self.stages: dict[str, float] = {}
+        self.requests: list[RequestRecord] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Generator[None, None, None]:
+        """Measure the wall time of a stage; repeated stages add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            logger.debug(f"Stage {name} took {elapsed:.2f}s")
+
+    def record_request(
+        self,
+        label: str,
+        latency: float | None,
+        usage: "CompletionUsage | None",
+        retries: int = 0,
+        batch: bool = False,
+    ) -> None:
+        """
+        Record a finished extraction request.
+
+        Args:
+            label: What the request was for, e.g. the first thread of the chunk.
+            latency: Seconds the request took, or None if unknown.
+            usage: Token usage reported in the response.
+            retries: Number of retries before the request succeeded.
+            batch: Whether the request ran through the Batch API.
+        """
+        record = RequestRecord(label, latency, retries=retries, batch=batch)
+        if usage is not None:
+            record.prompt_tokens = usage.prompt_tokens
+            record.completion_tokens = usage.completion_tokens
+            details = usage.prompt_tokens_details
+            record.cached_tokens = (details.cached_tokens or 0) if details else 0
+        self.requests.append(record)
+
+    def record_failure(self, label: str, latency: float, retries: int) -> None:
+        """
+        Record an extraction request that failed after its last retry.
+
+        Args:
+            label: What the request was for, e.g. the first thread of the chunk.
+            latency: Seconds from sending the first attempt to giving up.
+            retries: Number of retries before the request gave up.
+        """
+        self.requests.append(
+            RequestRecord(label, latency, retries=retries, failed=True)
+        )
+
+    def estimated_cost(self) -> float | None:
+        """Estimate the cost of all recorded requests in USD."""
+        prices = model_prices(self.model)
+        if prices is None:
+            return None
+        input_price, cached_price, output_price = prices
+        cost = 0.0
+        for record in self.requests:
+            request_cost = (
+                (record.prompt_tokens - record.cached_tokens) * input_price
+                + record.cached_tokens * cached_price
+                + record.completion_tokens * output_price
+            ) / 1_000_000
+            cost += request_cost * (BATCH_PRICE_FACTOR if record.batch else 1.0)
+        return cost
+
+    def summary(self) -> dict[str, Any]:
+        """Return all metrics as a JSON-compatible dict."""
+        latencies = [r.latency for r in self.requests if r.latency is not None]
+        prompt_tokens = sum(r.prompt_tokens for r in self.requests)
+        completion_tokens = sum(r.completion_tokens for r in self.requests)
+        extract_time = self.stages.get("extract")
+        slowest = sorted(
+            (r for r in self.requests if r.latency is not None),
+            key=lambda r: r.latency or 0.0,
+            reverse=True,
+        )[:SLOWEST_REQUESTS]
+
+        return {
+            "model": self.model,
+            "started_at": self.started_at.isoformat(),
+            "stages": self.stages,
+            "requests": {
+                "count": len(self.requests),
+                "failed": sum(r.failed for r in self.requests),
+                "retries": sum(r.retries for r in self.requests),
+                "latency": {
+                    "p50": _percentile(latencies, 50),
+                    "p95": _percentile(latencies, 95),
+                    "p99": _percentile(latencies, 99),
+                    "max": max(latencies, default=None),
+                },
+                "slowest": [{"label": r.label, "latency": r.latency} for r in slowest],
+            },
+            "tokens": {
+                "prompt": prompt_tokens,
+                "completion": completion_tokens,
+                "cached": sum(r.cached_tokens for r in self.requests),
+            },
+            "throughput": {
+                "requests_per_second": len(self.requests) / extract_time
+                if extract_time
+                else None,
+                "tokens_per_second": (prompt_tokens + completion_tokens) / extract_time
+                if extract_time
+                else None,
+            },
+            "estimated_cost_usd": self.estimated_cost(),
+        }
+
+    def write_json(self, path: Path) -> None:
+        """Write the metrics summary as JSON."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+        logger.info(f"Wrote metrics to {path}")
+
+    def to_openmetrics(self) -> str:
+        """Render the metrics in the OpenMetrics text format."""
+        model = self.model.replace('"', '\\"')
+        latencies = [r.latency for r in self.requests if r.latency is not None]
+        lines = [
+            "# TYPE slack_archive_stage_seconds gauge",
+            "# UNIT slack_archive_stage_seconds seconds",
+            *(
+                f'slack_archive_stage_seconds{{stage="{stage}"}} {seconds}'
+                for stage, seconds in self.stages.items()
+            ),
+            "# TYPE slack_archive_request_latency_seconds summary",
+            "# UNIT slack_archive_request_latency_seconds seconds",
+            *(
+                f'slack_archive_request_latency_seconds{{quantile="{q / 100}"}} {value}'
+                for q in (50, 95, 99)
+                if (value := _percentile(latencies, q)) is not None
+            ),
+            f"slack_archive_request_latency_seconds_sum {sum(latencies)}",
+            f"slack_archive_request_latency_seconds_count {len(latencies)}",
+            "# TYPE slack_archive_requests counter",
+            f'slack_archive_requests_total{{model="{model}"}} {len(self.requests)}',
+            "# TYPE slack_archive_request_failures counter",
+            "slack_archive_request_failures_total "
+            f"{sum(r.failed for r in self.requests)}",
+            "# TYPE slack_archive_request_retries counter",
+            "slack_archive_request_retries_total "
+            f"{sum(r.retries for r in self.requests)}",
+            "# TYPE slack_archive_tokens counter",
+            *(
+                f'slack_archive_tokens_total{{model="{model}",kind="{kind}"}} {count}'
+                for kind, count in (
+                    ("prompt", sum(r.prompt_tokens for r in self.requests)),
+                    ("completion", sum(r.completion_tokens for r in self.requests)),
+                    ("cached", sum(r.cached_tokens for r in self.requests)),
+                )
+            ),
+        ]
+        cost = self.estimated_cost()
+        if cost is not None:
+            lines += [
+                "# TYPE slack_archive_estimated_cost_usd gauge",
+                f'slack_archive_estimated_cost_usd{{model="{model}"}} {cost}',
+            ]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: Path) -> None:
+        """Write the metrics in the OpenMetrics text format."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.to_openmetrics(), encoding="utf-8")
+        logger.info(f"Wrote OpenMetrics to {path}")
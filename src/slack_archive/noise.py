@@ -0,0 +1,270 @@
+import logging
+import re
+import unicodedata
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from itertools import islice
+
+from slack_archive.config import NOISE_BOT_USERS, NOISE_FILTERS, NOISE_MIN_WORDS
+from slack_archive.thread import MESSAGE_TIMESTAMP_PATTERN, Thread
+
+logger = logging.getLogger(__name__)
+
+# A rule tells whether a thread is noise
+NoiseRule = Callable[[Thread], bool]
+# A batch rule tells for every thread of a batch whether it is noise
+BatchNoiseRule = Callable[[Sequence[Thread]], Iterable[bool]]
+# Number of threads the rules are applied to at once
+FILTER_BATCH_SIZE = 256
+
+# Messages slack posts about the channel itself, e.g. "<@U03...> has joined the
+# channel" or "set the channel topic: ..."
+CHANNEL_EVENT_PATTERN = re.compile(
+    r"^(?:<@\w+> has (?:joined|left) the channel"
+    r"|(?:set|changed|cleared|renamed) the channel\b.*)$"
+)
+# User ID in a message fingerprint, e.g. "[U03ERC46NKA] @"
+_AUTHOR_PATTERN = re.compile(r"\[(\w+)\]\s*\@")
+# Emoji shortcodes, e.g. ":+1:" or ":thinking_face:"
+_EMOJI_CODE_PATTERN = re.compile(r":[\w+'-]+:")
+# User and channel mentions, e.g. "<@U03ERC46NKA>"
+MENTION_PATTERN = re.compile(r"<[@#!][^>]*>")
+
+
+@dataclass
+class Message:
+    """
+    A message of a thread, the thread's first message or one of its replies.
+
+    Attributes:
+        user_id: Slack user ID of the author, or "" if the fingerprint has none.
+        text: Text of the message without its fingerprint and reply indentation.
+    """
+
+    user_id: str
+    text: str
+
+
+def split_messages(thread: Thread) -> list[Message]:
+    """Split a thread into its first message and its replies."""
+    messages: list[tuple[str, list[str]]] = []
+    for line in thread.content.splitlines():
+        if MESSAGE_TIMESTAMP_PATTERN.match(line):
+            author = _AUTHOR_PATTERN.search(line)
+            messages.append((author.group(1) if author else "", []))
+        elif messages:
+            messages[-1][1].append(line.removeprefix("|").removeprefix("   "))
+    return [Message(user_id, "\n".join(lines).strip()) for user_id, lines in messages]
+
+
+def is_channel_event(thread: Thread) -> bool:
+    """Whether a thread only has joins, leaves and channel setting changes."""
+    lines = [
+        line.strip()
+        for message in split_messages(thread)
+        for line in message.text.splitlines()
+        if line.strip()
+    ]
+    return bool(lines) and all(CHANNEL_EVENT_PATTERN.match(line) for line in lines)
+
+
+def bot_rule(bot_users: Iterable[str] = NOISE_BOT_USERS) -> NoiseRule:
+    """
+    Make a rule matching threads where every message is posted by a bot.
+
+    Args:
+        bot_users: User IDs of bots. Bot IDs of Slack apps ("B...") always count.
+    """
+    bots = frozenset(bot_users)
+
+    def is_bot_thread(thread: Thread) -> bool:
+        return all(
+            message.user_id in bots or message.user_id.startswith("B")
+            for message in split_messages(thread)
+        )
+
+    return is_bot_thread
+
+
+def _is_emoji(character: str) -> bool:
+    # Symbols, plus the joiners and modifiers that combine them.
+    return unicodedata.category(character) in {"So", "Sk", "Mn", "Cf"}
+
+
+def is_emoji_only(thread: Thread) -> bool:
+    """Whether every message of a thread is only emoji."""
+    emoji = False
+    for message in split_messages(thread):
+        text, codes = _EMOJI_CODE_PATTERN.subn("", message.text)
+        characters = [character for character in text if not character.isspace()]
+        if not all(_is_emoji(character) for character in characters):
+            return False
+        emoji = emoji or bool(codes or characters)
+    return emoji
+
+
+def short_rule(min_words: int = NOISE_MIN_WORDS) -> NoiseRule:
+    """
+    Make a rule matching threads with fewer than `min_words` words in total.
+
+    Mentions do not count as words, so "<@U03...> thanks" is a single word.
+    """
+
+    def is_short(thread: Thread) -> bool:
+        words = sum(
+            len(MENTION_PATTERN.sub(" ", message.text).split())
+            for message in split_messages(thread)
+        )
+        return words < min_words
+
+    return is_short
+
+
+def builtin_rules(
+    min_words: int = NOISE_MIN_WORDS, bot_users: Iterable[str] = NOISE_BOT_USERS
+) -> dict[str, NoiseRule]:
+    """Return the built-in rules by name, in the order they are applied."""
+    return {
+        "membership": is_channel_event,
+        "bots": bot_rule(bot_users),
+        "emoji_only": is_emoji_only,
+        "short": short_rule(min_words),
+    }
+
+
+@dataclass
+class RuleStats:
+    """
+    What a rule removed.
+
+    Attributes:
+        threads: Number of threads removed.
+        tokens: Number of tokens of the removed threads.
+    """
+
+    threads: int = 0
+    tokens: int = 0
+
+
+class NoiseFilter:
+    """
+    Removes threads with nothing to extract before they are chunked.
+
+    Rules are applied in order and a thread is removed by the first rule that
+    matches it. Besides the built-in rules, any callable taking a thread can be
+    used as a rule, and any callable taking a batch of threads as a batch rule, for
+    rules that are cheaper on many threads at once. Threads are filtered in
+    batches of `FILTER_BATCH_SIZE`. What every rule removed is counted, in threads
+    and tokens, for each pass over the threads.
+
+    Attributes:
+        rules: Rules by name, in the order they are applied, as batch rules.
+        stats: What each rule removed in the current or last pass, by rule name.
+        kept: Number of threads no rule matched in the current or last pass.
+    """
+
+    def __init__(self, rules: Mapping[str, NoiseRule]):
+        self.rules: dict[str, BatchNoiseRule] = {}
+        self.stats: dict[str, RuleStats] = {}
+        self.kept = 0
+        for name, rule in rules.items():
+            self.add_rule(name, rule)
+
+    def reset(self) -> None:
+        """Clear the stats, e.g. before another pass over the threads."""
+        self.stats = {name: RuleStats() for name in self.rules}
+        self.kept = 0
+
+    @classmethod
+    def from_names(
+        cls,
+        names: Sequence[str] = NOISE_FILTERS,
+        min_words: int = NOISE_MIN_WORDS,
+        bot_users: Iterable[str] = NOISE_BOT_USERS,
+    ) -> "NoiseFilter":
+        """
+        Create a filter of built-in rules.
+
+        Args:
+            names: Names of the built-in rules to apply, see `builtin_rules`.
+            min_words: Fewest words of a thread kept by the "short" rule.
+            bot_users: User IDs of bots for the "bots" rule.
+
+        Raises:
+            ValueError: If a name is not a built-in rule.
+        """
+        rules = builtin_rules(min_words, bot_users)
+        unknown = [name for name in names if name not in rules]
+        if unknown:
+            raise ValueError(
+                f"Unknown noise filters {unknown}, expected some of {list(rules)}"
+            )
+        return cls({name: rules[name] for name in names})
+
+    def add_rule(self, name: str, rule: NoiseRule) -> None:
+        """Apply another rule after the existing ones."""
+        self.add_batch_rule(name, lambda threads: map(rule, threads))
+
+    def add_batch_rule(self, name: str, rule: BatchNoiseRule) -> None:
+        """Apply another rule, taking a batch of threads, after the existing ones."""
+        self.rules[name] = rule
+        self.stats[name] = RuleStats()
+
+    def match(self, thread: Thread) -> str | None:
+        """Return the name of the first rule matching a thread, if any."""
+        return next(
+            (name for name, rule in self.rules.items() if any(rule([thread]))), None
+        )
+
+    def filter(
+        self,
+        threads: Iterable[Thread],
+        count_tokens: Callable[[Sequence[str]], list[int]] | None = None,
+    ) -> Iterator[Thread]:
+        """
+        Stream the threads that are not noise, starting a new pass of the stats.
+
+        Args:
+            threads: Threads to filter.
+            count_tokens: Counts the tokens of texts, for the stats of removed
+                threads. Threads are counted as they are chunked, fingerprint line
+                included. Tokens are not counted without it.
+
+        Yields the threads no rule matches, in order.
+        """
+        self.reset()
+        thread_iter = iter(threads)
+        while batch := list(islice(thread_iter, FILTER_BATCH_SIZE)):
+            kept = self._filter_batch(batch, count_tokens)
+            self.kept += len(kept)
+            yield from kept
+
+    def _filter_batch(
+        self,
+        batch: list[Thread],
+        count_tokens: Callable[[Sequence[str]], list[int]] | None,
+    ) -> list[Thread]:
+        """Apply every rule to the threads of a batch that earlier rules kept."""
+        for name, rule in self.rules.items():
+            if not batch:
+                break
+            kept: list[Thread] = []
+            removed: list[Thread] = []
+            for thread, match in zip(batch, rule(batch), strict=True):
+                (removed if match else kept).append(thread)
+            batch = kept
+            stats = self.stats[name]
+            stats.threads += len(removed)
+            if count_tokens is not None and removed:
+                stats.tokens += sum(count_tokens([str(thread) for thread in removed]))
+        return batch
+
+    def log_stats(self) -> None:
+        """Log what every rule removed."""
+        removed = sum(stats.threads for stats in self.stats.values())
+        logger.info(
+            f"Noise filter removed {removed} of {removed + self.kept} threads, "
+            f"{sum(stats.tokens for stats in self.stats.values())} tokens"
+        )
+        for name, stats in self.stats.items():
+            logger.info(f"- {name}: {stats.threads} threads, {stats.tokens} tokens")
@@ -1,46 +1,99 @@
 import logging
+from typing import Protocol
 
-from slack_archive.chunking import ConversationProcessor
+from slack_archive.resolver import FingerprintResolver
 from slack_archive.schema import PostProcessedStakeholderNote, StakeholderNote
 
 logger = logging.getLogger(__name__)
 
 
+class ThreadSource(Protocol):
+    """
+    Where post-processing looks up threads.
+
+    Implemented by ConversationProcessor for the dump of a run, and by
+    `archive.ArchivedChannel` for a channel of the thread archive.
+    """
+
+    @property
+    def fingerprint_resolver(self) -> FingerprintResolver: ...
+
+    def get_thread_contents(self, fingerprint: str) -> list[str]: ...
+
+
 def post_process(
     note: StakeholderNote,
-    conversation_processor: ConversationProcessor,
+    conversation_processor: ThreadSource,
 ) -> PostProcessedStakeholderNote:
     """
     Post-process a StakeholderNote by retrieving full Slack thread content.
 
+    Fingerprints are resolved through the processor's fingerprint resolver, so
+    slightly wrong fingerprints still find their thread. The note keeps the
+    resolved fingerprints.
+
     Args:
         note: The StakeholderNote to be post-processed.
-        conversation_processor: An instance of ConversationProcessor to retrieve thread
-        content.
+        conversation_processor: Source of the thread content, e.g. the
+            ConversationProcessor of the dump.
 
     Returns:
         A PostProcessedStakeholderNote with full Slack thread content as markdown.
     """
     logger.info(f"Post-processing note for stakeholder: {note.stakeholder_name}")
 
+    resolver = conversation_processor.fingerprint_resolver
+    fingerprints: list[str] = []
     full_threads: list[str] = []
-    for thread_fingerprint in note.relevant_slack_threads:
-        if thread_fingerprint in conversation_processor.thread_map:
-            full_threads.append(
-                conversation_processor.get_thread_content(thread_fingerprint)
-            )
-            logger.debug(f"Retrieved full content for thread: {thread_fingerprint}")
-        else:
+    for thread_fingerprint, resolved in zip(
+        note.relevant_slack_threads,
+        resolver.resolve_many(note.relevant_slack_threads),
+        strict=True,
+    ):
+        if resolved is None:
             logger.warning(
                 f"Thread fingerprint '{thread_fingerprint}' not found in conversation"
             )
+        elif resolved not in fingerprints:
+            fingerprints.append(resolved)
+            full_threads.extend(conversation_processor.get_thread_contents(resolved))
+            logger.debug(f"Retrieved full content for thread: {resolved}")
 
     full_threads_markdown = "\n\n".join(full_threads)
     logger.debug(f"Combined {len(full_threads)} threads into markdown")
 
     post_processed_note = PostProcessedStakeholderNote(
-        **note.model_dump(),
+        **note.model_dump(exclude={"relevant_slack_threads"}),
+        relevant_slack_threads=fingerprints,
         full_slack_threads=full_threads_markdown,
     )
     logger.info(f"Post-processing completed for stakeholder: {note.stakeholder_name}")
     return post_processed_note
+
+
+def post_process_all(
+    notes: list[StakeholderNote],
+    conversation_processor: ThreadSource,
+) -> list[PostProcessedStakeholderNote]:
+    """
+    Post-process many notes of the same conversation.
+
+    The fingerprints of all notes are resolved in one batch first, so every
+    distinct fingerprint is resolved once, however many notes cite it. Only the
+    fingerprints that no exact or timestamp lookup resolves are fuzzy matched, one
+    at a time.
+
+    Args:
+        notes: The notes to be post-processed.
+        conversation_processor: Source of the thread content, e.g. the
+            ConversationProcessor of the dump.
+
+    Returns:
+        The post-processed notes, in order.
+    """
+    resolver = conversation_processor.fingerprint_resolver
+    resolver.resolve_many(
+        fingerprint for note in notes for fingerprint in note.relevant_slack_threads
+    )
+    logger.info(f"Resolved thread fingerprints: {resolver.stats}")
+    return [post_process(note, conversation_processor) for note in notes]
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import re
+import time
+from collections.abc import AsyncGenerator, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+from slack_archive.config import (
+    API_MAX_RETRIES,
+    API_RETRY_DELAY,
+    MAX_CONCURRENT,
+    RATE_LIMIT_RPM,
+    RATE_LIMIT_TPM,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parts of the durations of x-ratelimit-reset-* headers, e.g. "1s", "6m0s", "20ms"
+_DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """
+    Concurrency and retries of the API requests of a run.
+
+    Attributes:
+        max_concurrent: Maximum number of requests in flight.
+        max_retries: Retries of rate-limited, failed or timed out requests.
+        retry_delay: Base delay of the exponential backoff between retries, in
+            seconds.
+    """
+
+    max_concurrent: int = MAX_CONCURRENT
+    max_retries: int = API_MAX_RETRIES
+    retry_delay: float = API_RETRY_DELAY
+
+
+def parse_duration(value: str) -> float | None:
+    """
+    Parse the duration of an x-ratelimit-reset-* header.
+
+    Args:
+        value: Duration such as "1s", "6m0s" or "20ms".
+
+    Returns:
+        The duration in seconds, or None if the value is not a duration.
+    """
+    parts = _DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """
+    Read how long to wait before retrying from the headers of a response.
+
+    Args:
+        headers: Response headers, with lowercase names if a plain dict.
+
+    Returns:
+        Seconds to wait according to the retry-after-ms or Retry-After header, or
+        None if neither holds a valid value.
+    """
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds is not None:
+        try:
+            return max(0.0, float(milliseconds) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _Bucket:
+    """A token bucket refilled continuously, up to its capacity per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self.level = min(self.capacity, self.level + elapsed * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available; more than the capacity never is."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+
+class RateLimiter:
+    """
+    Client-side limiter of the requests and tokens per minute sent to the API.
+
+    A single limiter is shared by all requests of a run. Every request takes one
+    request and its estimated tokens from two token buckets, which refill at the
+    per-minute limits, and waits while either is empty. The limits and remaining
+    budgets reported in the x-ratelimit-* response headers replace the configured
+    ones, so the limiter follows the real limits of the account and the requests
+    of other clients sharing it.
+
+    The number of requests in flight adapts too. A rate-limited response pauses
+    all requests for its Retry-After and halves the concurrency, and every
+    successful request raises it again, by about one per round of requests, up to
+    `max_concurrent`.
+
+    Attributes:
+        requests: Bucket of requests per minute.
+        tokens: Bucket of tokens per minute.
+        max_concurrent: Upper bound of the concurrency.
+        concurrency: Number of requests currently allowed in flight.
+        in_flight: Number of requests in flight.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = RATE_LIMIT_RPM,
+        tokens_per_minute: float = RATE_LIMIT_TPM,
+        max_concurrent: int = MAX_CONCURRENT,
+    ):
+        self.requests = _Bucket(requests_per_minute)
+        self.tokens = _Bucket(tokens_per_minute)
+        self.max_concurrent = max_concurrent
+        self.concurrency = float(max_concurrent)
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def request(self, tokens: int) -> AsyncGenerator[None]:
+        """
+        Hold a slot for a request, waiting until the limits allow it.
+
+        Args:
+            tokens: Estimated tokens of the request, see `reconcile`.
+        """
+        async with self._condition:
+            while (wait := self._wait_time(tokens)) is not None:
+                try:
+                    await asyncio.wait_for(self._condition.wait(), wait or None)
+                except TimeoutError:
+                    pass
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Follow the limits and remaining budgets of the x-ratelimit-* headers.
+
+        Args:
+            headers: Headers of a response, successful or not.
+        """
+        now = time.monotonic()
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = _number(headers.get(f"x-ratelimit-limit-{kind}"))
+            if limit:
+                bucket.capacity = limit
+            remaining = _number(headers.get(f"x-ratelimit-remaining-{kind}"))
+            if remaining is None:
+                continue
+            bucket.refill(now)
+            bucket.level = min(bucket.level, remaining)
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}", ""))
+            if remaining < 1 and reset:
+                self.pause(reset)
+
+    def throttle(self, retry_after: float | None) -> None:
+        """
+        Back off after a rate-limited response.
+
+        Args:
+            retry_after: Seconds to pause all requests for, if the response said.
+        """
+        if retry_after:
+            self.pause(retry_after)
+        self.concurrency = max(1.0, self.concurrency / 2)
+        logger.warning(
+            f"Rate limited, pausing {retry_after or 0:.1f}s and lowering the "
+            f"concurrency to {int(self.concurrency)}"
+        )
+
+    def succeed(self) -> None:
+        """Raise the concurrency after a successful request."""
+        self.concurrency = min(
+            float(self.max_concurrent), self.concurrency + 1 / self.concurrency
+        )
+
+    def reconcile(self, estimated: int, used: int) -> None:
+        """Charge the difference between the estimated and actual tokens."""
+        self.tokens.level -= used - estimated
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests for a while."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_time(self, tokens: int) -> float | None:
+        """
+        Return how long a request has to wait before it may start.
+
+        Returns:
+            None if it may start now, 0.0 if it has to wait until a request in
+            flight finishes, or else the number of seconds to wait.
+        """
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(
+            self._paused_until - now,
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+        )
+        if wait > 0:
+            return wait
+        # Otherwise only the concurrency holds the request back, until a release.
+        return None if self.in_flight < int(self.concurrency) else 0.0
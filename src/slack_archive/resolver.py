@@ -0,0 +1,180 @@
+import logging
+import re
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import timedelta
+
+from rapidfuzz import fuzz, process
+
+from slack_archive.config import FINGERPRINT_TOLERANCE_SECONDS, FUZZY_MATCH_CUTOFF
+from slack_archive.thread import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# User ID and timestamp of a fingerprint, e.g. "[U03ERC46NKA] @ 06/01/2023 11:44:42"
+FINGERPRINT_PARTS_PATTERN = re.compile(
+    r"\[(\w+)\]\s*\@\s*(\d{2}\/\d{2}\/\d{4} \d{2}:\d{2}:\d{2})"
+)
+
+
+@dataclass
+class ResolutionStats:
+    """
+    Counts of how distinct fingerprints were resolved.
+
+    Attributes:
+        exact: Fingerprints found as they were, after normalization.
+        window: Fingerprints matched by user ID and a nearby timestamp.
+        fuzzy: Fingerprints matched by fuzzy string similarity.
+        missed: Fingerprints that could not be resolved.
+    """
+
+    exact: int = 0
+    window: int = 0
+    fuzzy: int = 0
+    missed: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.exact} exact, {self.window} by timestamp, {self.fuzzy} fuzzy, "
+            f"{self.missed} missed"
+        )
+
+
+class FingerprintResolver:
+    """
+    Resolves thread fingerprints returned by the model to fingerprints of the dump.
+
+    Fingerprints are tried in order of cost: an exact lookup of the normalized
+    fingerprint, then a lookup by user ID within a tolerance window around the
+    timestamp through a sorted per-user index, and finally fuzzy matching. Fuzzy
+    matching scores the threads of the same user first and only falls back to all
+    threads when none of them is close enough, keeping one best match at a time
+    instead of a full score matrix.
+
+    Attributes:
+        fingerprints: Fingerprints of all threads of the dump.
+        tolerance: Maximum timestamp difference of a match by user ID.
+        score_cutoff: Minimum similarity score (0-100) of a fuzzy match.
+        stats: How the fingerprints resolved so far were matched.
+    """
+
+    def __init__(
+        self,
+        fingerprints: Iterable[str],
+        tolerance: timedelta = timedelta(seconds=FINGERPRINT_TOLERANCE_SECONDS),
+        score_cutoff: float = FUZZY_MATCH_CUTOFF,
+    ):
+        self.fingerprints = list(fingerprints)
+        self.tolerance = tolerance
+        self.score_cutoff = score_cutoff
+        self.stats = ResolutionStats()
+        self._known = set(self.fingerprints)
+        self._resolved: dict[str, str | None] = {}
+
+        by_user: dict[str, list[tuple[float, str]]] = {}
+        for fingerprint in self.fingerprints:
+            parts = self._parse(fingerprint)
+            if parts is not None:
+                user_id, timestamp = parts
+                by_user.setdefault(user_id, []).append((timestamp, fingerprint))
+        self._timestamps: dict[str, list[float]] = {}
+        self._by_timestamp: dict[str, list[str]] = {}
+        for user_id, entries in by_user.items():
+            entries.sort()
+            self._timestamps[user_id] = [timestamp for timestamp, _ in entries]
+            self._by_timestamp[user_id] = [fingerprint for _, fingerprint in entries]
+
+    @staticmethod
+    def normalize(fingerprint: str) -> str:
+        """
+        Bring a fingerprint into the form used by the thread index.
+
+        Strips surrounding whitespace and a leading "> ", and restores the trailing
+        " Z:".
+        """
+        fingerprint = fingerprint.strip().removeprefix(">").strip()
+        return re.sub(r"\s*Z?:?$", "", fingerprint) + " Z:"
+
+    def resolve(self, fingerprint: str) -> str | None:
+        """Resolve a single fingerprint, see `resolve_many`."""
+        (resolved,) = self.resolve_many([fingerprint])
+        return resolved
+
+    def resolve_many(self, fingerprints: Iterable[str]) -> list[str | None]:
+        """
+        Resolve fingerprints to fingerprints of the dump.
+
+        Args:
+            fingerprints: Fingerprints as returned by the model.
+
+        Returns:
+            The matching fingerprint of the dump for each fingerprint, in order, or
+            None where no thread matched.
+        """
+        fingerprints = list(fingerprints)
+        for fingerprint in dict.fromkeys(fingerprints):
+            if fingerprint in self._resolved:
+                continue
+            normalized = self.normalize(fingerprint)
+            if normalized in self._known:
+                self._resolved[fingerprint] = normalized
+                self.stats.exact += 1
+            elif (match := self._match_window(normalized)) is not None:
+                self._resolved[fingerprint] = match
+                self.stats.window += 1
+            elif (match := self._match_fuzzy(normalized)) is not None:
+                self._resolved[fingerprint] = match
+                self.stats.fuzzy += 1
+            else:
+                self._resolved[fingerprint] = None
+                self.stats.missed += 1
+        return [self._resolved[fingerprint] for fingerprint in fingerprints]
+
+    def _match_window(self, fingerprint: str) -> str | None:
+        """Find the thread of the same user closest in time within the tolerance."""
+        parts = self._parse(fingerprint)
+        if parts is None or parts[0] not in self._timestamps:
+            return None
+        user_id, timestamp = parts
+        timestamps = self._timestamps[user_id]
+        tolerance = self.tolerance.total_seconds()
+
+        best: str | None = None
+        best_distance = tolerance
+        index = bisect_left(timestamps, timestamp - tolerance)
+        while index < len(timestamps) and timestamps[index] <= timestamp + tolerance:
+            distance = abs(timestamps[index] - timestamp)
+            if distance <= best_distance:
+                best, best_distance = self._by_timestamp[user_id][index], distance
+            index += 1
+        return best
+
+    def _match_fuzzy(self, fingerprint: str) -> str | None:
+        """Find the most similar thread, preferring threads of the same user."""
+        parts = self._parse(fingerprint)
+        same_user = self._by_timestamp.get(parts[0], []) if parts else []
+        for candidates in (same_user, self.fingerprints):
+            match = process.extractOne(
+                fingerprint,
+                candidates,
+                scorer=fuzz.ratio,
+                score_cutoff=self.score_cutoff,
+            )
+            if match is not None:
+                logger.debug(f"Fuzzy matched '{fingerprint}' to '{match[0]}'")
+                return match[0]
+        return None
+
+    @staticmethod
+    def _parse(fingerprint: str) -> tuple[str, float] | None:
+        """Extract the user ID and the timestamp (in epoch seconds)."""
+        match = FINGERPRINT_PARTS_PATTERN.search(fingerprint)
+        if match is None:
+            return None
+        try:
+            timestamp = parse_timestamp(match.group(2)).timestamp()
+        except ValueError:
+            return None
+        return match.group(1), timestamp
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 
 
-class StakeholderNote(BaseModel):
+class StakeholderNoteBase(BaseModel):
     stakeholder_name: str = Field(
         description=(
             "The name of the stakeholder. This should be the name of the partner "
@@ -27,6 +27,28 @@ class StakeholderNote(BaseModel):
             "This should be a concise overview of the interaction."
         )
     )
+
+
+class ExtractedStakeholderNote(StakeholderNoteBase):
+    relevant_thread_ids: list[int] = Field(
+        description=(
+            "The IDs of the Slack threads related to this note. Each thread in the "
+            "context is preceded by its ID in square brackets, e.g. [3] for ID 3."
+        )
+    )
+
+
+class ExtractedStakeholderNotes(BaseModel):
+    stakeholder_notes: list[ExtractedStakeholderNote] = Field(
+        default_factory=list,
+        description=(
+            "A list of ExtractedStakeholderNote objects extracted from the given "
+            "context"
+        ),
+    )
+
+
+class StakeholderNote(StakeholderNoteBase):
     relevant_slack_threads: list[str] = Field(
         description=(
             "A list of unique identifiers for Slack threads related to this note. "
@@ -55,6 +77,7 @@ class PostProcessedStakeholderNote(StakeholderNote):
 
 
 if __name__ == "__main__":
+    print(ExtractedStakeholderNotes.model_json_schema())
     print(StakeholderNote.model_json_schema())
     print(StakeholderNotes.model_json_schema())
     print(PostProcessedStakeholderNote.model_json_schema())
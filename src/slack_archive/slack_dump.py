@@ -1,24 +1,63 @@
 import asyncio
+import logging
 import platform
+import shutil
+from collections import deque
+from collections.abc import Callable, Sequence
+from datetime import datetime
 from importlib import resources
 from pathlib import Path
 
 from rich.console import Console
+from rich.progress import Progress
+
+from slack_archive.cache import ExportCache
+from slack_archive.config import EXPORT_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Number of trailing stderr lines of slackdump included in errors
+STDERR_TAIL_LINES = 20
+# Longest stderr line of slackdump read at once, in bytes
+STDERR_LINE_LIMIT = 1024 * 1024
+# Time format of the slackdump time range flags
+SLACKDUMP_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
 
 class SlackDumpManager:
-    """Manages slackdump binary execution."""
+    """Manages slackdump binary execution.
 
-    def __init__(self, console: Console | None = None):
-        """Initialize SlackDumpManager."""
+    Exports run concurrently, at most `max_concurrent` at a time. The stderr output
+    of slackdump is streamed line by line as progress, and finished exports are
+    stored in the export cache, if one is given, so repeated runs reuse them.
+    """
+
+    def __init__(
+        self,
+        console: Console | None = None,
+        binary_path: Path | None = None,
+        max_concurrent: int = EXPORT_CONCURRENCY,
+        cache: ExportCache | None = None,
+    ):
+        """Initialize SlackDumpManager.
+
+        Args:
+            console: Console used for output.
+            binary_path: Path to the slackdump binary. Defaults to the binary
+                installed with the package.
+            max_concurrent: Maximum number of exports running at once.
+            cache: Cache of finished exports, or None to always export.
+        """
         self.console = console or Console()
         self.binary_name = (
             "slackdump.exe" if platform.system().lower() == "windows" else "slackdump"
         )
         # Get binary from package installation directory
-        self.binary_path = Path(
+        self.binary_path = binary_path or Path(
             str(resources.files("slack_dump") / "bin" / self.binary_name)
         )
+        self.cache = cache
+        self._semaphore = asyncio.Semaphore(max_concurrent)
 
         if not self.binary_path.exists():
             raise RuntimeError(
@@ -37,22 +76,142 @@ class SlackDumpManager:
         stdout, _ = await process.communicate()
         return stdout.decode().strip()
 
-    async def export_slack_data(self, output_path: Path) -> Path:
-        """Run slackdump export and return path to exported data."""
-        process = await asyncio.create_subprocess_exec(
-            str(self.binary_path),
-            "--export",
-            str(output_path),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        _, stderr = await process.communicate()
+    async def export_slack_data(
+        self,
+        output_path: Path,
+        channels: Sequence[str] = (),
+        time_from: datetime | None = None,
+        time_to: datetime | None = None,
+        on_progress: Callable[[str], None] | None = None,
+    ) -> Path:
+        """Run slackdump export and return path to exported data.
+
+        Args:
+            output_path: Where slackdump writes the export.
+            channels: IDs of the channels to export. Exports everything if empty.
+            time_from: Only export messages from this time on, if given.
+            time_to: Only export messages up to this time, if given.
+            on_progress: Called with every line slackdump writes to stderr.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(channels, time_from, time_to)
+            if cached is not None:
+                logger.info(f"Reusing cached export for {output_path.name}")
+                shutil.copyfile(cached, output_path)
+                return output_path
 
-        if process.returncode != 0:
-            raise RuntimeError(f"Slackdump failed: {stderr.decode()}")
+        args = [str(self.binary_path)]
+        if time_from is not None:
+            args += ["-dump-from", time_from.strftime(SLACKDUMP_TIME_FORMAT)]
+        if time_to is not None:
+            args += ["-dump-to", time_to.strftime(SLACKDUMP_TIME_FORMAT)]
+        # Export next to the output first, so an interrupted export is never taken
+        # for a finished one.
+        partial_path = output_path.with_name(output_path.name + ".partial")
+        args += ["--export", str(partial_path), *channels]
 
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                limit=STDERR_LINE_LIMIT,
+            )
+            if process.stderr is None:
+                process.kill()
+                await process.wait()
+                raise RuntimeError("Slackdump started without a stderr pipe")
+            try:
+                tail = await self._read_stderr(
+                    process.stderr, output_path.name, on_progress
+                )
+                returncode = await process.wait()
+            except BaseException:
+                # Cancelled or failed while slackdump runs: do not leave it behind.
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+                partial_path.unlink(missing_ok=True)
+                raise
+
+        if returncode != 0:
+            partial_path.unlink(missing_ok=True)
+            raise RuntimeError("Slackdump failed: " + "\n".join(tail))
+        partial_path.replace(output_path)
+
+        if self.cache is not None:
+            self.cache.put(output_path, channels, time_from, time_to)
         return output_path
 
+    @staticmethod
+    async def _read_stderr(
+        stderr: asyncio.StreamReader,
+        name: str,
+        on_progress: Callable[[str], None] | None,
+    ) -> deque[str]:
+        """Log the stderr lines of slackdump, and return the last of them."""
+        tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+        async for raw_line in stderr:
+            line = raw_line.decode(errors="replace").rstrip()
+            if not line:
+                continue
+            tail.append(line)
+            logger.debug(f"slackdump {name}: {line}")
+            if on_progress is not None:
+                on_progress(line)
+        return tail
+
+    async def export_channels(
+        self,
+        output_dir: Path,
+        channels: Sequence[str],
+        time_from: datetime | None = None,
+        time_to: datetime | None = None,
+        progress: Progress | None = None,
+    ) -> dict[str, Path]:
+        """Export channels concurrently, each to `<channel ID>.txt` in a directory.
+
+        Args:
+            output_dir: Directory the exports are written to.
+            channels: IDs of the channels to export.
+            time_from: Only export messages from this time on, if given.
+            time_to: Only export messages up to this time, if given.
+            progress: Progress display that gets a task per channel showing the
+                latest slackdump output.
+
+        Returns:
+            The path of the export of each channel.
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        async def export(channel: str) -> Path:
+            task = None
+            if progress is not None:
+                task = progress.add_task(f"Exporting {channel}", total=None)
+
+            def on_progress(line: str) -> None:
+                if progress is not None and task is not None:
+                    progress.update(task, description=f"{channel}: {line[:60]}")
+
+            path = await self.export_slack_data(
+                output_dir / f"{channel}.txt",
+                [channel],
+                time_from,
+                time_to,
+                on_progress,
+            )
+            if progress is not None and task is not None:
+                progress.update(
+                    task, description=f"{channel}: done", total=1, completed=1
+                )
+            return path
+
+        async with asyncio.TaskGroup() as task_group:
+            tasks = {
+                channel: task_group.create_task(export(channel)) for channel in channels
+            }
+        return {channel: task.result() for channel, task in tasks.items()}
+
     async def __aenter__(self):
         """Async context manager entry."""
         return self
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from slack_archive.chunking import Chunk, ConversationProcessor
+from slack_archive.config import DEDUP_RETAIN_CHUNKS
+from slack_archive.dedup import NoteDeduplicator
+from slack_archive.md_dump import MarkdownWriter
+from slack_archive.postprocess import post_process_all
+from slack_archive.schema import StakeholderNotes
+from slack_archive.structured_extract import OpenAIManager
+from slack_archive.thread import Thread
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamResult:
+    """
+    Outcome of a streaming run.
+
+    Attributes:
+        chunks: Number of chunks that went through the pipeline.
+        notes: Number of notes written, after merging duplicates.
+        failures: Map of chunk index to the exception raised while extracting it.
+    """
+
+    chunks: int = 0
+    notes: int = 0
+    failures: dict[int, Exception] = field(default_factory=dict)
+
+
+class StreamingPipeline:
+    """
+    Runs chunking, extraction, post-processing and writing as overlapping stages.
+
+    The stages are connected by bounded queues: chunks are produced while earlier
+    chunks are still being extracted, and the notes of every chunk are
+    post-processed and written as soon as the chunk completes. A full queue blocks
+    the stage feeding it, so neither chunks nor notes pile up in memory however
+    large the dump is. Duplicates come from nearby chunks, so deduplication forgets
+    notes no duplicate was found for in the last `DEDUP_RETAIN_CHUNKS` chunks,
+    whatever order the chunks complete in. Once all chunks succeeded, the markdown
+    files of notes that no longer exist are pruned.
+
+    Attributes:
+        openai_manager: Manager used for the extraction.
+        processor: Processor of the Slack dump.
+        output_dir: Directory the notes are written to.
+        workers: Number of chunks extracted concurrently.
+        queue_size: Capacity of each queue between two stages.
+    """
+
+    def __init__(
+        self,
+        openai_manager: OpenAIManager,
+        processor: ConversationProcessor,
+        output_dir: Path,
+        workers: int | None = None,
+        queue_size: int | None = None,
+    ):
+        self.openai_manager = openai_manager
+        self.processor = processor
+        self.output_dir = output_dir
+        self.workers = workers or openai_manager.max_concurrent
+        self.queue_size = queue_size or 2 * self.workers
+
+    async def run(
+        self,
+        threads: Iterable[Thread] | None = None,
+        progress_callback: Callable[[], None] | None = None,
+    ) -> StreamResult:
+        """
+        Stream the threads through all stages.
+
+        Args:
+            threads: Threads to extract notes from. Defaults to all threads of the
+                dump.
+            progress_callback: Called once for every chunk as soon as its notes
+                have been written, or it failed.
+
+        Returns:
+            Counts of the processed chunks and written notes, with the failures.
+        """
+        result = StreamResult()
+        writer = MarkdownWriter(self.output_dir)
+        chunk_queue: asyncio.Queue[tuple[int, Chunk] | None] = asyncio.Queue(
+            self.queue_size
+        )
+        note_queue: asyncio.Queue[StakeholderNotes | None] = asyncio.Queue(
+            self.queue_size
+        )
+
+        async def extract() -> None:
+            while (item := await chunk_queue.get()) is not None:
+                index, chunk = item
+                try:
+                    notes = await self.openai_manager.extract_chunk(chunk)
+                except Exception as e:
+                    logger.error(f"Chunk {index + 1} failed: {e}")
+                    result.failures[index] = e
+                    notes = None
+                await note_queue.put(notes or StakeholderNotes())
+
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(self._produce(threads, chunk_queue, result))
+                writer_task = task_group.create_task(
+                    self._write(note_queue, writer, result, progress_callback)
+                )
+                await asyncio.gather(
+                    *(task_group.create_task(extract()) for _ in range(self.workers))
+                )
+                await note_queue.put(None)
+                await writer_task
+        finally:
+            writer.close()
+
+        if result.failures:
+            # The notes of the failed chunks are missing, not gone.
+            logger.warning("Some chunks failed, not pruning the markdown files")
+        else:
+            writer.prune()
+        logger.info(
+            f"Streamed {result.chunks} chunks into {result.notes} notes, "
+            f"{len(result.failures)} chunks failed; markdown files: "
+            f"{writer.stats.written} written, {writer.stats.unchanged} unchanged, "
+            f"{writer.stats.removed} removed"
+        )
+        return result
+
+    async def _produce(
+        self,
+        threads: Iterable[Thread] | None,
+        chunk_queue: asyncio.Queue[tuple[int, Chunk] | None],
+        result: StreamResult,
+    ) -> None:
+        """Chunk the threads in a worker thread and feed the extraction stage."""
+        chunks: Iterator[Chunk] = self.processor.iter_chunks(threads)
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            await chunk_queue.put((result.chunks, chunk))
+            result.chunks += 1
+        for _ in range(self.workers):
+            await chunk_queue.put(None)
+
+    async def _write(
+        self,
+        note_queue: asyncio.Queue[StakeholderNotes | None],
+        writer: MarkdownWriter,
+        result: StreamResult,
+        progress_callback: Callable[[], None] | None,
+    ) -> None:
+        """Deduplicate, post-process and write the notes of each chunk as it
+        completes."""
+        deduplicator = NoteDeduplicator(retain_calls=DEDUP_RETAIN_CHUNKS)
+        while (notes := await note_queue.get()) is not None:
+            if notes.stakeholder_notes:
+                # Notes merged into a note of an earlier chunk replace its file.
+                cluster_ids = deduplicator.add(notes.stakeholder_notes)
+                post_processed = await asyncio.to_thread(
+                    post_process_all,
+                    [deduplicator.notes[cluster_id] for cluster_id in cluster_ids],
+                    self.processor,
+                )
+                await asyncio.to_thread(writer.write, post_processed, cluster_ids)
+                result.notes = deduplicator.clusters
+            if progress_callback:
+                progress_callback()
@@ -1,92 +1,295 @@
 import asyncio
+import json
 import logging
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from importlib import resources
+from typing import Any
 
+import backoff
 import yaml
-from httpx import AsyncClient, AsyncHTTPTransport, Timeout
-from openai import AsyncOpenAI
+from httpx import AsyncClient, Limits, Timeout
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types.chat import ChatCompletionMessageParam, ParsedChatCompletion
 
-from slack_archive.config import DEFAULT_MODEL, MAX_CONCURRENT
-from slack_archive.schema import StakeholderNotes
+from slack_archive.cache import ExtractionCache
+from slack_archive.checkpoint import Checkpoint
+from slack_archive.chunking import Chunk
+from slack_archive.config import DEFAULT_MODEL
+from slack_archive.metrics import PipelineMetrics
+from slack_archive.rate_limit import RateLimiter, RequestPolicy, parse_retry_after
+from slack_archive.schema import ExtractedStakeholderNotes, StakeholderNotes
 
 logger = logging.getLogger(__name__)
 
+# Errors worth retrying: rate limits, server errors, timeouts and connection errors
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+# Longest backoff between two attempts of a request, in seconds
+MAX_RETRY_DELAY = 60.0
+# Rough number of characters per token, for chunks without a token count
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class ExtractionResult:
+    """Outcome of extracting stakeholder notes from a sequence of chunks.
+
+    Attributes:
+        notes: Extracted notes in chunk order. An entry is None when the chunk
+            failed or the API returned no parsed result.
+        failures: Map of chunk index to the exception raised while processing it.
+    """
+
+    notes: list[StakeholderNotes | None]
+    failures: dict[int, Exception] = field(default_factory=dict)
+
+    def successful(self) -> list[StakeholderNotes]:
+        """Return the extracted notes of all successful chunks, in chunk order."""
+        return [notes for notes in self.notes if notes is not None]
+
 
 class OpenAIManager:
     def __init__(
         self,
         model: str = DEFAULT_MODEL,
-        max_concurrent: int = MAX_CONCURRENT,
+        policy: RequestPolicy | None = None,
+        cache: ExtractionCache | None = None,
+        metrics: PipelineMetrics | None = None,
+        checkpoint: Checkpoint | None = None,
     ):
+        policy = policy or RequestPolicy()
         self.client = AsyncOpenAI(
+            # Retries are left to _create_completion, which paces them with the
+            # rate limiter.
+            max_retries=0,
             http_client=AsyncClient(
                 timeout=Timeout(60.0),
-                transport=AsyncHTTPTransport(retries=3),
+                # The pool is sized to the concurrency limit so every in-flight
+                # request gets a connection without queueing inside httpx.
+                limits=Limits(
+                    max_connections=policy.max_concurrent,
+                    max_keepalive_connections=policy.max_concurrent,
+                ),
             ),
         )
         self.model = model
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.policy = policy
+        self.max_concurrent = policy.max_concurrent
+        self.semaphore = asyncio.Semaphore(policy.max_concurrent)
+        self.rate_limiter = RateLimiter(max_concurrent=policy.max_concurrent)
         self.prompts = self.load_prompts()
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else PipelineMetrics(model)
+        self.checkpoint = checkpoint
+        self._schema = json.dumps(
+            ExtractedStakeholderNotes.model_json_schema(), sort_keys=True
+        )
 
     @staticmethod
     def load_prompts() -> dict[str, str]:
         """Load prompts from YAML file."""
-        with open("src/prompts.yaml", encoding="utf-8") as file:
+        prompts_file = resources.files("slack_archive") / "config" / "prompts.yaml"
+        with prompts_file.open(encoding="utf-8") as file:
             return yaml.safe_load(file)
 
+    def request_overhead(self) -> str:
+        """Return the text sent along with every chunk: prompts and response schema."""
+        return "\n".join([
+            self.prompts["system_message"],
+            self.prompts["user_message"].format(slack_context=""),
+            self._schema,
+        ])
+
+    def build_messages(self, chunk: str) -> list[ChatCompletionMessageParam]:
+        """Build the chat messages of the extraction request for a chunk."""
+        return [
+            {"role": "system", "content": self.prompts["system_message"]},
+            {
+                "role": "user",
+                "content": self.prompts["user_message"].format(slack_context=chunk),
+            },
+        ]
+
+    def cache_key(self, chunk: Chunk) -> str:
+        """Return the extraction cache key for a chunk under the current settings."""
+        return ExtractionCache.make_key(
+            chunk.text, self.model, self.prompts, self._schema
+        )
+
     async def extract_stakeholder_notes(
-        self, chunks: list[str], progress_callback: Callable[[], None] | None = None
-    ) -> list[StakeholderNotes]:
-        """Extract stakeholder notes with progress tracking."""
-        results: list[StakeholderNotes] = []
-        for chunk in chunks:
-            async with self.semaphore:
-                result = await self.process_chunk(chunk)
-                if result is not None:
-                    results.append(result)
-                if progress_callback:
-                    progress_callback()
-        return results
-
-    async def process_chunk(self, chunk: str) -> StakeholderNotes | None:
+        self,
+        chunks: Sequence[Chunk],
+        progress_callback: Callable[[], None] | None = None,
+    ) -> ExtractionResult:
+        """Extract stakeholder notes from all chunks concurrently.
+
+        Every chunk is scheduled up front and the semaphore bounds how many requests
+        are in flight at once. A failing chunk is recorded in the result instead of
+        cancelling the remaining ones. With a checkpoint, chunks it already holds are
+        skipped, every new result is checkpointed as soon as it arrives and failed
+        chunks are quarantined.
+
+        Args:
+            chunks: Slack contexts to extract notes from.
+            progress_callback: Called once for every chunk as soon as it finishes,
+                whether it succeeded or failed.
+
+        Returns:
+            The extracted notes in chunk order together with per-chunk failures.
+        """
+        result = ExtractionResult(notes=[None] * len(chunks))
+
+        async def run(index: int, chunk: Chunk) -> None:
+            try:
+                result.notes[index] = await self.extract_chunk(chunk)
+            except Exception as e:
+                result.failures[index] = e
+            if progress_callback:
+                progress_callback()
+
+        async with asyncio.TaskGroup() as task_group:
+            for index, chunk in enumerate(chunks):
+                task_group.create_task(run(index, chunk))
+
+        if result.failures:
+            logger.warning(
+                f"{len(result.failures)} of {len(chunks)} chunks failed to process"
+            )
+        return result
+
+    async def extract_chunk(self, chunk: Chunk) -> StakeholderNotes | None:
+        """Extract a single chunk under the semaphore, through the checkpoint.
+
+        A chunk held by the checkpoint is returned without a request. A new result
+        is checkpointed as soon as it arrives, and a failing chunk is quarantined
+        before the error is raised.
+        """
+        key = self.cache_key(chunk)
+        checkpoint = self.checkpoint
+        if checkpoint is not None:
+            checkpointed = checkpoint.get(key)
+            if checkpointed is not None:
+                return checkpointed
+
+        async with self.semaphore:
+            try:
+                notes = await self.process_chunk(chunk)
+            except Exception as e:
+                if checkpoint is not None:
+                    checkpoint.quarantine(key, chunk.text, e)
+                raise
+
+        if checkpoint is not None and notes is not None:
+            checkpoint.record(key, notes)
+        return notes
+
+    async def process_chunk(self, chunk: Chunk) -> StakeholderNotes | None:
         """Process a single Slack context."""
         logger.info(
-            f"Processing chunk of length {len(chunk)} starting with {chunk[:100]}..."
+            f"Processing chunk of length {len(chunk.text)} starting with "
+            f"{chunk.text[:100]}..."
         )
+        if self.cache is not None:
+            cached = self.cache.get(self.cache_key(chunk))
+            if cached is not None:
+                logger.info("Using cached extraction result for chunk")
+                return cached
+
         try:
-            result = await self._create_completion(chunk)
-            if result is None:
-                logger.warning("No result returned from OpenAI API")
-                return None
-            logger.info(f"Extracted {len(result.stakeholder_notes)} notes from chunk")
-            return result
+            extracted = await self._create_completion(chunk)
         except Exception as e:
             logger.error(f"Error processing chunk: {e}")
             raise
+        if extracted is None:
+            logger.warning("No result returned from OpenAI API")
+            return None
+        result = chunk.resolve(extracted)
+        logger.info(f"Extracted {len(result.stakeholder_notes)} notes from chunk")
+        if self.cache is not None:
+            self.cache.put(self.cache_key(chunk), result)
+        return result
 
-    async def _create_completion(self, chunk: str) -> StakeholderNotes | None:
-        """Create a single completion for a given Slack context."""
-        try:
-            logger.debug("Sending request to OpenAI API")
-            response = await self.client.beta.chat.completions.parse(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.prompts["system_message"]},
-                    {
-                        "role": "user",
-                        "content": self.prompts["user_message"].format(
-                            slack_context=chunk
-                        ),
-                    },
-                ],
-                response_format=StakeholderNotes,
+    async def _create_completion(
+        self, chunk: Chunk
+    ) -> ExtractedStakeholderNotes | None:
+        """Create a single completion for a chunk, retrying failed requests.
+
+        Requests go through the rate limiter. Rate-limited, failing and timed out
+        requests are retried with jittered exponential backoff, and rate limits
+        also pause the rate limiter for the Retry-After of the response. Rate
+        limits because the quota is used up are not retried.
+        """
+        tokens = chunk.token_count or len(chunk.text) // CHARS_PER_TOKEN
+        retries = 0
+
+        def on_backoff(details: Any) -> None:
+            nonlocal retries
+            retries += 1
+            logger.warning(
+                f"Retrying request in {details['wait']:.1f}s "
+                f"(attempt {details['tries']}): {details['exception']}"
             )
-            logger.debug("Received response from OpenAI API")
-            result = response.choices[0].message.parsed
-            return result
+
+        request = backoff.on_exception(
+            backoff.expo,
+            RETRYABLE_ERRORS,
+            max_tries=self.policy.max_retries + 1,
+            jitter=backoff.full_jitter,
+            giveup=lambda e: getattr(e, "code", None) == "insufficient_quota",
+            on_backoff=on_backoff,
+            logger=None,
+            factor=self.policy.retry_delay,
+            max_value=MAX_RETRY_DELAY,
+        )(self._request_completion)
+
+        logger.debug("Sending request to OpenAI API")
+        label = chunk.text.partition("\n")[0]
+        start = time.perf_counter()
+        try:
+            response = await request(chunk.text, tokens)
         except Exception as e:
             logger.error(f"Error in API call: {e}")
+            self.metrics.record_failure(label, time.perf_counter() - start, retries)
             raise
+        self.rate_limiter.succeed()
+        if response.usage is not None:
+            self.rate_limiter.reconcile(tokens, response.usage.total_tokens)
+        self.metrics.record_request(
+            label=label,
+            latency=time.perf_counter() - start,
+            usage=response.usage,
+            retries=retries,
+        )
+        logger.debug("Received response from OpenAI API")
+        return response.choices[0].message.parsed
+
+    async def _request_completion(
+        self, chunk: str, tokens: int
+    ) -> ParsedChatCompletion[ExtractedStakeholderNotes]:
+        """Send a single request for a chunk once the rate limiter lets it through."""
+        async with self.rate_limiter.request(tokens):
+            try:
+                raw_response = (
+                    await self.client.beta.chat.completions.with_raw_response.parse(
+                        model=self.model,
+                        messages=self.build_messages(chunk),
+                        response_format=ExtractedStakeholderNotes,
+                    )
+                )
+            except APIStatusError as e:
+                self.rate_limiter.update(e.response.headers)
+                if isinstance(e, RateLimitError):
+                    self.rate_limiter.throttle(parse_retry_after(e.response.headers))
+                raise
+        self.rate_limiter.update(raw_response.headers)
+        return raw_response.parse()
 
 
 # Example usage:
@@ -95,7 +298,7 @@ async def main():
 
     # load last chunk to be extracted
     with open("data/last_chunk.txt", encoding="utf-8") as file:
-        chunk = file.read()
+        chunk = Chunk(file.read())
 
     extracted_notes = await openai_manager.process_chunk(chunk)
     if extracted_notes is not None:
@@ -0,0 +1,124 @@
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TextIO
+
+from slack_archive.thread import TIMESTAMP_FORMAT
+
+WORDS = (
+    "the partner call went well and we discussed integration timelines for the "
+    "next quarter including audits bundles searchers builders relays wallets "
+    "order flow auctions rollups sequencers mev protection grants research "
+    "follow up next week with the team about pricing feedback and launch plans"
+).split()
+FIRST_NAMES = (
+    "alex Tina Hasu Laura Kailin Fred Sarah Phil Quintus Tomasz Shea Danny "
+    "Robert Mara Jon Elena Priya Omar Wei Lucia"
+).split()
+LAST_NAMES = ["", "M", "Allen", "Daian", "Ketsdever", "Stańczak", "Chen", "Ruiz"]
+USER_ID_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ0123456789"
+# Fraction of messages that start with a mention
+MENTION_RATE = 0.2
+
+
+class DumpGenerator:
+    """
+    Deterministic generator of synthetic slack dumps in the slackdump text format.
+
+    The same seed always produces the same dump. Threads have replies (indented
+    with "|   "), bullet lines and mentions, and a fraction of threads repeats the
+    fingerprint of an earlier thread, as slackdump does for messages posted in the
+    same second.
+
+    Attributes:
+        seed: Seed of the random generator.
+        duplicate_rate: Fraction of threads that reuse an earlier fingerprint.
+        max_replies: Maximum number of replies per thread.
+    """
+
+    def __init__(
+        self, seed: int = 0, duplicate_rate: float = 0.01, max_replies: int = 12
+    ):
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        self.max_replies = max_replies
+        self._random = random.Random(seed)
+        self._users = [
+            (
+                f"{name} {self._random.choice(LAST_NAMES)}".strip(),
+                "U0" + "".join(self._random.choices(USER_ID_ALPHABET, k=9)),
+            )
+            for name in FIRST_NAMES
+        ]
+        self._time = datetime(2023, 1, 6, 11, 42, 13)
+        self._fingerprints: list[str] = []
+
+    def write(self, file: TextIO, size_bytes: int) -> int:
+        """
+        Write threads to a file until it holds at least `size_bytes` bytes.
+
+        Args:
+            file: Text file to write to.
+            size_bytes: Minimum size of the dump in UTF-8 bytes.
+
+        Returns:
+            The number of bytes written.
+        """
+        written = 0
+        while written < size_bytes:
+            thread = self.thread()
+            file.write(thread)
+            written += len(thread.encode("utf-8"))
+        return written
+
+    def thread(self) -> str:
+        """Generate the text of the next thread, including the blank line after it."""
+        rng = self._random
+        if self._fingerprints and rng.random() < self.duplicate_rate:
+            fingerprint = rng.choice(self._fingerprints[-50:])
+        else:
+            self._time += timedelta(seconds=rng.randint(1, 4 * 3600))
+            fingerprint = self._fingerprint(self._time)
+            self._fingerprints.append(fingerprint)
+
+        lines = [fingerprint, *self._message()]
+        reply_time = self._time
+        for _ in range(rng.choice([0, 0, 0, 1, 2, rng.randint(1, self.max_replies)])):
+            reply_time += timedelta(seconds=rng.randint(10, 6 * 3600))
+            message = self._message()
+            lines += ["|   ", f"|   {self._fingerprint(reply_time)}"]
+            # Only the first line of a reply is indented, like in slackdump output.
+            lines += [f"|   {message[0]}", *message[1:]]
+        return "\n".join(lines) + "\n\n"
+
+    def _fingerprint(self, time: datetime) -> str:
+        name, user_id = self._random.choice(self._users)
+        return f"> {name} [{user_id}] @ {time.strftime(TIMESTAMP_FORMAT)} Z:"
+
+    def _message(self) -> list[str]:
+        rng = self._random
+        text = " ".join(rng.choices(WORDS, k=rng.randint(3, 60)))
+        if rng.random() < MENTION_RATE:
+            _, user_id = rng.choice(self._users)
+            text = f"<@{user_id}> {text}"
+        bullets = [
+            "• " + " ".join(rng.choices(WORDS, k=rng.randint(3, 15)))
+            for _ in range(rng.choice([0, 0, 0, 2, 4]))
+        ]
+        return [text, *bullets]
+
+
+def write_dump(path: Path, size_mb: float, seed: int = 0) -> int:
+    """
+    Write a synthetic slack dump of at least `size_mb` megabytes.
+
+    Args:
+        path: Where to write the dump.
+        size_mb: Minimum size of the dump in megabytes.
+        seed: Seed of the generator; the same seed always produces the same dump.
+
+    Returns:
+        The size of the dump in bytes.
+    """
+    with open(path, "w", encoding="utf-8", newline="\n") as file:
+        return DumpGenerator(seed).write(file, int(size_mb * 1024 * 1024))
@@ -0,0 +1,263 @@
+import calendar
+import mmap
+import re
+import sys
+from array import array
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+
+# this is the fingerprint of a thread. example:
+# > alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
+THREAD_PATTERN = r"^(> .+? \@\s*\d{2}\/\d{2}\/\d{4} \d{2}:\d{2}:\d{2} Z:)"
+
+# Timestamp of a thread or reply fingerprint, e.g. "@ 06/01/2023 11:44:42 Z:".
+MESSAGE_TIMESTAMP_PATTERN = re.compile(
+    r"^(?:\|   )?> .+? \@\s*(\d{2}\/\d{2}\/\d{4} \d{2}:\d{2}:\d{2}) Z:",
+    flags=re.MULTILINE,
+)
+REPLY_PATTERN = re.compile(r"^\|   > .+? \@\s*\d{2}\/\d{2}\/\d{4}", flags=re.MULTILINE)
+TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+_THREAD_BYTES_PATTERN = re.compile(THREAD_PATTERN.encode(), flags=re.MULTILINE)
+_REPLY_BYTES_PATTERN = re.compile(REPLY_PATTERN.pattern.encode(), flags=re.MULTILINE)
+# Timestamp parts of a thread or reply fingerprint
+_MESSAGE_TIME_PARTS_PATTERN = re.compile(
+    rb"^(?:\|   )?> .+? \@\s*(\d{2})\/(\d{2})\/(\d{4}) (\d{2}):(\d{2}):(\d{2}) Z:",
+    flags=re.MULTILINE,
+)
+# User ID of a fingerprint, e.g. "[U03ERC46NKA] @"
+_USER_ID_PATTERN = re.compile(rb"\[(\w+)\]\s*\@")
+
+Buffer = bytes | bytearray | mmap.mmap
+
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """
+    Parse a slackdump message timestamp.
+
+    Args:
+        timestamp: Timestamp in the slackdump format, e.g. "06/01/2023 11:44:42".
+
+    Returns:
+        The timestamp as a timezone-aware UTC datetime.
+    """
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=UTC)
+
+
+def _epoch(day: bytes, month: bytes, year: bytes, *clock: bytes) -> int:
+    """Convert the parts of a slackdump timestamp to epoch seconds."""
+    hour, minute, second = map(int, clock)
+    return calendar.timegm((int(year), int(month), int(day), hour, minute, second))
+
+
+class Thread:
+    """
+    A thread of a slack dump, as a slice of a shared buffer.
+
+    The buffer is usually the memory map or the bytes of the whole dump, so a
+    thread only holds its offset and length into it, plus the user ID and time
+    parsed from its fingerprint. Text is decoded from the buffer on access. Reply
+    offsets are found on first access and kept.
+
+    Attributes:
+        offset: Byte offset of the thread in the buffer.
+        length: Length of the thread in bytes, including its fingerprint line.
+        user_id: Slack user ID of the author of the thread, or "" if the fingerprint
+            has none.
+        epoch: Time the thread was started, in seconds since the epoch (UTC).
+    """
+
+    __slots__ = (
+        "_buffer",
+        "_fingerprint_length",
+        "_reply_offsets",
+        "epoch",
+        "length",
+        "offset",
+        "user_id",
+    )
+
+    def __init__(self, buffer: Buffer, offset: int = 0, length: int | None = None):
+        """
+        Create a thread from a slice of a buffer.
+
+        Args:
+            buffer: Buffer of UTF-8 text holding the thread.
+            offset: Byte offset of the thread's fingerprint line in the buffer.
+            length: Length of the thread in bytes. Defaults to the rest of the
+                buffer.
+
+        Raises:
+            ValueError: If the slice does not start with a thread fingerprint.
+        """
+        self._buffer = buffer
+        self.offset = offset
+        self.length = len(buffer) - offset if length is None else length
+        match = _MESSAGE_TIME_PARTS_PATTERN.match(buffer, offset, offset + self.length)
+        if match is None or buffer[offset : offset + 1] != b">":
+            raise ValueError(f"Malformed thread fingerprint at offset {offset}")
+        self._fingerprint_length = match.end() - offset
+        self._reply_offsets: array | None = None
+        self.epoch = _epoch(*match.groups())
+        user = _USER_ID_PATTERN.search(buffer, offset, match.end())
+        # Interned, as there are far fewer users than threads.
+        self.user_id = sys.intern(user.group(1).decode("ascii") if user else "")
+
+    @classmethod
+    def from_text(cls, text: str) -> "Thread":
+        """Create a thread that owns its text, starting with the fingerprint line."""
+        return cls(text.encode("utf-8"))
+
+    @property
+    def fingerprint(self) -> str:
+        """The fingerprint line of the thread, e.g. "> alex [U03...] @ ... Z:"."""
+        return self._decode(self.offset, self.offset + self._fingerprint_length)
+
+    @property
+    def content(self) -> str:
+        """The text of the thread, starting with its fingerprint line."""
+        return self._decode(self.offset, self.offset + self.length)
+
+    @property
+    def key(self) -> str:
+        """The fingerprint without the leading "> ", as used in thread lookups."""
+        return self.fingerprint.removeprefix("> ")
+
+    @property
+    def timestamp(self) -> datetime:
+        """Time the thread was started."""
+        return datetime.fromtimestamp(self.epoch, UTC)
+
+    @property
+    def reply_offsets(self) -> array:
+        """Byte offsets of the replies, relative to the start of the thread."""
+        if self._reply_offsets is None:
+            end = self.offset + self.length
+            self._reply_offsets = array(
+                "I",
+                (
+                    match.start() - self.offset
+                    for match in _REPLY_BYTES_PATTERN.finditer(
+                        self._buffer, self.offset, end
+                    )
+                ),
+            )
+        return self._reply_offsets
+
+    @property
+    def reply_count(self) -> int:
+        """Number of replies in the thread."""
+        return len(self.reply_offsets)
+
+    @property
+    def last_activity(self) -> datetime:
+        """Time of the latest message in the thread, including replies."""
+        end = self.offset + self.length
+        latest = max(
+            (
+                _epoch(*match.groups())
+                for match in _MESSAGE_TIME_PARTS_PATTERN.finditer(
+                    self._buffer, self.offset, end
+                )
+            ),
+            default=self.epoch,
+        )
+        return datetime.fromtimestamp(latest, UTC)
+
+    def _decode(self, start: int, end: int) -> str:
+        with memoryview(self._buffer) as view, view[start:end] as text:
+            return str(text, "utf-8")
+
+    def __str__(self):
+        return f"{self.fingerprint}\n{self.content}"
+
+    def __repr__(self):
+        return f"Thread(fingerprint={self.fingerprint}, content={self.content[:100]})"
+
+
+class ThreadStore:
+    """
+    Threads of a slack dump, as offset and length arrays into one buffer.
+
+    Only the thread boundaries are stored, 16 bytes per thread; `Thread` views
+    into the buffer are created on access. Boundaries are found as the threads are
+    iterated or indexed, so the first threads are available before the whole dump
+    has been scanned; `len` scans it to the end.
+
+    A store from `from_file` maps the file into memory; close it, e.g. by using the
+    store as a context manager, once its threads are no longer used.
+
+    Attributes:
+        buffer: Buffer of the whole dump.
+        offsets: Byte offset of each thread found so far.
+        lengths: Length in bytes of each thread found so far.
+    """
+
+    def __init__(self, buffer: Buffer):
+        """
+        Prepare to find the threads of a buffer. Text before the first fingerprint
+        is ignored.
+
+        Args:
+            buffer: Buffer of UTF-8 text in the slackdump format.
+        """
+        self.buffer = buffer
+        self.offsets = array("q")
+        self.lengths = array("q")
+        self._matches: Iterator[re.Match[bytes]] | None = (
+            _THREAD_BYTES_PATTERN.finditer(buffer)
+        )
+        self._start: int | None = None  # offset of the thread being delimited
+
+    @classmethod
+    def from_file(cls, path: Path) -> "ThreadStore":
+        """Map a dump file into memory to find its threads."""
+        with open(path, "rb") as file:
+            if not file.seek(0, 2):
+                return cls(b"")  # empty files cannot be mapped
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def close(self) -> None:
+        """Release the memory map of the dump, if the store has one."""
+        self._matches = None  # the scanner holds on to the buffer
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self) -> "ThreadStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _scan(self, count: int | None = None) -> None:
+        """Find thread boundaries until `count` threads are known, or all."""
+        while self._matches is not None and (
+            count is None or len(self.offsets) < count
+        ):
+            match = next(self._matches, None)
+            end = len(self.buffer) if match is None else match.start()
+            if self._start is not None:
+                self.offsets.append(self._start)
+                self.lengths.append(end - self._start)
+            if match is None:
+                self._matches = self._start = None
+            else:
+                self._start = match.start()
+
+    def __getitem__(self, index: int) -> Thread:
+        self._scan(index + 1 if index >= 0 else None)
+        return Thread(self.buffer, self.offsets[index], self.lengths[index])
+
+    def __iter__(self) -> Iterator[Thread]:
+        index = 0
+        while True:
+            self._scan(index + 1)
+            if index == len(self.offsets):
+                return
+            yield Thread(self.buffer, self.offsets[index], self.lengths[index])
+            index += 1
+
+    def __len__(self) -> int:
+        self._scan()
+        return len(self.offsets)
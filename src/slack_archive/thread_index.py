@@ -0,0 +1,189 @@
+import json
+import logging
+import mmap
+import re
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+from slack_archive.thread import THREAD_PATTERN, Thread
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadIndex(Mapping[str, Thread]):
+    """
+    Sidecar index mapping thread fingerprints to byte ranges of a slack dump.
+
+    The index is built with a single pass over the dump and stored next to it, so
+    later runs only need to read the (small) index to resolve fingerprints. Thread
+    text is read on demand through a memory map of the dump. Repeated fingerprints
+    are kept as separate occurrences instead of overwriting each other.
+
+    As a mapping, the index resolves a fingerprint to its first occurrence.
+
+    Attributes:
+        dump_path: Path to the indexed slack dump file.
+        entries: Map of fingerprints to the (offset, length) byte ranges of all
+            threads with that fingerprint, in file order.
+    """
+
+    VERSION = 1
+    SUFFIX = ".idx"
+
+    _thread_regex = re.compile(THREAD_PATTERN.encode())
+
+    def __init__(self, dump_path: Path, entries: dict[str, list[tuple[int, int]]]):
+        self.dump_path = dump_path
+        self.entries = entries
+        self._mmap: mmap.mmap | None = None
+
+    @classmethod
+    def index_path_for(cls, dump_path: Path) -> Path:
+        """Return the sidecar index path of a dump file."""
+        return dump_path.with_name(dump_path.name + cls.SUFFIX)
+
+    @classmethod
+    def load_or_build(cls, dump_path: Path) -> "ThreadIndex":
+        """
+        Load the sidecar index of a dump, rebuilding it if it is missing or stale.
+
+        The index is considered stale when the size or modification time of the dump
+        differs from the values recorded when the index was built.
+
+        Args:
+            dump_path: Path to the slack dump file.
+
+        Returns:
+            An up-to-date index of the dump.
+        """
+        index_path = cls.index_path_for(dump_path)
+        stat = dump_path.stat()
+        try:
+            data: dict[str, Any] = json.loads(index_path.read_text(encoding="utf-8"))
+            if (
+                data["version"] == cls.VERSION
+                and data["size"] == stat.st_size
+                and data["mtime_ns"] == stat.st_mtime_ns
+            ):
+                entries: dict[str, list[tuple[int, int]]] = {}
+                for fingerprint, offset, length in data["entries"]:
+                    entries.setdefault(fingerprint, []).append((offset, length))
+                return cls(dump_path, entries)
+            logger.info(f"Thread index {index_path} is stale, rebuilding")
+        except FileNotFoundError:
+            logger.debug(f"No thread index at {index_path}, building it")
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring corrupt thread index {index_path}: {e}")
+
+        index = cls.build(dump_path)
+        try:
+            index.save(index_path, stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logger.warning(f"Could not write thread index {index_path}: {e}")
+        return index
+
+    @classmethod
+    def build(cls, dump_path: Path) -> "ThreadIndex":
+        """
+        Scan a dump file and record the byte range of every thread.
+
+        Args:
+            dump_path: Path to the slack dump file.
+
+        Returns:
+            The index of the dump.
+        """
+        entries: dict[str, list[tuple[int, int]]] = {}
+        fingerprint: str | None = None
+        start = offset = 0
+
+        with open(dump_path, "rb") as file:
+            for line in file:
+                match = cls._thread_regex.match(line)
+                if match is not None:
+                    if fingerprint is not None:
+                        entries.setdefault(fingerprint, []).append((
+                            start,
+                            offset - start,
+                        ))
+                    fingerprint = match.group(1).decode("utf-8").removeprefix("> ")
+                    start = offset
+                offset += len(line)
+
+        if fingerprint is not None:
+            entries.setdefault(fingerprint, []).append((start, offset - start))
+
+        duplicates = sum(len(ranges) - 1 for ranges in entries.values())
+        if duplicates:
+            logger.info(f"Found {duplicates} repeated thread fingerprints")
+        return cls(dump_path, entries)
+
+    def save(self, index_path: Path, size: int, mtime_ns: int) -> None:
+        """
+        Write the index to disk.
+
+        Args:
+            index_path: Where to write the index.
+            size: Size of the dump file the index was built from.
+            mtime_ns: Modification time of the dump file the index was built from.
+        """
+        data = {
+            "version": self.VERSION,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "entries": [
+                (fingerprint, offset, length)
+                for fingerprint, ranges in self.entries.items()
+                for offset, length in ranges
+            ],
+        }
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        tmp_path.replace(index_path)
+
+    def read(self, fingerprint: str, occurrence: int = 0) -> str:
+        """
+        Read the text of a thread from the dump.
+
+        Args:
+            fingerprint: Fingerprint of the thread.
+            occurrence: Which of the threads sharing this fingerprint to read.
+
+        Returns:
+            The thread text, starting with its fingerprint line.
+        """
+        offset, length = self.entries[fingerprint][occurrence]
+        if self._mmap is None:
+            with open(self.dump_path, "rb") as file:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap[offset : offset + length].decode("utf-8")
+
+    def thread(self, fingerprint: str, occurrence: int = 0) -> Thread:
+        """Return one of the threads sharing a fingerprint."""
+        return Thread.from_text(self.read(fingerprint, occurrence))
+
+    def get_all(self, fingerprint: str) -> list[Thread]:
+        """Return all threads sharing a fingerprint, in file order."""
+        return [
+            self.thread(fingerprint, occurrence)
+            for occurrence in range(len(self.entries[fingerprint]))
+        ]
+
+    def close(self) -> None:
+        """Release the memory map of the dump."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __getitem__(self, fingerprint: str) -> Thread:
+        return self.thread(fingerprint)
+
+    def __contains__(self, fingerprint: object) -> bool:
+        return fingerprint in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
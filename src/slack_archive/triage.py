@@ -0,0 +1,425 @@
+import logging
+import math
+import re
+from collections.abc import Collection, Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from slack_archive.config import (
+    TRIAGE_FOLDS,
+    TRIAGE_KEYWORDS,
+    TRIAGE_MIN_RECALL,
+    TRIAGE_MODEL_PATH,
+)
+from slack_archive.noise import MENTION_PATTERN, NoiseFilter, split_messages
+from slack_archive.resolver import FingerprintResolver
+from slack_archive.thread import Thread
+
+logger = logging.getLogger(__name__)
+
+# Words scored by the model, lowercase and at least two characters long
+_WORD_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+# Section of a note's markdown listing its threads, see `md_dump.render_note`
+_NOTE_THREADS_PATTERN = re.compile(r"^## Slack threads\n\n((?:- .*\n)+)", re.MULTILINE)
+
+
+def text_words(text: str) -> list[str]:
+    """Return the words of a text as the model sees them, without mentions."""
+    return _WORD_PATTERN.findall(MENTION_PATTERN.sub(" ", text).lower())
+
+
+def thread_words(thread: Thread) -> list[str]:
+    """Return the words of a thread's messages, without their fingerprints."""
+    return text_words("\n".join(message.text for message in split_messages(thread)))
+
+
+def load_cited_fingerprints(output_dir: Path) -> set[str]:
+    """
+    Read which threads the notes of an earlier run cite.
+
+    Args:
+        output_dir: Output directory of the run, or a directory of several, with the
+            markdown files of its notes.
+
+    Returns:
+        The normalized fingerprints of the cited threads.
+    """
+    fingerprints: set[str] = set()
+    for path in output_dir.rglob("*.md"):
+        section = _NOTE_THREADS_PATTERN.search(path.read_text(encoding="utf-8"))
+        if section is not None:
+            fingerprints.update(
+                FingerprintResolver.normalize(line.removeprefix("- "))
+                for line in section.group(1).splitlines()
+            )
+    return fingerprints
+
+
+def label_threads(threads: Iterable[Thread], cited: Collection[str]) -> np.ndarray:
+    """Return whether each thread is cited, as a boolean array."""
+    return np.array(
+        [FingerprintResolver.normalize(thread.key) in cited for thread in threads],
+        dtype=bool,
+    )
+
+
+@dataclass
+class _TermMatrix:
+    """
+    Sparse matrix of threads by terms, in coordinate format.
+
+    Attributes:
+        rows: Thread of each entry.
+        columns: Term of each entry.
+        values: Value of each entry.
+        shape: Number of threads and terms.
+    """
+
+    rows: np.ndarray
+    columns: np.ndarray
+    values: np.ndarray
+    shape: tuple[int, int]
+
+    @classmethod
+    def count(cls, documents: Sequence[np.ndarray], terms: int) -> "_TermMatrix":
+        """Count the term IDs of each document; negative IDs are ignored."""
+        rows = np.repeat(np.arange(len(documents)), [len(ids) for ids in documents])
+        columns = np.concatenate([np.empty(0, np.int64), *documents])
+        known = columns >= 0
+        cells, counts = np.unique(
+            rows[known] * terms + columns[known], return_counts=True
+        )
+        return cls(
+            cells // terms, cells % terms, counts.astype(float), (len(documents), terms)
+        )
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """Multiply the matrix by a vector of terms."""
+        return np.bincount(
+            self.rows, self.values * vector[self.columns], minlength=self.shape[0]
+        )
+
+    def transpose_dot(self, vector: np.ndarray) -> np.ndarray:
+        """Multiply the transposed matrix by a vector of threads."""
+        return np.bincount(
+            self.columns, self.values * vector[self.rows], minlength=self.shape[1]
+        )
+
+    def select(self, selected: np.ndarray) -> "_TermMatrix":
+        """Return the rows of a boolean mask of threads."""
+        new_rows = np.cumsum(selected) - 1
+        entries = selected[self.rows]
+        return _TermMatrix(
+            new_rows[self.rows[entries]],
+            self.columns[entries],
+            self.values[entries],
+            (int(selected.sum()), self.shape[1]),
+        )
+
+
+@dataclass
+class TriageReport:
+    """
+    How well a triage threshold keeps the threads cited by notes.
+
+    Attributes:
+        threshold: Threads scoring above it are kept.
+        threads: Number of threads scored.
+        kept: Number of threads kept.
+        cited: Number of threads cited by notes.
+        cited_kept: Number of cited threads kept.
+    """
+
+    threshold: float
+    threads: int
+    kept: int
+    cited: int
+    cited_kept: int
+
+    @classmethod
+    def from_scores(
+        cls, scores: np.ndarray, cited: np.ndarray, threshold: float
+    ) -> "TriageReport":
+        """Evaluate a threshold on scored threads, see `RelevanceModel.scores`."""
+        kept = scores > threshold
+        return cls(
+            threshold=threshold,
+            threads=len(scores),
+            kept=int(kept.sum()),
+            cited=int(cited.sum()),
+            cited_kept=int((kept & cited).sum()),
+        )
+
+    @property
+    def precision(self) -> float:
+        """Share of the kept threads that are cited."""
+        return self.cited_kept / self.kept if self.kept else 1.0
+
+    @property
+    def recall(self) -> float:
+        """Share of the cited threads that are kept."""
+        return self.cited_kept / self.cited if self.cited else 1.0
+
+    def __str__(self) -> str:
+        share = self.kept / self.threads if self.threads else 1.0
+        return (
+            f"kept {self.kept} of {self.threads} threads ({share:.0%}), "
+            f"precision {self.precision:.2f}, recall {self.recall:.2f} "
+            f"at threshold {self.threshold:.3f}"
+        )
+
+
+class RelevanceModel:
+    """
+    Scores how likely a thread is to be cited by a stakeholder note, offline.
+
+    A thread is represented by the TF-IDF vector of the words of its messages,
+    with sublinear term frequencies and normalized to unit length, and its score
+    is the dot product with the weights of the terms plus a bias. Threads scoring
+    above the threshold are relevant and sent to extraction, the others are not.
+
+    Models are either trained on the threads of an earlier run, with the threads
+    cited by its notes as the relevant ones, see `fit`, or made from a list of
+    keywords, see `from_keywords`. Scoring runs on all threads of a batch at once,
+    as sparse matrix products in numpy.
+
+    Attributes:
+        terms: Vocabulary of the model.
+        idf: Inverse document frequency of each term.
+        weights: Weight of each term.
+        bias: Score of a thread without known terms.
+        threshold: Threads scoring above it are relevant.
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        idf: np.ndarray,
+        weights: np.ndarray,
+        bias: float = 0.0,
+        threshold: float = 0.0,
+    ):
+        self.terms = list(terms)
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self._term_ids = {term: index for index, term in enumerate(self.terms)}
+
+    @classmethod
+    def from_keywords(cls, keywords: Iterable[str]) -> "RelevanceModel":
+        """Create a model marking the threads containing any of the keywords."""
+        terms = list(
+            dict.fromkeys(word for keyword in keywords for word in text_words(keyword))
+        )
+        return cls(terms, np.ones(len(terms)), np.ones(len(terms)))
+
+    @classmethod
+    def fit(
+        cls,
+        threads: Sequence[Thread],
+        cited: np.ndarray,
+        min_recall: float = TRIAGE_MIN_RECALL,
+        folds: int = TRIAGE_FOLDS,
+        min_document_frequency: int = 2,
+    ) -> tuple["RelevanceModel", TriageReport]:
+        """
+        Train a model on the threads of an earlier run.
+
+        The weights are fitted by logistic regression, with both classes weighted
+        equally since only few threads are cited. The threshold is the highest one
+        keeping `min_recall` of the cited threads when scored by models trained
+        on the other folds, so it holds for threads the model has not seen.
+
+        Args:
+            threads: All threads of the run.
+            cited: Whether each thread is cited by a note, see `label_threads`.
+            min_recall: Share of the cited threads to keep.
+            folds: Number of folds of the cross-validation.
+            min_document_frequency: Fewest threads a term has to occur in.
+
+        Returns:
+            The model trained on all threads, and the cross-validated report of its
+            threshold.
+
+        Raises:
+            ValueError: If fewer than `folds` threads are cited or not cited.
+        """
+        cited = np.asarray(cited, dtype=bool)
+        if min(cited.sum(), (~cited).sum()) < folds:
+            raise ValueError(
+                f"Training needs at least {folds} cited and {folds} uncited threads, "
+                f"got {cited.sum()} of {len(cited)} threads cited"
+            )
+
+        vocabulary: dict[str, int] = {}
+        documents = [
+            np.array(
+                [vocabulary.setdefault(word, len(vocabulary)) for word in words],
+                dtype=np.int64,
+            )
+            for words in map(thread_words, threads)
+        ]
+        frequency = np.bincount(
+            _TermMatrix.count(documents, len(vocabulary)).columns,
+            minlength=len(vocabulary),
+        )
+        frequent = frequency >= min_document_frequency
+        new_ids = np.where(frequent, np.cumsum(frequent) - 1, -1)
+        model = cls(
+            [term for term, keep in zip(vocabulary, frequent, strict=True) if keep],
+            np.log((1 + len(documents)) / (1 + frequency[frequent])) + 1,
+            np.zeros(int(frequent.sum())),
+        )
+        matrix = model._vectorize(
+            _TermMatrix.count([new_ids[ids] for ids in documents], len(model.terms))
+        )
+
+        held_out_scores = _cross_validate(matrix, cited, folds)
+        model.threshold = _recall_threshold(held_out_scores, cited, min_recall)
+        model.weights, model.bias = _fit_logistic(matrix, cited)
+        return model, TriageReport.from_scores(held_out_scores, cited, model.threshold)
+
+    @classmethod
+    def load(cls, path: Path) -> "RelevanceModel":
+        """Load a model written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["terms"].tolist(),
+                data["idf"],
+                data["weights"],
+                float(data["bias"]),
+                float(data["threshold"]),
+            )
+
+    def save(self, path: Path) -> None:
+        """Write the model to a numpy archive."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                terms=np.array(self.terms, dtype=str),
+                idf=self.idf,
+                weights=self.weights,
+                bias=self.bias,
+                threshold=self.threshold,
+            )
+
+    def scores(self, threads: Sequence[Thread]) -> np.ndarray:
+        """Score threads, higher for threads more likely to be cited."""
+        documents = [
+            np.array(
+                [self._term_ids.get(word, -1) for word in thread_words(thread)],
+                dtype=np.int64,
+            )
+            for thread in threads
+        ]
+        matrix = self._vectorize(_TermMatrix.count(documents, len(self.terms)))
+        return matrix.dot(self.weights) + self.bias
+
+    def is_relevant(self, thread: Thread) -> bool:
+        """Whether a thread scores above the threshold."""
+        return bool(self.scores([thread])[0] > self.threshold)
+
+    def are_irrelevant(self, threads: Sequence[Thread]) -> np.ndarray:
+        """
+        Whether each thread does not score above the threshold.
+
+        Scores all threads at once, as a batch noise rule.
+        """
+        return self.scores(threads) <= self.threshold
+
+    def evaluate(self, threads: Sequence[Thread], cited: np.ndarray) -> TriageReport:
+        """Evaluate the model against the notes of a run, see `label_threads`."""
+        return TriageReport.from_scores(self.scores(threads), cited, self.threshold)
+
+    def _vectorize(self, counts: _TermMatrix) -> _TermMatrix:
+        """Turn term counts into unit length TF-IDF vectors."""
+        values = (1 + np.log(counts.values)) * self.idf[counts.columns]
+        norms = np.sqrt(np.bincount(counts.rows, values**2, minlength=counts.shape[0]))
+        return _TermMatrix(
+            counts.rows, counts.columns, values / norms[counts.rows], counts.shape
+        )
+
+
+def _fit_logistic(
+    matrix: _TermMatrix,
+    labels: np.ndarray,
+    regularization: float = 1e-3,
+    iterations: int = 500,
+) -> tuple[np.ndarray, float]:
+    """Fit class-balanced, L2-regularized logistic regression by gradient descent."""
+    positives = labels.sum()
+    sample_weights = np.where(labels, 0.5 / positives, 0.5 / (len(labels) - positives))
+    # Rows and the bias feature have unit length, so the loss is 0.5-smooth.
+    step = 1 / (0.5 + regularization)
+    weights = np.zeros(matrix.shape[1])
+    bias = 0.0
+    for _ in range(iterations):
+        probabilities = 1 / (1 + np.exp(-(matrix.dot(weights) + bias)))
+        errors = (probabilities - labels) * sample_weights
+        weights -= step * (matrix.transpose_dot(errors) + regularization * weights)
+        bias -= step * float(errors.sum())
+    return weights, bias
+
+
+def _cross_validate(matrix: _TermMatrix, labels: np.ndarray, folds: int) -> np.ndarray:
+    """Score every thread by a model fitted on the folds it is not in."""
+    # Stratified folds, so every fold has cited threads.
+    rng = np.random.default_rng(0)
+    fold_of = np.empty(len(labels), dtype=np.int64)
+    for label in (True, False):
+        indices = np.flatnonzero(labels == label)
+        fold_of[indices] = rng.permutation(len(indices)) % folds
+    scores = np.empty(len(labels))
+    for fold in range(folds):
+        held_out = fold_of == fold
+        weights, bias = _fit_logistic(matrix.select(~held_out), labels[~held_out])
+        scores[held_out] = matrix.select(held_out).dot(weights) + bias
+    return scores
+
+
+def _recall_threshold(
+    scores: np.ndarray, cited: np.ndarray, min_recall: float
+) -> float:
+    """
+    Return the highest threshold keeping `min_recall` of the cited threads.
+
+    Cited threads below it are kept anyway when that keeps no more uncited ones.
+    """
+    cited_scores = np.sort(scores[cited])[::-1]
+    cut = cited_scores[max(1, math.ceil(min_recall * len(cited_scores))) - 1]
+    uncited_below = scores[~cited & (scores < cut)]
+    if not uncited_below.size:
+        return float(cited_scores[-1] - 1)
+    highest_uncited = uncited_below.max()
+    lowest_kept = cited_scores[cited_scores > highest_uncited][-1]
+    # Halfway between, so close scores of new threads go either way.
+    return float((lowest_kept + highest_uncited) / 2)
+
+
+def build_thread_filter(
+    model_path: Path | None = TRIAGE_MODEL_PATH,
+    keywords: Sequence[str] = TRIAGE_KEYWORDS,
+) -> NoiseFilter:
+    """
+    Create the filter of threads before chunking.
+
+    The noise rules run first, then the relevance triage if a model or keywords
+    are configured, so only threads that pass both are extracted.
+
+    Args:
+        model_path: Model written by the `triage train` command.
+        keywords: Keywords marking relevant threads, used without a model.
+    """
+    noise_filter = NoiseFilter.from_names()
+    if model_path is not None:
+        model = RelevanceModel.load(model_path)
+    elif keywords:
+        model = RelevanceModel.from_keywords(keywords)
+    else:
+        return noise_filter
+    noise_filter.add_batch_rule("triage", model.are_irrelevant)
+    return noise_filter
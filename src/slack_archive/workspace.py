@@ -0,0 +1,284 @@
+import asyncio
+import logging
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from rich.progress import Progress
+
+from slack_archive.chunking import Chunk, ConversationProcessor
+from slack_archive.config import WORKSPACE_WORKERS
+from slack_archive.dedup import deduplicate_notes
+from slack_archive.incremental import (
+    STATE_DIR_NAME,
+    ChannelWatermark,
+    IncrementalState,
+    merge_notes,
+    select_pending_threads,
+)
+from slack_archive.md_dump import dump_to_markdown
+from slack_archive.postprocess import post_process_all
+from slack_archive.schema import StakeholderNote
+from slack_archive.structured_extract import OpenAIManager
+from slack_archive.thread_index import ThreadIndex
+from slack_archive.triage import build_thread_filter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChannelChunks:
+    """
+    Chunks of a single channel, prepared in a worker process.
+
+    Attributes:
+        channel: ID of the channel.
+        dump_path: Path to the slack dump of the channel.
+        chunks: Chunks of the threads to extract, in order.
+        reprocessed: Fingerprints of the chunked threads. Only set for incremental
+            runs.
+        watermark: Watermark of the channel once all chunks have been extracted.
+            Only set for incremental runs.
+    """
+
+    channel: str
+    dump_path: Path
+    chunks: list[Chunk]
+    reprocessed: set[str] | None = None
+    watermark: ChannelWatermark | None = None
+
+
+def discover_dumps(directory: Path) -> dict[str, Path]:
+    """
+    Find the slack dumps in a directory.
+
+    Args:
+        directory: Directory containing one `<channel ID>.txt` dump per channel.
+
+    Returns:
+        A map of channel IDs to dump paths, sorted by channel ID.
+    """
+    return {path.stem: path for path in sorted(directory.glob("*.txt"))}
+
+
+def prepare_channel(
+    channel: str,
+    dump_path: Path,
+    model_name: str,
+    prompt_overhead: str,
+    watermark: ChannelWatermark | None = None,
+) -> ChannelChunks:
+    """
+    Parse and chunk the dump of a single channel.
+
+    Runs in a worker process. Besides chunking, this builds the sidecar thread
+    index of the dump, so post-processing in the main process can resolve
+    fingerprints without scanning the dump again.
+
+    Args:
+        channel: ID of the channel.
+        dump_path: Path to the slack dump of the channel.
+        model_name: Name of the model to use for tokenization.
+        prompt_overhead: Text sent along with every chunk.
+        watermark: Watermark of the previous run for incremental runs, or None to
+            chunk every thread.
+
+    Returns:
+        The chunks of the channel.
+    """
+    processor = ConversationProcessor(
+        dump_path,
+        model_name=model_name,
+        prompt_overhead=prompt_overhead,
+        noise_filter=build_thread_filter(),
+    )
+    # Build the sidecar index here; post-processing then only has to load it.
+    ThreadIndex.load_or_build(dump_path)
+
+    if watermark is None:
+        chunks = list(processor.iter_chunks())
+        return ChannelChunks(channel, dump_path, chunks)
+
+    threads = list(select_pending_threads(processor.get_threads(), watermark))
+    return ChannelChunks(
+        channel,
+        dump_path,
+        list(processor.iter_chunks(threads)),
+        reprocessed={thread.key for thread in threads},
+        watermark=watermark.advance(processor.get_threads()),
+    )
+
+
+class WorkspaceRunner:
+    """
+    Processes many channels at once.
+
+    Parsing and chunking run per channel in a process pool, so they scale with the
+    number of cores. The chunks of all channels are extracted through a single
+    OpenAIManager, whose semaphore bounds the requests in flight across the whole
+    workspace. Each channel is written to its own output directory as soon as its
+    extraction has finished.
+
+    Attributes:
+        openai_manager: Manager shared by the extraction of all channels.
+        output_dir: Directory containing one output directory per channel.
+        incremental: Whether to only extract threads that are new or have new
+            replies since the last run of each channel.
+        max_workers: Number of worker processes used for parsing and chunking.
+        failed_chunks: Number of chunks that failed per channel in the last run.
+        failed_channels: Channels that could not be parsed or chunked in the last
+            run.
+    """
+
+    def __init__(
+        self,
+        openai_manager: OpenAIManager,
+        output_dir: Path,
+        incremental: bool = False,
+        max_workers: int = WORKSPACE_WORKERS,
+    ):
+        self.openai_manager = openai_manager
+        self.output_dir = output_dir
+        self.incremental = incremental
+        self.max_workers = max_workers
+        self.failed_chunks: dict[str, int] = {}
+        self.failed_channels: list[str] = []
+
+    async def run(
+        self, dumps: Mapping[str, Path], progress: Progress | None = None
+    ) -> dict[str, int]:
+        """
+        Process all channels.
+
+        Args:
+            dumps: Map of channel IDs to the paths of their slack dumps.
+            progress: Progress display to add one task per channel to.
+
+        Returns:
+            The number of notes written per channel.
+        """
+        loop = asyncio.get_running_loop()
+        prompt_overhead = self.openai_manager.request_overhead()
+        notes_per_channel: dict[str, int] = {}
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {
+                loop.run_in_executor(
+                    pool,
+                    partial(
+                        prepare_channel,
+                        channel,
+                        dump_path,
+                        self.openai_manager.model,
+                        prompt_overhead,
+                        self._load_watermark(channel),
+                    ),
+                ): channel
+                for channel, dump_path in dumps.items()
+            }
+
+            async with asyncio.TaskGroup() as task_group:
+                while pending:
+                    done, _ = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        channel = pending.pop(future)
+                        try:
+                            channel_chunks = future.result()
+                        except Exception as e:
+                            logger.error(f"Failed to prepare channel {channel}: {e}")
+                            self.failed_channels.append(channel)
+                            continue
+                        logger.info(
+                            f"Prepared {len(channel_chunks.chunks)} chunks for "
+                            f"channel {channel}"
+                        )
+                        task_group.create_task(
+                            self._extract_channel(
+                                channel_chunks, notes_per_channel, progress
+                            )
+                        )
+
+        return notes_per_channel
+
+    def _load_watermark(self, channel: str) -> ChannelWatermark | None:
+        if not self.incremental:
+            return None
+        return self._state(channel).load_watermark(channel)
+
+    def _state(self, channel: str) -> IncrementalState:
+        return IncrementalState(self.output_dir / channel / STATE_DIR_NAME)
+
+    async def _extract_channel(
+        self,
+        channel_chunks: ChannelChunks,
+        notes_per_channel: dict[str, int],
+        progress: Progress | None,
+    ) -> None:
+        channel = channel_chunks.channel
+        task = None
+        if progress is not None:
+            task = progress.add_task(channel, total=len(channel_chunks.chunks))
+
+        def advance() -> None:
+            if progress is not None and task is not None:
+                progress.advance(task)
+
+        extraction = await self.openai_manager.extract_stakeholder_notes(
+            channel_chunks.chunks, progress_callback=advance
+        )
+        for index, error in sorted(extraction.failures.items()):
+            logger.error(f"{channel}: chunk {index + 1} failed: {error}")
+        if extraction.failures:
+            self.failed_chunks[channel] = len(extraction.failures)
+
+        notes = [
+            note
+            for notes in extraction.successful()
+            for note in notes.stakeholder_notes
+        ]
+        # Post-processing and writing block, so other channels keep extracting.
+        notes_per_channel[channel] = await asyncio.to_thread(
+            self._write_channel, channel_chunks, notes, complete=not extraction.failures
+        )
+
+    def _write_channel(
+        self,
+        channel_chunks: ChannelChunks,
+        notes: list[StakeholderNote],
+        complete: bool,
+    ) -> int:
+        """
+        Merge, post-process and write the extracted notes of a channel.
+
+        Args:
+            channel_chunks: The extracted chunks of the channel.
+            notes: Notes extracted from the chunks.
+            complete: Whether all chunks were extracted. Otherwise the watermark is
+                kept and notes of earlier runs are not pruned.
+
+        Returns:
+            The number of notes written.
+        """
+        channel = channel_chunks.channel
+        if channel_chunks.reprocessed is not None:
+            state = self._state(channel)
+            notes = merge_notes(state.load_notes(), notes, channel_chunks.reprocessed)
+            state.save_notes(notes)
+            if not complete:
+                logger.warning(f"{channel}: some chunks failed, keeping the watermark")
+            elif channel_chunks.watermark is not None:
+                state.save_watermark(channel, channel_chunks.watermark)
+
+        processor = ConversationProcessor(channel_chunks.dump_path)
+        post_processed = post_process_all(deduplicate_notes(notes), processor)
+        processor.thread_map.close()
+
+        channel_dir = self.output_dir / channel
+        channel_dir.mkdir(parents=True, exist_ok=True)
+        dump_to_markdown(post_processed, channel_dir, prune=complete)
+        logger.info(f"{channel}: wrote {len(post_processed)} notes to {channel_dir}")
+        return len(post_processed)
@@ -0,0 +1,138 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from slack_archive.archive import MATCH_END, MATCH_START, SearchFilter, ThreadArchive
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.main import archive_threads, archiving, main
+from slack_archive.metrics import PipelineMetrics
+from slack_archive.postprocess import post_process_all
+from slack_archive.schema import StakeholderNote
+from slack_archive.thread import ThreadStore
+
+DUMP = """\
+> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
+Call with Acme about the relay pilot
+|
+|   > Tina [U03GRQX5HGR] @ 06/01/2023 13:44:07 Z:
+|   Great, follow up next week
+
+> Hasu [U03FP0H62HH] @ 07/01/2023 12:02:18 Z:
+Lunch on Friday?
+
+> Hasu [U03FP0H62HH] @ 07/01/2023 12:02:18 Z:
+Same second, different Grüße
+"""
+
+
+@pytest.fixture
+def archive(tmp_path: Path) -> ThreadArchive:
+    archive = ThreadArchive(tmp_path / "threads.sqlite3")
+    archive.load("C001", ThreadStore(DUMP.encode()))
+    archive.load("C002", ThreadStore(DUMP.replace("Acme", "Initech").encode()))
+    return archive
+
+
+def test_search_ranks_and_filters(archive: ThreadArchive):
+    hits = archive.search("relay AND pilot")
+
+    assert [hit.channel for hit in hits] == ["C001", "C002"]
+    assert hits[0].fingerprint == "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+    assert hits[0].user_id == "U03ERC46NKA"
+    assert f"{MATCH_START}relay{MATCH_END}" in hits[0].snippet
+    assert [
+        hit.channel for hit in archive.search("relay", SearchFilter(channel="C002"))
+    ] == ["C002"]
+    assert archive.search("relay", SearchFilter(user_id="U03FP0H62HH")) == []
+    assert archive.search(
+        "lunch", SearchFilter(since=datetime(2023, 1, 7), until=datetime(2023, 1, 8))
+    )
+    assert archive.search("lunch", SearchFilter(until=datetime(2023, 1, 7))) == []
+    assert len(archive.search("relay", SearchFilter(limit=1))) == 1
+    # Diacritics are folded and invalid queries match their words.
+    assert len(archive.search("gruße")) == 2
+    assert len(archive.search('call: "Acme')) == 1
+
+
+def test_loading_again_upserts(archive: ThreadArchive):
+    assert archive.load("C001", ThreadStore(DUMP.encode())) == 0
+
+    changed = DUMP.replace("Lunch on Friday?", "Lunch on Saturday?")
+    assert archive.load("C001", ThreadStore(changed.encode())) == 1
+
+    assert [hit.channel for hit in archive.search("saturday")] == ["C001"]
+    assert [hit.channel for hit in archive.search("friday")] == ["C002"]
+    assert [
+        thread.content.splitlines()[1]
+        for thread in archive.threads(
+            "C001", "Hasu [U03FP0H62HH] @ 07/01/2023 12:02:18 Z:"
+        )
+    ] == ["Lunch on Saturday?", "Same second, different Grüße"]
+
+
+def test_post_processing_from_the_archive(archive: ThreadArchive, tmp_path: Path):
+    dump_path = tmp_path / "C001.txt"
+    dump_path.write_text(DUMP, encoding="utf-8")
+    note = StakeholderNote(
+        stakeholder_name="Acme",
+        date="2023-01-06",
+        title="Call",
+        summary="Went well",
+        relevant_slack_threads=["alex [U03ERC46NKA] @ 06/01/2023 11:44:41"],
+    )
+
+    from_archive = post_process_all([note], archive.channel("C001"))
+    from_dump = post_process_all([note], ConversationProcessor(dump_path))
+
+    assert from_archive == from_dump
+    assert "Call with Acme" in from_archive[0].full_slack_threads
+
+
+def test_search_command(archive: ThreadArchive, tmp_path: Path):
+    archive.close()
+    path = str(archive.db_path)
+
+    result = CliRunner().invoke(
+        main, ["search", "pilot", "-c", "C002", "--archive", path]
+    )
+    missing = CliRunner().invoke(
+        main, ["search", "pilot", "--archive", str(tmp_path / "missing.sqlite3")]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "C002  alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:" in result.output
+    assert "C001" not in result.output
+    assert missing.exit_code != 0
+    assert "No thread archive" in missing.output
+
+
+@pytest.mark.asyncio
+async def test_archive_threads_in_a_worker_thread(tmp_path: Path):
+    dump_path = tmp_path / "C001.txt"
+    dump_path.write_text(DUMP, encoding="utf-8")
+    metrics = PipelineMetrics("gpt-4o")
+
+    await archive_threads(tmp_path / "threads.sqlite3", {"C001": dump_path}, metrics)
+
+    archive = ThreadArchive(tmp_path / "threads.sqlite3")
+    assert [hit.channel for hit in archive.search("pilot")] == ["C001"]
+    assert "archive" in metrics.stages
+    archive.close()
+
+
+@pytest.mark.asyncio
+async def test_archiving_finishes_when_the_run_fails(tmp_path: Path):
+    dump_path = tmp_path / "C001.txt"
+    dump_path.write_text(DUMP, encoding="utf-8")
+    archive_path = tmp_path / "threads.sqlite3"
+    metrics = PipelineMetrics("gpt-4o")
+
+    with pytest.raises(RuntimeError):
+        async with archiving(archive_path, {"C001": dump_path}, metrics):
+            raise RuntimeError("Extraction failed")
+
+    archive = ThreadArchive(archive_path)
+    assert [hit.channel for hit in archive.search("pilot")] == ["C001"]
+    archive.close()
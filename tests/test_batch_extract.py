@@ -0,0 +1,300 @@
+import asyncio
+import json
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from slack_archive.batch_extract import BatchExtractor, BatchStatus
+from slack_archive.cache import ExtractionCache
+from slack_archive.chunking import Chunk
+from slack_archive.schema import (
+    ExtractedStakeholderNote,
+    ExtractedStakeholderNotes,
+    StakeholderNote,
+    StakeholderNotes,
+)
+from slack_archive.structured_extract import OpenAIManager
+
+
+class FakeBatchBackend:
+    """File-backed stand-in for the Batch API.
+
+    Uploaded files and results live in a directory. A batch completes after a
+    fixed number of status checks, answering every request with `respond`. With
+    `expire_after`, batches expire after answering that many requests instead.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        respond: Callable[[dict[str, Any]], dict[str, Any]],
+        polls_until_done: int = 2,
+    ):
+        self.root = root
+        self.respond = respond
+        self.polls_until_done = polls_until_done
+        self.expire_after: int | None = None
+        self.created: list[str] = []
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, file_id: str) -> Path:
+        return self.root / f"{file_id}.jsonl"
+
+    def _batch_path(self, batch_id: str) -> Path:
+        return self.root / f"{batch_id}.json"
+
+    async def upload(self, path: Path) -> str:
+        file_id = f"file-{uuid.uuid4().hex}"
+        self._path(file_id).write_bytes(path.read_bytes())
+        return file_id
+
+    async def create(self, input_file_id: str) -> str:
+        batch_id = f"batch-{uuid.uuid4().hex}"
+        self._batch_path(batch_id).write_text(
+            json.dumps({"input_file_id": input_file_id, "polls": 0})
+        )
+        self.created.append(batch_id)
+        return batch_id
+
+    async def retrieve(self, batch_id: str) -> BatchStatus:
+        batch = json.loads(self._batch_path(batch_id).read_text())
+        batch["polls"] += 1
+        self._batch_path(batch_id).write_text(json.dumps(batch))
+        if batch["polls"] < self.polls_until_done:
+            return BatchStatus("in_progress")
+
+        output_file_id = f"{batch['input_file_id']}-output"
+        error_file_id = f"{batch['input_file_id']}-errors"
+        requests = [
+            json.loads(line)
+            for line in self._path(batch["input_file_id"]).read_text().splitlines()
+        ]
+        answered = requests[: self.expire_after]
+        if not self._path(output_file_id).exists():
+            self._write(output_file_id, [self.respond(r) for r in answered])
+            self._write(
+                error_file_id,
+                [
+                    {"custom_id": r["custom_id"], "error": {"code": "batch_expired"}}
+                    for r in requests[len(answered) :]
+                ],
+            )
+        if len(answered) < len(requests):
+            return BatchStatus("expired", output_file_id, error_file_id)
+        return BatchStatus("completed", output_file_id=output_file_id)
+
+    def _write(self, file_id: str, lines: list[dict[str, Any]]) -> None:
+        self._path(file_id).write_text(
+            "".join(json.dumps(line) + "\n" for line in lines)
+        )
+
+    async def download(self, file_id: str) -> str:
+        return self._path(file_id).read_text()
+
+
+def notes_for(title: str) -> StakeholderNotes:
+    return StakeholderNotes(
+        stakeholder_notes=[
+            StakeholderNote(
+                stakeholder_name="Acme",
+                date="2024-01-01",
+                title=title,
+                summary="summary",
+                relevant_slack_threads=[title],
+            )
+        ]
+    )
+
+
+def extracted_for(title: str) -> ExtractedStakeholderNotes:
+    return ExtractedStakeholderNotes(
+        stakeholder_notes=[
+            ExtractedStakeholderNote(
+                stakeholder_name="Acme",
+                date="2024-01-01",
+                title=title,
+                summary="summary",
+                relevant_thread_ids=[1],
+            )
+        ]
+    )
+
+
+def chunk_for(title: str) -> Chunk:
+    return Chunk(f"[1] <<{title}>>", {1: title})
+
+
+def echo_response(request: dict[str, Any]) -> dict[str, Any]:
+    """Answer with a note titled after the chunk, or fail chunks saying 'fail'."""
+    chunk = request["body"]["messages"][1]["content"]
+    title = chunk.split("<<")[1].split(">>")[0]
+    if title == "fail":
+        return {
+            "custom_id": request["custom_id"],
+            "response": {"status_code": 500, "body": {"error": "server error"}},
+        }
+    return {
+        "custom_id": request["custom_id"],
+        "response": {
+            "status_code": 200,
+            "body": {
+                "choices": [
+                    {"message": {"content": extracted_for(title).model_dump_json()}}
+                ]
+            },
+        },
+    }
+
+
+@pytest.fixture
+def manager(monkeypatch: pytest.MonkeyPatch) -> OpenAIManager:
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return OpenAIManager(model="test-model")
+
+
+@pytest.mark.asyncio
+async def test_batch_results_come_back_in_chunk_order(
+    manager: OpenAIManager, tmp_path: Path
+):
+    backend = FakeBatchBackend(tmp_path / "endpoint", echo_response)
+    extractor = BatchExtractor(manager, backend, tmp_path / "work", poll_interval=0)
+    completed: list[None] = []
+
+    result = await extractor.extract_stakeholder_notes(
+        [chunk_for("a"), chunk_for("fail"), chunk_for("c")],
+        progress_callback=lambda: completed.append(None),
+    )
+
+    assert [n.stakeholder_notes[0].title for n in result.successful()] == ["a", "c"]
+    assert list(result.failures) == [1]
+    assert len(completed) == 3
+
+
+def test_requests_use_a_strict_response_format(manager: OpenAIManager, tmp_path: Path):
+    backend = FakeBatchBackend(tmp_path / "endpoint", echo_response)
+    extractor = BatchExtractor(manager, backend, tmp_path / "work")
+
+    response_format = extractor.build_request(0, chunk_for("a"))["body"][
+        "response_format"
+    ]
+
+    schema = response_format["json_schema"]["schema"]
+    note = schema["$defs"]["ExtractedStakeholderNote"]
+    assert response_format["json_schema"]["strict"] is True
+    assert schema["additionalProperties"] is False
+    assert schema["required"] == ["stakeholder_notes"]
+    assert note["additionalProperties"] is False
+    assert note["required"] == list(note["properties"])
+
+
+@pytest.mark.asyncio
+async def test_large_submissions_are_split_into_batches(
+    manager: OpenAIManager, tmp_path: Path
+):
+    backend = FakeBatchBackend(tmp_path / "endpoint", echo_response)
+    extractor = BatchExtractor(manager, backend, tmp_path / "work", poll_interval=0)
+    extractor.MAX_REQUESTS = 2
+
+    result = await extractor.extract_stakeholder_notes([
+        chunk_for(title) for title in "abcde"
+    ])
+
+    assert len(backend.created) == 3
+    assert [n.stakeholder_notes[0].title for n in result.successful()] == list("abcde")
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_only_fails_its_own_chunks(
+    manager: OpenAIManager, tmp_path: Path
+):
+    backend = FakeBatchBackend(tmp_path / "endpoint", echo_response)
+    upload = backend.upload
+
+    async def failing_upload(path: Path) -> str:
+        if '"chunk-2"' in path.read_text(encoding="utf-8"):
+            raise RuntimeError("upload failed")
+        return await upload(path)
+
+    backend.upload = failing_upload
+    extractor = BatchExtractor(manager, backend, tmp_path / "work", poll_interval=0)
+    extractor.MAX_REQUESTS = 2
+
+    result = await extractor.extract_stakeholder_notes([
+        chunk_for(title) for title in "abcde"
+    ])
+
+    assert sorted(result.failures) == [2, 3]
+    assert all(isinstance(e, RuntimeError) for e in result.failures.values())
+    assert [n.stakeholder_notes[0].title for n in result.successful()] == list("abe")
+
+
+@pytest.mark.asyncio
+async def test_expired_batches_keep_partial_results(
+    manager: OpenAIManager, tmp_path: Path
+):
+    submitted: list[str] = []
+
+    def respond(request: dict[str, Any]) -> dict[str, Any]:
+        submitted.append(request["custom_id"])
+        return echo_response(request)
+
+    backend = FakeBatchBackend(tmp_path / "endpoint", respond, polls_until_done=0)
+    backend.expire_after = 2
+    extractor = BatchExtractor(manager, backend, tmp_path / "work", poll_interval=0)
+
+    result = await extractor.extract_stakeholder_notes([
+        chunk_for(title) for title in "abc"
+    ])
+
+    # Only the request the expired batch did not get to was submitted again.
+    assert len(backend.created) == 2
+    assert submitted == ["chunk-0", "chunk-1", "chunk-2"]
+    assert [n.stakeholder_notes[0].title for n in result.successful()] == list("abc")
+
+
+@pytest.mark.asyncio
+async def test_interrupted_batch_is_resumed(manager: OpenAIManager, tmp_path: Path):
+    backend = FakeBatchBackend(
+        tmp_path / "endpoint", echo_response, polls_until_done=10**9
+    )
+    extractor = BatchExtractor(manager, backend, tmp_path / "work", poll_interval=0)
+    with pytest.raises(TimeoutError):
+        await asyncio.wait_for(
+            extractor.extract_stakeholder_notes([chunk_for("a")]), timeout=0.05
+        )
+
+    backend.polls_until_done = 0
+    result = await extractor.extract_stakeholder_notes([chunk_for("a")])
+
+    assert len(backend.created) == 1
+    assert result.successful() == [notes_for("a")]
+
+
+@pytest.mark.asyncio
+async def test_cached_chunks_are_not_submitted(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    manager = OpenAIManager(model="test-model", cache=ExtractionCache(tmp_path))
+    assert manager.cache is not None
+    manager.cache.put(manager.cache_key(chunk_for("cached")), notes_for("cached"))
+    submitted: list[dict[str, Any]] = []
+
+    def respond(request: dict[str, Any]) -> dict[str, Any]:
+        submitted.append(request)
+        return echo_response(request)
+
+    backend = FakeBatchBackend(tmp_path / "endpoint", respond)
+    extractor = BatchExtractor(manager, backend, tmp_path / "work", poll_interval=0)
+
+    result = await extractor.extract_stakeholder_notes([
+        chunk_for("cached"),
+        chunk_for("new"),
+    ])
+
+    assert [request["custom_id"] for request in submitted] == ["chunk-1"]
+    assert result.successful() == [notes_for("cached"), notes_for("new")]
+    assert manager.cache.get(manager.cache_key(chunk_for("new"))) == notes_for("new")
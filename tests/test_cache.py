@@ -0,0 +1,124 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from slack_archive.cache import ExtractionCache
+from slack_archive.chunking import Chunk
+from slack_archive.schema import (
+    ExtractedStakeholderNote,
+    ExtractedStakeholderNotes,
+    StakeholderNote,
+    StakeholderNotes,
+)
+from slack_archive.structured_extract import OpenAIManager
+
+
+def make_notes(title: str) -> StakeholderNotes:
+    return StakeholderNotes(
+        stakeholder_notes=[
+            StakeholderNote(
+                stakeholder_name="Acme",
+                date="2024-01-01",
+                title=title,
+                summary="summary",
+                relevant_slack_threads=["alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"],
+            )
+        ]
+    )
+
+
+def test_round_trip(tmp_path: Path):
+    cache = ExtractionCache(tmp_path)
+    key = ExtractionCache.make_key("chunk", "gpt-4o", {"system": "s"}, "{}")
+    assert cache.get(key) is None
+
+    cache.put(key, make_notes("first"))
+    assert cache.get(key) == make_notes("first")
+    cache.close()
+
+    # Entries survive reopening the cache.
+    assert ExtractionCache(tmp_path).get(key) == make_notes("first")
+
+
+def test_key_depends_on_all_inputs():
+    base = ExtractionCache.make_key("chunk", "gpt-4o", {"system": "s"}, "{}")
+    assert base != ExtractionCache.make_key("chunk2", "gpt-4o", {"system": "s"}, "{}")
+    assert base != ExtractionCache.make_key("chunk", "gpt-4", {"system": "s"}, "{}")
+    assert base != ExtractionCache.make_key("chunk", "gpt-4o", {"system": "t"}, "{}")
+    assert base != ExtractionCache.make_key("chunk", "gpt-4o", {"system": "s"}, "[]")
+
+
+def test_age_eviction(tmp_path: Path):
+    cache = ExtractionCache(tmp_path, max_age=0.05)
+    cache.put("key", make_notes("old"))
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    assert cache.evict() == 1
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path: Path):
+    entry_size = len(make_notes("a").model_dump_json())
+    cache = ExtractionCache(tmp_path, max_bytes=entry_size * 2)
+    cache.put("a", make_notes("a"))
+    cache.put("b", make_notes("b"))
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # "a" becomes the most recently used entry
+    cache.put("c", make_notes("c"))
+
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_size_eviction_runs_while_entries_are_added(tmp_path: Path):
+    entry_size = len(make_notes("a").model_dump_json())
+    cache = ExtractionCache(tmp_path, max_bytes=entry_size * 2, evict_interval=2)
+    for title in "abcd":
+        cache.put(title, make_notes(title))
+        time.sleep(0.01)
+
+    # The fourth insert evicted down to the two most recently used entries.
+    assert cache.evict() == 0
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("d") is not None
+
+
+@pytest.mark.asyncio
+async def test_process_chunk_skips_api_on_cache_hit(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    manager = OpenAIManager(model="test-model", cache=ExtractionCache(tmp_path))
+    calls: list[str] = []
+
+    async def fake_completion(chunk: Chunk) -> ExtractedStakeholderNotes:
+        await asyncio.sleep(0)
+        calls.append(chunk.text)
+        return ExtractedStakeholderNotes(
+            stakeholder_notes=[
+                ExtractedStakeholderNote(
+                    stakeholder_name="Acme",
+                    date="2024-01-01",
+                    title=chunk.text,
+                    summary="summary",
+                    relevant_thread_ids=[1],
+                )
+            ]
+        )
+
+    monkeypatch.setattr(manager, "_create_completion", fake_completion)
+    chunk = Chunk("[1] chunk", {1: "thread"})
+
+    first = await manager.process_chunk(chunk)
+    second = await manager.process_chunk(chunk)
+
+    assert first == second
+    assert first is not None
+    assert first.stakeholder_notes[0].relevant_slack_threads == ["thread"]
+    assert calls == ["[1] chunk"]
+    assert manager.cache is not None
+    assert (manager.cache.hits, manager.cache.misses) == (1, 1)
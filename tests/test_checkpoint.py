@@ -0,0 +1,90 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from slack_archive.checkpoint import Checkpoint
+from slack_archive.chunking import Chunk
+from slack_archive.schema import StakeholderNote, StakeholderNotes
+from slack_archive.structured_extract import OpenAIManager
+
+
+def make_notes(title: str) -> StakeholderNotes:
+    return StakeholderNotes(
+        stakeholder_notes=[
+            StakeholderNote(
+                stakeholder_name="Acme",
+                date="2024-01-01",
+                title=title,
+                summary="summary",
+                relevant_slack_threads=[],
+            )
+        ]
+    )
+
+
+def test_resume_reads_back_results(tmp_path: Path):
+    checkpoint = Checkpoint(tmp_path)
+    checkpoint.record("a", make_notes("a"))
+    checkpoint.record("b", make_notes("b"))
+    with open(checkpoint.path, "a", encoding="utf-8") as file:
+        file.write('{"key": "c", "notes": {"stakeh')  # crashed mid-write
+
+    resumed = Checkpoint(tmp_path, resume=True)
+
+    assert len(resumed) == 2
+    assert resumed.get("b") == make_notes("b")
+    assert resumed.get("c") is None
+
+
+def test_results_recorded_after_a_crash_survive_the_next_resume(tmp_path: Path):
+    Checkpoint(tmp_path).record("a", make_notes("a"))
+    with open(tmp_path / Checkpoint.FILE_NAME, "a", encoding="utf-8") as file:
+        file.write('{"key": "b", "notes": {"stakeh')  # crashed mid-write
+
+    Checkpoint(tmp_path, resume=True).record("b", make_notes("b"))
+    resumed = Checkpoint(tmp_path, resume=True)
+
+    assert resumed.get("a") == make_notes("a")
+    assert resumed.get("b") == make_notes("b")
+
+
+def test_fresh_run_clears_checkpoint(tmp_path: Path):
+    Checkpoint(tmp_path).record("a", make_notes("a"))
+
+    assert Checkpoint(tmp_path).get("a") is None
+    assert Checkpoint(tmp_path, resume=True).get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_extraction_skips_checkpointed_and_quarantines_failures(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    manager = OpenAIManager(model="test-model", checkpoint=Checkpoint(tmp_path))
+    processed: list[str] = []
+
+    async def fake_process_chunk(chunk: Chunk) -> StakeholderNotes:
+        await asyncio.sleep(0)
+        processed.append(chunk.text)
+        if chunk.text == "bad":
+            raise ValueError("boom")
+        return make_notes(chunk.text)
+
+    monkeypatch.setattr(manager, "process_chunk", fake_process_chunk)
+    chunks = [Chunk("a"), Chunk("bad"), Chunk("c")]
+
+    first = await manager.extract_stakeholder_notes(chunks)
+    manager.checkpoint = Checkpoint(tmp_path, resume=True)
+    second = await manager.extract_stakeholder_notes(chunks)
+
+    assert list(first.failures) == list(second.failures) == [1]
+    assert sorted(processed) == ["a", "bad", "bad", "c"]
+    assert second.successful() == [make_notes("a"), make_notes("c")]
+    quarantined = [
+        json.loads(line)
+        for line in manager.checkpoint.quarantine_path.read_text().splitlines()
+    ]
+    assert [entry["chunk"] for entry in quarantined] == ["bad", "bad"]
+    assert quarantined[0]["error"] == "ValueError: boom"
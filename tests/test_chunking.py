@@ -1,9 +1,12 @@
+import re
+from itertools import groupby, islice
 from pathlib import Path
 
 import pytest
 
-from slack_archive.chunking import ConversationProcessor, Thread
+from slack_archive.chunking import Chunk, ConversationProcessor, Thread
 from slack_archive.config import SLACK_DUMP_PATH
+from slack_archive.schema import ExtractedStakeholderNote, ExtractedStakeholderNotes
 
 
 @pytest.fixture
@@ -19,6 +22,18 @@ def test_thread_map(processor: ConversationProcessor):
     assert isinstance(thread_map[sample_fingerprint], Thread)
 
 
+def test_iter_threads_matches_regex_split(processor: ConversationProcessor):
+    text = processor.file_path.read_text(encoding="utf-8")
+    parts = re.split(processor.THREAD_PATTERN, text, flags=re.MULTILINE)
+    expected = [
+        (parts[i].strip(), parts[i] + parts[i + 1]) for i in range(1, len(parts), 2)
+    ]
+
+    threads = [(t.fingerprint, t.content) for t in processor.iter_threads()]
+
+    assert threads == expected
+
+
 def test_get_fingerprints(processor: ConversationProcessor):
     fingerprints = list(processor.get_fingerprints())
     assert len(fingerprints) > 0
@@ -47,6 +62,140 @@ def test_chunk_conversation(processor: ConversationProcessor):
         assert len(processor.encoding.encode(chunk)) <= processor.chunk_size
 
 
+def test_iter_chunks_labels_threads(processor: ConversationProcessor):
+    chunks = list(processor.iter_chunks())
+
+    assert len(chunks) == len(list(processor.chunk_conversation()))
+    for chunk in chunks:
+        assert len(processor.encoding.encode(chunk.text)) <= processor.chunk_budget
+        for thread_id, fingerprint in chunk.thread_ids.items():
+            assert f"{Chunk.label(thread_id)}> {fingerprint}\n" in chunk.text
+    assert sum(len(chunk.thread_ids) for chunk in chunks) == len(
+        list(processor.get_threads())
+    )
+
+
+def test_chunks_keep_threads_and_their_parts_in_order():
+    processor = ConversationProcessor(SLACK_DUMP_PATH, chunk_size=600)
+
+    keys = [
+        key for chunk in processor.iter_chunks() for key in chunk.thread_ids.values()
+    ]
+
+    # The parts of a split thread follow each other, and threads keep dump order.
+    assert [key for key, _ in groupby(keys)] == [
+        thread.key for thread in processor.get_threads()
+    ]
+
+
+def test_chunk_resolves_thread_ids():
+    chunk = Chunk("[1] > a\n[2] > b\n", {1: "a", 2: "b"})
+    extracted = ExtractedStakeholderNotes(
+        stakeholder_notes=[
+            ExtractedStakeholderNote(
+                stakeholder_name="Acme",
+                date="2024-01-01",
+                title="Call",
+                summary="summary",
+                relevant_thread_ids=[2, 7, 2],
+            )
+        ]
+    )
+
+    (note,) = chunk.resolve(extracted).stakeholder_notes
+
+    assert note.relevant_slack_threads == ["b"]
+    assert note.title == "Call"
+
+
+def test_count_tokens_matches_encode(processor: ConversationProcessor):
+    texts = [str(thread) for thread in islice(processor.get_threads(), 50)]
+    assert processor.count_tokens(texts) == [
+        len(processor.encoding.encode(text)) for text in texts
+    ]
+
+
+def test_rechunking_reuses_token_counts(
+    processor: ConversationProcessor, monkeypatch: pytest.MonkeyPatch
+):
+    first = list(processor.chunk_conversation())
+
+    def fail(*_args: object, **_kwargs: object) -> None:
+        raise AssertionError("threads were tokenized again")
+
+    monkeypatch.setattr(processor.encoding, "encode", fail)
+    processor.chunk_size //= 2
+    second = list(processor.chunk_conversation())
+
+    assert sorted("".join(first).split("\n> ")) == sorted("".join(second).split("\n> "))
+    assert len(second) > len(first)
+
+
+def test_oversized_threads_are_split_at_replies(tmp_path: Path):
+    fingerprint = "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+    replies = "".join(
+        f"|   \n|   > Tina [U03GRQX5HGR] @ 06/01/2023 12:{i:02d}:00 Z:\n"
+        f"|   {'reply text ' * 40}\n"
+        for i in range(20)
+    )
+    dump_path = tmp_path / "dump.txt"
+    dump_path.write_text(f"{fingerprint}\nparent message\n{replies}\n", "utf-8")
+    processor = ConversationProcessor(dump_path, chunk_size=600)
+
+    chunks = list(processor.chunk_conversation())
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith(fingerprint) for chunk in chunks)
+    assert all(
+        len(processor.encoding.encode(chunk)) <= processor.chunk_size
+        for chunk in chunks
+    )
+    assert sum(chunk.count("|   > Tina") for chunk in chunks) == 20
+
+
+def test_oversized_messages_are_split_by_tokens(tmp_path: Path):
+    fingerprint = "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+    dump_path = tmp_path / "dump.txt"
+    dump_path.write_text(f"{fingerprint}\n{'long message ' * 400}\n", "utf-8")
+    processor = ConversationProcessor(dump_path, chunk_size=600)
+
+    (thread,) = processor.get_threads()
+
+    chunks = list(processor.chunk_conversation())
+
+    assert len(chunks) > 1
+    # Only the parts after the first get the fingerprint as a header.
+    assert chunks[0].count(fingerprint) == str(thread).count(fingerprint)
+    assert all(chunk.count(fingerprint) == 1 for chunk in chunks[1:])
+    assert all(
+        len(processor.encoding.encode(chunk)) <= processor.chunk_size
+        for chunk in chunks
+    )
+
+
+def test_prompt_overhead_is_reserved():
+    processor = ConversationProcessor(
+        SLACK_DUMP_PATH, chunk_size=4000, prompt_overhead="system prompt " * 200
+    )
+    assert processor.reserved_tokens > 0
+
+    chunks = list(processor.chunk_conversation())
+
+    assert all(chunk for chunk in chunks)
+    assert all(
+        len(processor.encoding.encode(chunk)) <= processor.chunk_budget
+        for chunk in chunks
+    )
+
+
+def test_encoding_is_loaded_once_per_process():
+    first = ConversationProcessor(SLACK_DUMP_PATH)
+    second = ConversationProcessor(SLACK_DUMP_PATH, chunk_size=4000)
+
+    assert "encoding" not in vars(first)
+    assert first.encoding is second.encoding
+
+
 def test_last_chunk_save(processor: ConversationProcessor, tmp_path: Path):
     last_chunk_save_path = tmp_path / "last_chunk.txt"
     chunks = list(processor.chunk_conversation())
@@ -0,0 +1,88 @@
+from slack_archive.dedup import NoteDeduplicator, deduplicate_notes
+from slack_archive.schema import StakeholderNote
+
+
+def make_note(
+    stakeholder: str, date: str, title: str, summary: str, thread: str
+) -> StakeholderNote:
+    return StakeholderNote(
+        stakeholder_name=stakeholder,
+        date=date,
+        title=title,
+        summary=summary,
+        relevant_slack_threads=[thread],
+    )
+
+
+PRICING = "Discussed the pricing of the enterprise plan and next steps for the pilot"
+HIRING = "Acme is hiring two engineers for the integration team next quarter"
+
+
+def test_near_duplicates_are_merged():
+    notes = [
+        make_note("Acme Inc.", "2024-03-01", "Pricing call", PRICING, "t1"),
+        make_note("acme", "2024-03-02", "Pricing call with Acme", PRICING + ".", "t2"),
+        make_note("Acme", "2024-03-01", "Hiring update", HIRING, "t3"),
+        make_note("Acme", "2024-03-09", "Pricing call", PRICING, "t4"),
+        make_note("Globex", "2024-03-01", "Pricing call", PRICING, "t5"),
+        make_note("Acme", "early March", "Pricing call", PRICING, "t6"),
+        make_note("Acme", "early March", "Pricing call", PRICING, "t7"),
+    ]
+
+    merged = deduplicate_notes(notes)
+
+    assert [note.relevant_slack_threads for note in merged] == [
+        ["t1", "t2"],
+        ["t3"],
+        ["t4"],
+        ["t5"],
+        ["t6", "t7"],
+    ]
+    assert merged[0].title == "Pricing call"
+    assert merged[0].summary == PRICING + "."
+
+
+def test_clusters_keep_their_ids_across_calls():
+    deduplicator = NoteDeduplicator()
+
+    first = deduplicator.add([
+        make_note("Acme", "2024-03-01", "Pricing call", PRICING, "t1"),
+        make_note("Acme", "2024-03-01", "Hiring update", HIRING, "t2"),
+    ])
+    second = deduplicator.add([
+        make_note("Acme", "2024-03-01", "Hiring update", HIRING, "t3")
+    ])
+
+    assert first == [0, 1]
+    assert second == [1]
+    assert deduplicator.notes[1].relevant_slack_threads == ["t2", "t3"]
+
+
+def test_clusters_not_added_to_in_the_retained_calls_are_dropped():
+    deduplicator = NoteDeduplicator(window_days=1, retain_calls=2)
+
+    deduplicator.add([make_note("Acme", "2024-03-01", "Pricing call", PRICING, "t1")])
+    deduplicator.add([make_note("Acme", "2024-03-01", "Hiring update", HIRING, "t2")])
+    deduplicator.add([make_note("Acme", "2024-03-01", "Hiring update", HIRING, "t3")])
+    late = deduplicator.add([
+        make_note("Acme", "2024-03-01", "Pricing call", PRICING, "t4")
+    ])
+
+    assert list(deduplicator.notes) == [1, 2]
+    assert late == [2]
+    assert deduplicator.clusters == 3
+
+
+def test_notes_out_of_date_order_are_still_merged():
+    deduplicator = NoteDeduplicator(window_days=1, retain_calls=2)
+
+    deduplicator.add([make_note("Acme", "2024-03-01", "Pricing call", PRICING, "t1")])
+    # A chunk with much later dates completes before the rest of its neighbours.
+    deduplicator.add([make_note("Acme", "2024-06-30", "Hiring update", HIRING, "t2")])
+    late = deduplicator.add([
+        make_note("Acme", "2024-03-02", "Pricing call", PRICING, "t3")
+    ])
+
+    assert late == [0]
+    assert deduplicator.notes[0].relevant_slack_threads == ["t1", "t3"]
+    assert deduplicator.clusters == 2
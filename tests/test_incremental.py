@@ -0,0 +1,88 @@
+from collections.abc import Sequence
+from datetime import timedelta
+from pathlib import Path
+
+from slack_archive.chunking import Thread
+from slack_archive.incremental import (
+    ChannelWatermark,
+    IncrementalState,
+    merge_notes,
+    select_pending_threads,
+)
+from slack_archive.schema import StakeholderNote
+
+
+def make_thread(
+    timestamp: str, replies: Sequence[str] = (), author: str = "alex [U03ERC46NKA]"
+) -> Thread:
+    fingerprint = f"> {author} @ {timestamp} Z:"
+    content = f"{fingerprint}\nmessage\n"
+    for reply in replies:
+        content += f"|   \n|   > Tina [U03GRQX5HGR] @ {reply} Z:\n|   reply\n"
+    return Thread.from_text(content)
+
+
+def make_note(title: str, threads: list[str]) -> StakeholderNote:
+    return StakeholderNote(
+        stakeholder_name="Acme",
+        date="2024-01-01",
+        title=title,
+        summary="summary",
+        relevant_slack_threads=threads,
+    )
+
+
+def test_first_run_processes_everything():
+    threads = [make_thread("01/01/2024 10:00:00"), make_thread("02/01/2024 10:00:00")]
+    assert list(select_pending_threads(threads, ChannelWatermark())) == threads
+
+
+def test_only_new_threads_and_new_replies_are_pending():
+    old = make_thread("01/01/2024 10:00:00")
+    open_thread = make_thread("20/01/2024 10:00:00", ["20/01/2024 11:00:00"])
+    watermark = ChannelWatermark().advance([old, open_thread], timedelta(days=7))
+    assert watermark.open_threads == {open_thread.key: 1}
+
+    replied = make_thread(
+        "20/01/2024 10:00:00", ["20/01/2024 11:00:00", "21/01/2024 09:00:00"]
+    )
+    new = make_thread("22/01/2024 10:00:00")
+    pending = list(select_pending_threads([old, replied, new], watermark))
+
+    assert pending == [replied, new]
+
+
+def test_threads_started_in_the_watermark_second_are_pending():
+    processed = make_thread("20/01/2024 10:00:00")
+    watermark = ChannelWatermark().advance([processed])
+
+    same_second = make_thread("20/01/2024 10:00:00", author="Tina [U03GRQX5HGR]")
+    pending = list(select_pending_threads([processed, same_second], watermark))
+
+    assert pending == [same_second]
+
+
+def test_state_round_trip(tmp_path: Path):
+    state = IncrementalState(tmp_path)
+    watermark = ChannelWatermark().advance([make_thread("01/01/2024 10:00:00")])
+    state.save_watermark("C123", watermark)
+    state.save_notes([make_note("kickoff", [])])
+
+    reloaded = IncrementalState(tmp_path)
+    assert reloaded.load_watermark("C123") == watermark
+    assert reloaded.load_watermark("C456") == ChannelWatermark()
+    assert reloaded.load_notes() == [make_note("kickoff", [])]
+
+
+def test_merge_replaces_notes_of_reprocessed_threads():
+    thread = "alex [U03ERC46NKA] @ 20/01/2024 10:00:00 Z:"
+    existing = [
+        make_note("kickoff", ["alex [U03ERC46NKA] @ 01/01/2024 10:00:00 Z:"]),
+        make_note("follow-up", [thread]),
+        make_note("renamed", []),
+    ]
+    new = [make_note("follow-up v2", [thread]), make_note("renamed", [])]
+
+    merged = merge_notes(existing, new, reprocessed={thread})
+
+    assert [note.title for note in merged] == ["kickoff", "follow-up v2", "renamed"]
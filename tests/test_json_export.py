@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.json_export import SlackExport
+
+# 06/01/2023 11:44:42 UTC and later
+T0 = 1673005482
+
+
+def message(user: str, ts: float, text: str, **fields: object) -> dict[str, object]:
+    return {"type": "message", "user": user, "ts": f"{ts:.6f}", "text": text, **fields}
+
+
+@pytest.fixture
+def export_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "export"
+    (directory / "partners").mkdir(parents=True)
+    (directory / "users.json").write_text(
+        json.dumps([
+            {"id": "U03ERC46NKA", "name": "alex", "profile": {}},
+            {"id": "U03GRQX5HGR", "name": "tina", "profile": {"real_name": "Tina"}},
+        ])
+    )
+    (directory / "channels.json").write_text(
+        json.dumps([{"id": "C001", "name": "partners"}])
+    )
+    ts = f"{T0:.6f}"
+    days = {
+        "2023-01-06": [
+            message(
+                "U03GRQX5HGR", T0 + 3600, "Great, follow up next week", thread_ts=ts
+            ),
+            message(
+                "U03ERC46NKA",
+                T0,
+                "Call with Acme went well\n• pricing",
+                thread_ts=ts,
+                reply_count=2,
+            ),
+            message("U03GRQX5HGR", T0 + 60, "Unrelated message"),
+        ],
+        "2023-01-07": [
+            message("U03ERC46NKA", T0 + 86400, "Sent the contract", thread_ts=ts),
+            # The parent of this reply is not part of the export.
+            message(
+                "U03ERC46NKA", T0 + 90000, "Late reply", thread_ts=f"{T0 - 600:.6f}"
+            ),
+        ],
+    }
+    for day, messages in days.items():
+        (directory / "partners" / f"{day}.json").write_text(json.dumps(messages))
+    return directory
+
+
+def test_threads_are_grouped_by_thread_ts(export_dir: Path):
+    export = SlackExport(export_dir, workers=2)
+
+    threads = list(export.iter_threads(export.channels()["C001"]))
+
+    assert [thread.fingerprint for thread in threads] == [
+        "> Tina [U03GRQX5HGR] @ 06/01/2023 11:45:42 Z:",
+        "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:",
+        "> alex [U03ERC46NKA] @ 07/01/2023 12:44:42 Z:",
+    ]
+    assert [thread.reply_count for thread in threads] == [0, 2, 0]
+    assert threads[1].content == (
+        "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:\n"
+        "Call with Acme went well\n"
+        "• pricing\n"
+        "|   \n"
+        "|   > Tina [U03GRQX5HGR] @ 06/01/2023 12:44:42 Z:\n"
+        "|   Great, follow up next week\n"
+        "|   \n"
+        "|   > alex [U03ERC46NKA] @ 07/01/2023 11:44:42 Z:\n"
+        "|   Sent the contract\n\n"
+    )
+
+
+def test_dumps_parse_back_into_the_same_threads(export_dir: Path, tmp_path: Path):
+    export = SlackExport(export_dir)
+
+    dumps = export.write_dumps(tmp_path / "dumps")
+
+    assert list(dumps) == ["C001"]
+    parsed = list(ConversationProcessor(dumps["C001"]).iter_threads())
+    expected = list(export.iter_threads(export.channels()["C001"]))
+    assert [(t.fingerprint, t.content) for t in parsed] == [
+        (t.fingerprint, t.content) for t in expected
+    ]
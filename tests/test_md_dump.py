@@ -0,0 +1,96 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from slack_archive.md_dump import (
+    MarkdownWriter,
+    WriteStats,
+    dump_to_markdown,
+    note_file_name,
+    render_note,
+)
+from slack_archive.schema import PostProcessedStakeholderNote
+
+
+def make_note(title: str, summary: str = "summary") -> PostProcessedStakeholderNote:
+    return PostProcessedStakeholderNote(
+        stakeholder_name="Acme Corp.",
+        date="2024-01-01",
+        title=title,
+        summary=summary,
+        relevant_slack_threads=["alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"],
+        full_slack_threads="> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:\nHello",
+    )
+
+
+def test_file_names_are_stable_and_safe():
+    note = make_note("Kick-off: Q1 / roadmap?")
+
+    assert note_file_name(note).startswith("2024-01-01-acme-corp-kick-off-q1-roadmap-")
+    assert note_file_name(note) == note_file_name(make_note("Kick-off: Q1 / roadmap?"))
+    assert "-untitled-" in note_file_name(make_note(""))
+
+
+def test_notes_with_the_same_slug_get_distinct_names():
+    assert note_file_name(make_note("Q1 roadmap")) != note_file_name(
+        make_note("Q1: roadmap")
+    )
+
+
+def test_threads_containing_fences_stay_inside_the_code_block():
+    note = make_note("Snippet").model_copy(
+        update={"full_slack_threads": "Run this:\n```\nmake test\n```"}
+    )
+
+    rendered = render_note(note)
+
+    assert "````\nRun this:\n```\nmake test\n```\n````\n" in rendered
+
+
+def test_only_changed_files_are_rewritten(tmp_path: Path):
+    notes = [make_note("Kick-off"), make_note("Review"), make_note("Review")]
+
+    first = dump_to_markdown(notes, tmp_path)
+    kick_off = tmp_path / f"{note_file_name(notes[0])}.md"
+    review = tmp_path / f"{note_file_name(notes[1])}.md"
+    mtime = kick_off.stat().st_mtime_ns
+    second = dump_to_markdown([notes[0], make_note("Review", "new summary")], tmp_path)
+
+    assert first == WriteStats(written=3)
+    assert second == WriteStats(written=1, unchanged=1, removed=1)
+    assert kick_off.stat().st_mtime_ns == mtime
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([
+        ".slack_archive",
+        kick_off.name,
+        review.name,
+    ])
+    assert "new summary" in review.read_text()
+
+
+def test_incomplete_sets_are_not_pruned(tmp_path: Path):
+    dump_to_markdown([make_note("Kick-off"), make_note("Review")], tmp_path)
+
+    stats = dump_to_markdown([make_note("Review")], tmp_path, prune=False)
+
+    assert stats == WriteStats(unchanged=1)
+    assert len(list(tmp_path.glob("*.md"))) == 2
+
+
+def test_writes_share_the_threads_of_the_writer(tmp_path: Path):
+    threads: set[str] = set()
+    write_atomic = MarkdownWriter._write_atomic
+
+    def record_thread(path: Path, content: str) -> None:
+        if path.suffix == ".md":
+            threads.add(threading.current_thread().name)
+        write_atomic(path, content)
+
+    with MarkdownWriter(tmp_path, max_workers=1) as writer:
+        writer._write_atomic = record_thread
+        writer.write([make_note("Kick-off")])
+        writer.write([make_note("Review")])
+
+    assert len(threads) == 1
+    with pytest.raises(RuntimeError):
+        writer.write([make_note("Follow-up")])
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+import pytest
+from openai.types import CompletionUsage
+from openai.types.completion_usage import PromptTokensDetails
+
+from slack_archive.metrics import PipelineMetrics, model_prices
+
+
+def usage(prompt: int, completion: int, cached: int = 0) -> CompletionUsage:
+    return CompletionUsage(
+        prompt_tokens=prompt,
+        completion_tokens=completion,
+        total_tokens=prompt + completion,
+        prompt_tokens_details=PromptTokensDetails(cached_tokens=cached),
+    )
+
+
+def test_stages_add_up():
+    metrics = PipelineMetrics("gpt-4o")
+
+    with metrics.stage("extract"):
+        pass
+    first = metrics.stages["extract"]
+    with metrics.stage("extract"):
+        pass
+
+    assert list(metrics.stages) == ["extract"]
+    assert metrics.stages["extract"] >= first
+
+
+def test_summary_reports_latency_percentiles_and_tokens():
+    metrics = PipelineMetrics("gpt-4o")
+    for i in range(1, 101):
+        metrics.record_request(f"chunk {i}", float(i), usage(1000, 100, cached=500))
+    metrics.stages["extract"] = 10.0
+
+    summary = metrics.summary()
+
+    assert summary["requests"]["latency"]["p50"] == pytest.approx(50.5)
+    assert summary["requests"]["latency"]["p99"] == pytest.approx(99.01)
+    assert summary["requests"]["slowest"][0] == {"label": "chunk 100", "latency": 100.0}
+    assert summary["tokens"] == {
+        "prompt": 100_000,
+        "completion": 10_000,
+        "cached": 50_000,
+    }
+    assert summary["throughput"]["requests_per_second"] == pytest.approx(10.0)
+
+
+def test_estimated_cost_discounts_cached_and_batch_tokens():
+    metrics = PipelineMetrics("gpt-4o-mini-2024-07-18")
+    metrics.record_request("live", 1.0, usage(1_000_000, 0, cached=1_000_000))
+    metrics.record_request("batch", None, usage(0, 1_000_000), batch=True)
+
+    assert model_prices("gpt-4o-mini-2024-07-18") == model_prices("gpt-4o-mini")
+    assert metrics.estimated_cost() == pytest.approx(0.075 + 0.30)
+    assert PipelineMetrics("unknown-model").estimated_cost() is None
+
+
+def test_write_json_and_openmetrics(tmp_path: Path):
+    metrics = PipelineMetrics("gpt-4o")
+    metrics.record_request("chunk", 1.5, usage(100, 10), retries=2)
+    metrics.record_failure("failed chunk", 3.0, retries=3)
+    with metrics.stage("dump"):
+        pass
+
+    metrics.write_json(tmp_path / "metrics.json")
+    metrics.write_openmetrics(tmp_path / "metrics.txt")
+
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["requests"]["retries"] == 5
+    assert data["requests"]["failed"] == 1
+    text = (tmp_path / "metrics.txt").read_text()
+    assert 'slack_archive_tokens_total{model="gpt-4o",kind="prompt"} 100' in text
+    assert "slack_archive_request_retries_total 5" in text
+    assert "slack_archive_request_failures_total 1" in text
+    assert text.endswith("# EOF\n")
@@ -0,0 +1,124 @@
+from collections.abc import Sequence
+from pathlib import Path
+
+import pytest
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.noise import NoiseFilter, split_messages
+from slack_archive.thread import Thread, ThreadStore
+
+DUMP = """\
+> Danny M [U03TG3UMZFD] @ 06/01/2023 11:42:13 Z:
+<@U03TG3UMZFD> has joined the channel
+set the channel description: Growth and adoption of SUAVE
+
+> Slackbot [USLACKBOT] @ 24/02/2023 22:47:02 Z:
+Reminder: standup
+
+> Tina [U03GRQX5HGR] @ 25/02/2023 10:00:00 Z:
+:tada: 🎉
+|
+|   > alex [U03ERC46NKA] @ 25/02/2023 10:05:00 Z:
+|   :+1:
+
+> Hasu [U03FP0H62HH] @ 26/02/2023 09:00:00 Z:
+<@U03ERC46NKA> thanks!
+
+> alex [U03ERC46NKA] @ 27/02/2023 15:30:40 Z:
+Call with Acme went well, they want to try the new relay next month.
+|
+|   > Slackbot [USLACKBOT] @ 27/02/2023 15:31:00 Z:
+|   Reminder noted
+"""
+
+ALL_RULES = ["membership", "bots", "emoji_only", "short"]
+
+
+@pytest.fixture
+def threads() -> list[Thread]:
+    return list(ThreadStore(DUMP.encode()))
+
+
+def test_builtin_rules(threads: list[Thread]):
+    noise_filter = NoiseFilter.from_names(ALL_RULES)
+
+    assert [noise_filter.match(thread) for thread in threads] == [
+        "membership",
+        "bots",
+        "emoji_only",
+        "short",
+        None,
+    ]
+
+
+def test_messages_are_split_by_author(threads: list[Thread]):
+    messages = split_messages(threads[4])
+
+    assert [message.user_id for message in messages] == ["U03ERC46NKA", "USLACKBOT"]
+    assert messages[1].text == "Reminder noted"
+
+
+def test_filter_counts_removed_threads_and_tokens(threads: list[Thread]):
+    noise_filter = NoiseFilter.from_names(["membership", "short"], min_words=5)
+
+    kept = list(noise_filter.filter(threads, lambda texts: [len(texts[0])]))
+
+    assert [thread.user_id for thread in kept] == ["U03ERC46NKA"]
+    assert noise_filter.kept == 1
+    assert noise_filter.stats["membership"].threads == 1
+    assert noise_filter.stats["membership"].tokens == len(str(threads[0]))
+    assert noise_filter.stats["short"].threads == 3
+
+
+def test_custom_rules_and_unknown_names(threads: list[Thread]):
+    noise_filter = NoiseFilter({"acme": lambda thread: "Acme" in thread.content})
+
+    assert len(list(noise_filter.filter(threads))) == 4
+    with pytest.raises(ValueError, match="Unknown noise filters"):
+        NoiseFilter.from_names(["membership", "stickers"])
+
+
+def test_batch_rules_see_the_threads_earlier_rules_kept(threads: list[Thread]):
+    batches: list[int] = []
+
+    def rule(batch: Sequence[Thread]) -> list[bool]:
+        batches.append(len(batch))
+        return [thread.user_id == "USLACKBOT" for thread in batch]
+
+    noise_filter = NoiseFilter.from_names(["membership"])
+    noise_filter.add_batch_rule("bots", rule)
+    kept = list(noise_filter.filter(threads))
+
+    assert batches == [len(threads) - 1]
+    assert len(kept) == len(threads) - 2
+    assert noise_filter.match(threads[1]) == "bots"
+
+
+def test_terse_threads_are_only_filtered_on_request():
+    assert list(NoiseFilter.from_names().rules) == ["membership", "bots"]
+
+
+def test_stats_cover_one_pass(threads: list[Thread]):
+    noise_filter = NoiseFilter.from_names(["membership"])
+
+    list(noise_filter.filter(threads))
+    list(noise_filter.filter(threads))
+
+    assert noise_filter.stats["membership"].threads == 1
+    assert noise_filter.kept == len(threads) - 1
+
+
+def test_processor_chunks_only_kept_threads(tmp_path: Path):
+    dump_path = tmp_path / "C123.txt"
+    dump_path.write_text(DUMP, encoding="utf-8")
+    processor = ConversationProcessor(
+        dump_path, noise_filter=NoiseFilter.from_names(ALL_RULES)
+    )
+
+    chunks = list(processor.iter_chunks())
+
+    assert [list(chunk.thread_ids.values()) for chunk in chunks] == [
+        ["alex [U03ERC46NKA] @ 27/02/2023 15:30:40 Z:"]
+    ]
+    assert processor.noise_filter is not None
+    assert sum(s.tokens for s in processor.noise_filter.stats.values()) > 0
@@ -0,0 +1,185 @@
+import itertools
+import json
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from openai import InternalServerError
+
+from slack_archive.chunking import Chunk
+from slack_archive.rate_limit import (
+    RateLimiter,
+    RequestPolicy,
+    parse_duration,
+    parse_retry_after,
+)
+from slack_archive.structured_extract import OpenAIManager
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "test-model",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": json.dumps({
+                    "stakeholder_notes": [
+                        {
+                            "stakeholder_name": "Acme",
+                            "date": "2024-01-01",
+                            "title": "Call",
+                            "summary": "summary",
+                            "relevant_thread_ids": [1],
+                        }
+                    ]
+                }),
+            },
+        }
+    ],
+    "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+}
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    """Chat completions endpoint answering the first requests with an error."""
+
+    failures = 0
+    status = 429
+    retry_after = "0.2"
+    request_times: list[float]
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).request_times.append(time.monotonic())
+        if len(self.request_times) <= self.failures:
+            body = {"error": {"message": "Slow down", "code": "rate_limit_exceeded"}}
+            self.reply(self.status, body, {"retry-after": self.retry_after})
+        else:
+            self.reply(200, COMPLETION, {"x-ratelimit-limit-requests": "5000"})
+
+    def reply(self, status: int, body: object, headers: dict[str, str]) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch: pytest.MonkeyPatch) -> Iterator[type[FakeOpenAI]]:
+    handler = type("Handler", (FakeOpenAI,), {"request_times": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(
+        target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{httpd.server_port}/v1")
+    yield handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_are_retried(server: type[FakeOpenAI]):
+    server.failures = 2
+    manager = OpenAIManager(
+        model="test-model", policy=RequestPolicy(max_concurrent=4, retry_delay=0.01)
+    )
+
+    notes = await manager.process_chunk(Chunk("[1] hi", {1: "thread"}, 10))
+
+    assert notes is not None
+    assert notes.stakeholder_notes[0].relevant_slack_threads == ["thread"]
+    times = server.request_times
+    assert len(times) == 3
+    # Every retry waited for the Retry-After of the 429 before it.
+    assert all(b - a >= 0.2 for a, b in itertools.pairwise(times))
+    assert manager.metrics.requests[0].retries == 2
+    assert manager.rate_limiter.requests.capacity == 5000
+    # Halved twice from 4, then raised by one.
+    assert manager.rate_limiter.concurrency == 2
+
+
+@pytest.mark.asyncio
+async def test_server_errors_give_up_after_max_retries(server: type[FakeOpenAI]):
+    server.failures = 10
+    server.status = 500
+    manager = OpenAIManager(
+        model="test-model", policy=RequestPolicy(max_retries=2, retry_delay=0.01)
+    )
+
+    with pytest.raises(InternalServerError):
+        await manager.process_chunk(Chunk("[1] hi", {1: "thread"}))
+
+    assert len(server.request_times) == 3
+
+
+@pytest.mark.asyncio
+async def test_limiter_paces_requests_to_the_reported_budget():
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=10_000)
+    # The server allows 600 requests per minute, none of which are left now.
+    limiter.update({
+        "x-ratelimit-limit-requests": "600",
+        "x-ratelimit-remaining-requests": "0",
+    })
+
+    start = time.monotonic()
+    for _ in range(3):
+        async with limiter.request(tokens=10):
+            pass
+
+    # 10 requests per second refill the bucket.
+    assert time.monotonic() - start >= 0.25
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_waits_for_tokens():
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+    async with limiter.request(tokens=500):
+        pass
+    limiter.reconcile(estimated=500, used=600)
+
+    start = time.monotonic()
+    async with limiter.request(tokens=5):
+        pass
+
+    # 10 tokens per second refill the bucket.
+    assert time.monotonic() - start >= 0.4
+
+
+def test_concurrency_adapts_to_rate_limits():
+    limiter = RateLimiter(max_concurrent=8)
+
+    limiter.throttle(retry_after=None)
+    limiter.throttle(retry_after=None)
+    assert limiter.concurrency == 2
+
+    for _ in range(40):
+        limiter.succeed()
+    assert limiter.concurrency == 8
+
+
+def test_header_parsing():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1.5s") == pytest.approx(1.5)
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("soon") is None
+    assert parse_retry_after({"retry-after": "3"}) == 3
+    headers = {"retry-after-ms": "250", "retry-after": "3"}
+    assert parse_retry_after(headers) == pytest.approx(0.25)
+    assert parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert parse_retry_after({}) is None
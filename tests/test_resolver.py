@@ -0,0 +1,85 @@
+from pathlib import Path
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.postprocess import post_process_all
+from slack_archive.resolver import FingerprintResolver
+from slack_archive.schema import StakeholderNote
+
+FINGERPRINTS = [
+    "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:",
+    "Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:",
+    "Quintus [U03HT20PJES] @ 16/03/2024 14:09:39 Z:",
+]
+
+
+def test_exact_and_normalized_fingerprints():
+    resolver = FingerprintResolver(FINGERPRINTS)
+
+    assert (
+        resolver.resolve_many([
+            FINGERPRINTS[0],
+            "> Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:",
+            "Quintus [U03HT20PJES] @ 16/03/2024 14:09:39",
+        ])
+        == FINGERPRINTS
+    )
+    assert resolver.stats.exact == 3
+
+
+def test_window_matches_user_and_nearby_timestamp():
+    resolver = FingerprintResolver(FINGERPRINTS, score_cutoff=100)
+
+    assert (
+        resolver.resolve("alex [U03ERC46NKA] @ 06/01/2023 11:44:43 Z:")
+        == (FINGERPRINTS[0])
+    )
+    assert (
+        resolver.resolve("Q [U03HT20PJES] @ 16/03/2024 14:09:39 Z:")
+        == (FINGERPRINTS[2])
+    )
+    assert resolver.resolve("alex [U03ERC46NKA] @ 06/01/2023 11:45:42 Z:") is None
+    assert (resolver.stats.window, resolver.stats.missed) == (2, 1)
+
+
+def test_fuzzy_match_is_last_resort():
+    resolver = FingerprintResolver(FINGERPRINTS)
+
+    assert resolver.resolve_many([
+        "Hasu [U03FP0H62H] @ 06/01/2023 12:02:18 Z:",
+        "someone else entirely",
+    ]) == [FINGERPRINTS[1], None]
+    assert (resolver.stats.fuzzy, resolver.stats.missed) == (1, 1)
+
+
+def test_fuzzy_match_prefers_threads_of_the_same_user():
+    same_user = "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+    closer = "alex [U03ERC46NKB] @ 06/01/2023 11:54:43 Z:"
+    resolver = FingerprintResolver([closer, same_user])
+
+    assert resolver.resolve("alex [U03ERC46NKA] @ 06/01/2023 11:54:43 Z:") == (
+        same_user
+    )
+
+
+def test_post_process_all_resolves_inexact_fingerprints(tmp_path: Path):
+    dump_path = tmp_path / "C123.txt"
+    dump_path.write_text(
+        "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:\nCall with Acme\n",
+        encoding="utf-8",
+    )
+    processor = ConversationProcessor(dump_path)
+    note = StakeholderNote(
+        stakeholder_name="Acme",
+        date="2023-01-06",
+        title="Call",
+        summary="Went well",
+        relevant_slack_threads=[
+            "alex [U03ERC46NKA] @ 06/01/2023 11:44:41",
+            "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:",
+        ],
+    )
+
+    (processed,) = post_process_all([note], processor)
+
+    assert processed.relevant_slack_threads == [FINGERPRINTS[0]]
+    assert "Call with Acme" in processed.full_slack_threads
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from slack_archive.cache import ExportCache
+from slack_archive.slack_dump import SlackDumpManager
+
+# Stands in for slackdump: logs its invocation, reports progress on stderr and
+# writes one thread per channel to the export path.
+FAKE_SLACKDUMP = """\
+#!{python}
+import json, sys, time
+
+args = sys.argv[1:]
+export = args.index("--export")
+output, channels = args[export + 1], args[export + 2 :]
+start = time.time()
+for channel in channels:
+    if channel == "CFAIL":
+        print("fetching CFAIL", file=sys.stderr, flush=True)
+        print("error: channel_not_found", file=sys.stderr)
+        sys.exit(1)
+for percent in (0, 50, 100):
+    print(f"{{','.join(channels)}}: {{percent}}%", file=sys.stderr, flush=True)
+    time.sleep(0.05)
+with open(output, "w") as file:
+    for channel in channels:
+        file.write(f"> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:\\nHi {{channel}}\\n")
+with open({log!r}, "a") as file:
+    file.write(json.dumps({{"args": args, "start": start, "end": time.time()}}) + "\\n")
+"""
+
+
+@pytest.fixture
+def fake_slackdump(tmp_path: Path) -> Path:
+    binary = tmp_path / "slackdump"
+    binary.write_text(
+        FAKE_SLACKDUMP.format(python=sys.executable, log=str(tmp_path / "calls.jsonl"))
+    )
+    binary.chmod(0o755)
+    return binary
+
+
+def calls(tmp_path: Path) -> list[dict]:
+    log = tmp_path / "calls.jsonl"
+    if not log.exists():
+        return []
+    return [json.loads(line) for line in log.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_channels_are_exported_concurrently(fake_slackdump: Path, tmp_path: Path):
+    manager = SlackDumpManager(binary_path=fake_slackdump, max_concurrent=2)
+    channels = ["C001", "C002", "C003", "C004"]
+
+    paths = await manager.export_channels(tmp_path / "dumps", channels)
+
+    assert list(paths) == channels
+    assert all(f"Hi {channel}" in paths[channel].read_text() for channel in channels)
+    assert not list((tmp_path / "dumps").glob("*.partial"))
+    # Count the exports running at the start of each export.
+    runs = calls(tmp_path)
+    running = [
+        sum(other["start"] <= run["start"] < other["end"] for other in runs)
+        for run in runs
+    ]
+    assert max(running) == 2
+
+
+@pytest.mark.asyncio
+async def test_progress_is_streamed(fake_slackdump: Path, tmp_path: Path):
+    manager = SlackDumpManager(binary_path=fake_slackdump)
+    lines: list[str] = []
+
+    await manager.export_slack_data(
+        tmp_path / "dump.txt", ["C001"], on_progress=lines.append
+    )
+
+    assert lines == ["C001: 0%", "C001: 50%", "C001: 100%"]
+
+
+@pytest.mark.asyncio
+async def test_failed_export_reports_stderr(fake_slackdump: Path, tmp_path: Path):
+    manager = SlackDumpManager(binary_path=fake_slackdump)
+
+    with pytest.raises(RuntimeError, match="channel_not_found"):
+        await manager.export_slack_data(tmp_path / "dump.txt", ["CFAIL"])
+
+    assert list(tmp_path.glob("dump.txt*")) == []
+
+
+@pytest.mark.asyncio
+async def test_cancelled_export_kills_slackdump(fake_slackdump: Path, tmp_path: Path):
+    manager = SlackDumpManager(binary_path=fake_slackdump)
+    started = asyncio.Event()
+
+    export = asyncio.create_task(
+        manager.export_slack_data(
+            tmp_path / "dump.txt", ["C001"], on_progress=lambda _: started.set()
+        )
+    )
+    await started.wait()
+    export.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await export
+
+    # A slackdump left running would log its call once it finished.
+    await asyncio.sleep(0.3)
+    assert calls(tmp_path) == []
+    assert list(tmp_path.glob("dump.txt*")) == []
+
+
+@pytest.mark.asyncio
+async def test_exports_are_cached_by_channel_and_time_range(
+    fake_slackdump: Path, tmp_path: Path
+):
+    cache = ExportCache(tmp_path / "cache")
+    manager = SlackDumpManager(binary_path=fake_slackdump, cache=cache)
+    until = datetime(2024, 1, 31)
+
+    await manager.export_slack_data(tmp_path / "a.txt", ["C001"], time_to=until)
+    await manager.export_slack_data(tmp_path / "b.txt", ["C001"], time_to=until)
+    await manager.export_slack_data(tmp_path / "c.txt", ["C002"], time_to=until)
+
+    assert len(calls(tmp_path)) == 2
+    assert calls(tmp_path)[0]["args"][:2] == ["-dump-to", "2024-01-31T00:00:00"]
+    assert (tmp_path / "b.txt").read_text() == (tmp_path / "a.txt").read_text()
+
+    # Exports up to now expire, so new messages are picked up.
+    cache.max_open_age = 0
+    await manager.export_slack_data(tmp_path / "d.txt", ["C001"])
+    await manager.export_slack_data(tmp_path / "e.txt", ["C001"])
+
+    assert len(calls(tmp_path)) == 4
@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from slack_archive.chunking import Chunk, ConversationProcessor
+from slack_archive.md_dump import MarkdownWriter
+from slack_archive.rate_limit import RequestPolicy
+from slack_archive.schema import (
+    PostProcessedStakeholderNote,
+    StakeholderNote,
+    StakeholderNotes,
+)
+from slack_archive.streaming import StreamingPipeline
+from slack_archive.structured_extract import OpenAIManager
+from slack_archive.synthetic import write_dump
+
+
+@pytest.fixture
+def processor(tmp_path: Path) -> ConversationProcessor:
+    dump_path = tmp_path / "dump.txt"
+    write_dump(dump_path, 0.05)
+    return ConversationProcessor(dump_path, chunk_size=1000)
+
+
+@pytest.fixture
+def manager(monkeypatch: pytest.MonkeyPatch) -> OpenAIManager:
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    manager = OpenAIManager(model="gpt-4o", policy=RequestPolicy(max_concurrent=3))
+    stakeholders = itertools.count()
+
+    async def fake_process_chunk(chunk: Chunk) -> StakeholderNotes:
+        await asyncio.sleep(0)
+        if chunk.text.startswith("> "):  # labelled chunks start with "[1] "
+            raise ValueError("unlabelled chunk")
+        return StakeholderNotes(
+            stakeholder_notes=[
+                StakeholderNote(
+                    stakeholder_name=f"Partner {next(stakeholders)}",
+                    date="2024-01-01",
+                    title="Call",
+                    summary="summary",
+                    relevant_slack_threads=[chunk.thread_ids[1]],
+                )
+            ]
+        )
+
+    monkeypatch.setattr(manager, "process_chunk", fake_process_chunk)
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_notes_are_written_per_chunk(
+    processor: ConversationProcessor,
+    manager: OpenAIManager,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    written: list[list[PostProcessedStakeholderNote]] = []
+    write = MarkdownWriter.write
+
+    def recording_write(
+        self: MarkdownWriter, notes: list[PostProcessedStakeholderNote], keys: list[int]
+    ) -> None:
+        written.append(notes)
+        write(self, notes, keys)
+
+    monkeypatch.setattr(MarkdownWriter, "write", recording_write)
+    progress: list[None] = []
+    output_dir = tmp_path / "output"
+
+    result = await StreamingPipeline(manager, processor, output_dir).run(
+        progress_callback=lambda: progress.append(None)
+    )
+
+    assert result.chunks == len(list(processor.iter_chunks())) > 1
+    assert result.notes == result.chunks
+    assert not result.failures
+    assert len(written) == len(progress) == result.chunks
+    assert all(len(notes) == 1 for notes in written)
+    assert all(notes[0].relevant_slack_threads for notes in written)
+    assert len(list(output_dir.glob("*.md"))) == result.chunks
+
+
+@pytest.mark.asyncio
+async def test_failed_chunks_do_not_stop_the_stream(
+    processor: ConversationProcessor,
+    manager: OpenAIManager,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    chunks = list(processor.iter_chunks())
+    # Hand the second chunk over without its labels, which the fake rejects.
+    chunks[1] = Chunk(chunks[1].text.split("] ", 1)[1])
+    monkeypatch.setattr(processor, "iter_chunks", lambda threads: iter(chunks))
+
+    result = await StreamingPipeline(manager, processor, tmp_path).run()
+
+    assert list(result.failures) == [1]
+    assert result.notes == len(chunks) - 1
+
+
+@pytest.mark.asyncio
+async def test_output_starts_before_chunking_finishes(
+    processor: ConversationProcessor,
+    manager: OpenAIManager,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    produced = 0
+    produced_at_write: list[int] = []
+    iter_chunks = processor.iter_chunks
+
+    def counting_iter_chunks(threads: object) -> Iterator[Chunk]:
+        nonlocal produced
+        for chunk in iter_chunks():
+            produced += 1
+            yield chunk
+
+    monkeypatch.setattr(processor, "iter_chunks", counting_iter_chunks)
+    monkeypatch.setattr(
+        MarkdownWriter, "write", lambda *_: produced_at_write.append(produced)
+    )
+
+    result = await StreamingPipeline(
+        manager, processor, tmp_path, workers=1, queue_size=1
+    ).run()
+
+    # One chunk in each queue and stage, plus the one being chunked.
+    max_ahead = 6
+    assert result.chunks > 2 * max_ahead
+    assert all(
+        produced - written <= max_ahead
+        for written, produced in enumerate(produced_at_write)
+    )
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+from openai import APIConnectionError
+
+from slack_archive.chunking import Chunk
+from slack_archive.rate_limit import RequestPolicy
+from slack_archive.schema import StakeholderNote, StakeholderNotes
+from slack_archive.structured_extract import OpenAIManager
+
+
+@pytest.fixture
+def manager(monkeypatch: pytest.MonkeyPatch) -> OpenAIManager:
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return OpenAIManager(model="test-model", policy=RequestPolicy(max_concurrent=3))
+
+
+def make_notes(title: str) -> StakeholderNotes:
+    return StakeholderNotes(
+        stakeholder_notes=[
+            StakeholderNote(
+                stakeholder_name="Acme",
+                date="2024-01-01",
+                title=title,
+                summary="summary",
+                relevant_slack_threads=[],
+            )
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_extract_runs_concurrently_in_chunk_order(
+    manager: OpenAIManager, monkeypatch: pytest.MonkeyPatch
+):
+    in_flight = 0
+    peak = 0
+
+    async def fake_process_chunk(chunk: Chunk) -> StakeholderNotes:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later chunks finish first to check results are put back in order.
+        await asyncio.sleep(0.01 * (10 - int(chunk.text)))
+        in_flight -= 1
+        return make_notes(chunk.text)
+
+    monkeypatch.setattr(manager, "process_chunk", fake_process_chunk)
+    completed: list[None] = []
+
+    result = await manager.extract_stakeholder_notes(
+        [Chunk(str(i)) for i in range(10)],
+        progress_callback=lambda: completed.append(None),
+    )
+
+    assert peak == 3
+    assert len(completed) == 10
+    assert [n.stakeholder_notes[0].title for n in result.successful()] == [
+        str(i) for i in range(10)
+    ]
+    assert result.failures == {}
+
+
+@pytest.mark.asyncio
+async def test_extract_keeps_failures_separate(
+    manager: OpenAIManager, monkeypatch: pytest.MonkeyPatch
+):
+    async def fake_process_chunk(chunk: Chunk) -> StakeholderNotes:
+        await asyncio.sleep(0)
+        if chunk.text == "bad":
+            raise ValueError("boom")
+        return make_notes(chunk.text)
+
+    monkeypatch.setattr(manager, "process_chunk", fake_process_chunk)
+
+    result = await manager.extract_stakeholder_notes([
+        Chunk("a"),
+        Chunk("bad"),
+        Chunk("c"),
+    ])
+
+    assert result.notes[1] is None
+    assert isinstance(result.failures[1], ValueError)
+    assert [n.stakeholder_notes[0].title for n in result.successful()] == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_recorded(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    manager = OpenAIManager(
+        model="test-model", policy=RequestPolicy(max_retries=2, retry_delay=0)
+    )
+
+    async def fail(chunk: str, tokens: int) -> None:
+        await asyncio.sleep(0)
+        raise APIConnectionError(request=httpx.Request("POST", "https://test"))
+
+    monkeypatch.setattr(manager, "_request_completion", fail)
+
+    with pytest.raises(APIConnectionError):
+        await manager.process_chunk(Chunk("first thread\nreply"))
+
+    [record] = manager.metrics.requests
+    assert record.label == "first thread"
+    assert record.failed
+    assert record.retries == 2
+    assert record.latency is not None
+    assert manager.metrics.summary()["requests"]["failed"] == 1
@@ -0,0 +1,35 @@
+import re
+from pathlib import Path
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.synthetic import write_dump
+from slack_archive.thread_index import ThreadIndex
+
+
+def test_dump_is_deterministic(tmp_path: Path):
+    first, second, other = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "c.txt"
+
+    size = write_dump(first, 0.2, seed=1)
+    write_dump(second, 0.2, seed=1)
+    write_dump(other, 0.2, seed=2)
+
+    assert size >= 0.2 * 1024 * 1024
+    assert size == first.stat().st_size
+    assert first.read_bytes() == second.read_bytes()
+    assert first.read_bytes() != other.read_bytes()
+
+
+def test_dump_parses_like_slackdump_output(tmp_path: Path):
+    dump_path = tmp_path / "synthetic.txt"
+    write_dump(dump_path, 0.5)
+    processor = ConversationProcessor(dump_path)
+
+    text = dump_path.read_text(encoding="utf-8")
+    parts = re.split(processor.THREAD_PATTERN, text, flags=re.MULTILINE)
+    threads = list(processor.iter_threads())
+
+    assert len(threads) == len(parts) // 2
+    assert any(thread.reply_count > 0 for thread in threads)
+    assert "\n• " in text
+    index = ThreadIndex.build(dump_path)
+    assert len(index) < len(threads)  # some fingerprints are repeated
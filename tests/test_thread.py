@@ -0,0 +1,86 @@
+import mmap
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+
+from slack_archive.thread import Thread, ThreadStore
+
+DUMP = """\
+preamble without a fingerprint
+> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
+first message
+|
+|   > Tina [U03GRQX5HGR] @ 06/01/2023 13:44:07 Z:
+|   reply
+|
+|   > alex [U03ERC46NKA] @ 07/01/2023 09:00:00 Z:
+|   second reply
+
+> Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:
+Grüße
+"""
+
+
+def test_store_splits_threads_at_fingerprints():
+    store = ThreadStore(DUMP.encode())
+
+    assert len(store) == 2
+    assert [thread.fingerprint for thread in store] == [
+        "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:",
+        "> Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:",
+    ]
+    assert store[1].content == "> Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:\nGrüße\n"
+    assert "".join(thread.content for thread in store) == DUMP.split("\n", 1)[1]
+
+
+def test_fingerprint_fields_are_parsed():
+    thread = ThreadStore(DUMP.encode())[0]
+
+    assert thread.user_id == "U03ERC46NKA"
+    assert thread.timestamp == datetime(2023, 1, 6, 11, 44, 42, tzinfo=UTC)
+    assert thread.key == "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+    assert thread.reply_count == 2
+    assert [
+        thread.content.encode()[offset:].split(b"\n", 1)[0]
+        for offset in thread.reply_offsets
+    ] == [
+        b"|   > Tina [U03GRQX5HGR] @ 06/01/2023 13:44:07 Z:",
+        b"|   > alex [U03ERC46NKA] @ 07/01/2023 09:00:00 Z:",
+    ]
+    assert thread.last_activity == datetime(2023, 1, 7, 9, tzinfo=UTC)
+
+
+def test_store_maps_files(tmp_path: Path):
+    path = tmp_path / "C123.txt"
+    path.write_text(DUMP, encoding="utf-8")
+    (tmp_path / "empty.txt").touch()
+
+    threads = list(ThreadStore.from_file(path))
+
+    assert [thread.content for thread in threads] == [
+        thread.content for thread in ThreadStore(DUMP.encode())
+    ]
+    assert len(ThreadStore.from_file(tmp_path / "empty.txt")) == 0
+
+
+def test_store_finds_threads_as_they_are_iterated(tmp_path: Path):
+    path = tmp_path / "C123.txt"
+    path.write_text(DUMP, encoding="utf-8")
+
+    with ThreadStore.from_file(path) as store:
+        first = next(iter(store))
+        assert len(store.offsets) == 1
+        assert first.fingerprint == "> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+
+    assert isinstance(store.buffer, mmap.mmap)
+    assert store.buffer.closed
+
+
+def test_from_text_requires_a_fingerprint():
+    thread = Thread.from_text("> bot @ 06/01/2023 11:44:42 Z:\nhello\n")
+
+    assert not thread.user_id
+    assert thread.reply_count == 0
+    with pytest.raises(ValueError, match="Malformed"):
+        Thread.from_text("hello\n> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:\n")
@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+from slack_archive.chunking import ConversationProcessor
+from slack_archive.thread_index import ThreadIndex
+
+DUMP = """\
+> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
+first message
+|   
+|   > Tina [U03GRQX5HGR] @ 06/01/2023 13:44:07 Z:
+|   reply
+
+> Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:
+Grüße
+
+> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
+same second, different message
+"""
+
+
+def write_dump(tmp_path: Path, text: str = DUMP) -> Path:
+    path = tmp_path / "C123.txt"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_index_keeps_duplicate_fingerprints(tmp_path: Path):
+    index = ThreadIndex.build(write_dump(tmp_path))
+    fingerprint = "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+
+    threads = index.get_all(fingerprint)
+
+    assert len(index) == 2
+    assert [t.content.splitlines()[1] for t in threads] == [
+        "first message",
+        "same second, different message",
+    ]
+    assert index[fingerprint].content == threads[0].content
+    assert index["Hasu [U03FP0H62HH] @ 06/01/2023 12:02:18 Z:"].content.endswith(
+        "Grüße\n\n"
+    )
+
+
+def test_index_matches_streaming_parser(tmp_path: Path):
+    processor = ConversationProcessor(write_dump(tmp_path))
+    streamed = list(processor.iter_threads())
+
+    indexed = [
+        thread
+        for fingerprint in processor.thread_map
+        for thread in processor.thread_map.get_all(fingerprint)
+    ]
+
+    assert sorted((t.fingerprint, t.content) for t in streamed) == sorted(
+        (t.fingerprint, t.content) for t in indexed
+    )
+
+
+def test_sidecar_is_reused_and_rebuilt_when_stale(tmp_path: Path):
+    dump_path = write_dump(tmp_path)
+    ThreadIndex.load_or_build(dump_path)
+    index_path = ThreadIndex.index_path_for(dump_path)
+    assert index_path.exists()
+
+    # A fresh sidecar is loaded without rescanning the dump.
+    built_at = index_path.stat().st_mtime_ns
+    ThreadIndex.load_or_build(dump_path)
+    assert index_path.stat().st_mtime_ns == built_at
+
+    dump_path.write_text(DUMP + "> new [U1] @ 07/01/2023 10:00:00 Z:\nhi\n")
+    os.utime(dump_path, ns=(built_at + 10**9, built_at + 10**9))
+    index = ThreadIndex.load_or_build(dump_path)
+    assert "new [U1] @ 07/01/2023 10:00:00 Z:" in index
@@ -0,0 +1,146 @@
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from slack_archive.main import main
+from slack_archive.md_dump import dump_to_markdown
+from slack_archive.schema import PostProcessedStakeholderNote
+from slack_archive.thread import TIMESTAMP_FORMAT, Thread, ThreadStore
+from slack_archive.triage import (
+    RelevanceModel,
+    build_thread_filter,
+    label_threads,
+    load_cited_fingerprints,
+)
+
+RELEVANT_WORDS = "partner call integration roadmap pilot contract relay launch".split()
+CHATTER_WORDS = "lunch coffee weekend office music photo birthday holiday".split()
+SHARED_WORDS = "the we team today and with about next week".split()
+
+
+def make_dump(threads: int = 60, seed: int = 0) -> str:
+    """Every third thread is about a partner, the others are chatter."""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 6, 11, 42, 13)
+    parts = []
+    for index in range(threads):
+        topic = RELEVANT_WORDS if index % 3 == 0 else CHATTER_WORDS
+        words = rng.choices(topic, k=4) + rng.choices(SHARED_WORDS, k=6)
+        rng.shuffle(words)
+        timestamp = (start + timedelta(minutes=index)).strftime(TIMESTAMP_FORMAT)
+        parts.append(f"> alex [U03ERC46NKA] @ {timestamp} Z:\n{' '.join(words)}\n")
+    return "\n".join(parts)
+
+
+@pytest.fixture
+def threads() -> list[Thread]:
+    return list(ThreadStore(make_dump().encode()))
+
+
+def cited_threads(threads: list[Thread]) -> np.ndarray:
+    return np.array([index % 3 == 0 for index in range(len(threads))])
+
+
+def test_trained_model_keeps_cited_threads(threads: list[Thread]):
+    model, report = RelevanceModel.fit(threads, cited_threads(threads))
+
+    assert report.recall >= 0.95
+    assert report.kept < report.threads
+    unseen = list(ThreadStore(make_dump(seed=1).encode()))
+    evaluation = model.evaluate(unseen, cited_threads(unseen))
+    assert evaluation.recall == 1
+    assert evaluation.precision == 1
+
+
+def test_model_round_trips(threads: list[Thread], tmp_path: Path):
+    model, _ = RelevanceModel.fit(threads, cited_threads(threads))
+
+    model.save(tmp_path / "triage.npz")
+    loaded = RelevanceModel.load(tmp_path / "triage.npz")
+
+    assert loaded.terms == model.terms
+    assert loaded.threshold == model.threshold
+    np.testing.assert_allclose(loaded.scores(threads), model.scores(threads))
+
+
+def test_training_needs_cited_threads(threads: list[Thread]):
+    cited = np.zeros(len(threads), dtype=bool)
+    cited[0] = True
+
+    with pytest.raises(ValueError, match="at least 5 cited"):
+        RelevanceModel.fit(threads, cited)
+
+
+def test_keyword_model(threads: list[Thread]):
+    model = RelevanceModel.from_keywords(["Pilot", "contract signed"])
+
+    relevant = [model.is_relevant(thread) for thread in threads]
+
+    assert model.terms == ["pilot", "contract", "signed"]
+    assert any(relevant)
+    assert not any(relevant[1::3] + relevant[2::3])
+    assert model.are_irrelevant(threads).tolist() == [not r for r in relevant]
+
+
+def test_labels_come_from_written_notes(threads: list[Thread], tmp_path: Path):
+    note = PostProcessedStakeholderNote(
+        stakeholder_name="Acme",
+        date="2023-01-06",
+        title="Pilot",
+        summary="summary",
+        relevant_slack_threads=[threads[0].key, threads[3].key],
+        full_slack_threads=threads[0].content + threads[3].content,
+    )
+    dump_to_markdown([note], tmp_path / "C123")
+
+    cited = load_cited_fingerprints(tmp_path)
+
+    assert cited == {threads[0].key, threads[3].key}
+    assert label_threads(threads[:4], cited).tolist() == [True, False, False, True]
+
+
+def test_triage_runs_after_the_noise_rules():
+    noise_filter = build_thread_filter(model_path=None, keywords=["pilot"])
+
+    assert list(noise_filter.rules)[-1] == "triage"
+    assert "triage" not in build_thread_filter(model_path=None, keywords=()).rules
+
+
+def test_train_and_evaluate_commands(threads: list[Thread], tmp_path: Path):
+    dump_path = tmp_path / "C123.txt"
+    dump_path.write_text(make_dump(), encoding="utf-8")
+    note = PostProcessedStakeholderNote(
+        stakeholder_name="Acme",
+        date="2023-01-06",
+        title="Partner threads",
+        summary="summary",
+        relevant_slack_threads=[thread.key for thread in threads[::3]],
+        full_slack_threads="",
+    )
+    output_dir = tmp_path / "output"
+    dump_to_markdown([note], output_dir)
+    model_path = tmp_path / "triage.npz"
+
+    trained = CliRunner().invoke(
+        main,
+        [
+            "triage",
+            "train",
+            str(dump_path),
+            str(output_dir),
+            "--model",
+            str(model_path),
+        ],
+    )
+    evaluated = CliRunner().invoke(
+        main, ["triage", "evaluate", str(model_path), str(dump_path), str(output_dir)]
+    )
+
+    assert trained.exit_code == 0, trained.output
+    assert model_path.exists()
+    assert evaluated.exit_code == 0, evaluated.output
+    assert "recall" in evaluated.output
@@ -0,0 +1,85 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from slack_archive.chunking import Chunk
+from slack_archive.incremental import STATE_DIR_NAME
+from slack_archive.schema import StakeholderNote, StakeholderNotes
+from slack_archive.structured_extract import OpenAIManager
+from slack_archive.thread_index import ThreadIndex
+from slack_archive.workspace import WorkspaceRunner, discover_dumps, prepare_channel
+
+DUMP = """\
+> alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:
+Call with {channel} went well
+|   
+|   > Tina [U03GRQX5HGR] @ 06/01/2023 13:44:07 Z:
+|   Great, follow up next week
+
+> Hasu [U03FP0H62HH] @ 07/01/2023 12:02:18 Z:
+Unrelated message about lunch
+"""
+
+
+@pytest.fixture
+def dumps_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "dumps"
+    directory.mkdir()
+    for channel in ("C001", "C002", "C003"):
+        (directory / f"{channel}.txt").write_text(DUMP.format(channel=channel))
+    return directory
+
+
+def test_discover_dumps(dumps_dir: Path):
+    assert list(discover_dumps(dumps_dir)) == ["C001", "C002", "C003"]
+
+
+def test_prepare_channel_builds_index(dumps_dir: Path):
+    dump_path = dumps_dir / "C001.txt"
+
+    prepared = prepare_channel("C001", dump_path, "gpt-4o", prompt_overhead="")
+
+    assert len(prepared.chunks) == 1
+    assert "Call with C001" in prepared.chunks[0].text
+    assert list(prepared.chunks[0].thread_ids) == [1, 2]
+    assert ThreadIndex.index_path_for(dump_path).exists()
+    assert prepared.reprocessed is None
+
+
+@pytest.mark.asyncio
+async def test_workspace_writes_each_channel(
+    dumps_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    manager = OpenAIManager(model="gpt-4o")
+
+    async def fake_process_chunk(chunk: Chunk) -> StakeholderNotes:
+        await asyncio.sleep(0)
+        channel = chunk.text.split("Call with ")[1].split()[0]
+        return StakeholderNotes(
+            stakeholder_notes=[
+                StakeholderNote(
+                    stakeholder_name=channel,
+                    date="2023-01-06",
+                    title="Call",
+                    summary="Went well",
+                    relevant_slack_threads=[
+                        "alex [U03ERC46NKA] @ 06/01/2023 11:44:42 Z:"
+                    ],
+                )
+            ]
+        )
+
+    monkeypatch.setattr(manager, "process_chunk", fake_process_chunk)
+    output_dir = tmp_path / "output"
+    runner = WorkspaceRunner(manager, output_dir, incremental=True, max_workers=2)
+    # A channel whose dump cannot be read is reported without stopping the others.
+    (dumps_dir / "C004.txt").mkdir()
+
+    notes_per_channel = await runner.run(discover_dumps(dumps_dir))
+
+    assert notes_per_channel == {"C001": 1, "C002": 1, "C003": 1}
+    assert runner.failed_channels == ["C004"]
+    for channel in notes_per_channel:
+        assert (output_dir / channel / STATE_DIR_NAME / "watermarks.json").exists()